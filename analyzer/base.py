@@ -1,4 +1,5 @@
-from typing import Any, List, Dict
+from typing import Any, List, Dict, Iterable
+from parser.nodes import Directive, Block, iter_nodes
 
 class Analyzer:
     def __init__(self, tree):
@@ -9,10 +10,111 @@ class Analyzer:
         """
         Рекурсивно обходит дерево директив.
         Возвращает генератор (директива, родитель).
+        Ленивые include прозрачны: их содержимое отдаётся с родителем include.
         """
         if directives is None:
             directives = self.directives
-        for d in directives:
+        for d in iter_nodes(directives):
             yield d, parent
             if 'directives' in d:
-                yield from self.walk(d['directives'], d) 
\ No newline at end of file
+                yield from self.walk(d['directives'], d)
+
+# Подписка на все директивы или на все блоки
+ANY = '*'
+
+class Rule:
+    """
+    Проверка для RuleEngine.
+
+    directives / blocks — имена директив и блоков, которые нужны правилу (ANY — все).
+    start(tree) вызывается перед обходом, visit(node, parent) — для каждого такого узла
+    в порядке обхода (блок — до своего содержимого), leave(block, parent) — для блоков
+    из blocks после обхода их содержимого. result() отдаёт найденное после обхода.
+
+    Правила, которые сравнивают части дерева между собой, могут определить merge(other):
+    добавить к своим данным данные, собранные другим экземпляром того же правила по другой
+    части дерева. Так analyze --watch обходит заново только изменившиеся server-блоки;
+    правила без merge (см. supports_merge) каждый раз обходят всё дерево.
+    """
+    directives: Iterable[str] = ()
+    blocks: Iterable[str] = ()
+
+    def start(self, tree) -> None:
+        pass
+
+    def visit(self, node, parent) -> None:
+        pass
+
+    def leave(self, node, parent) -> None:
+        pass
+
+    def result(self) -> List[Dict[str, Any]]:
+        return []
+
+class RuleEngine:
+    """
+    Запускает несколько правил за один обход дерева: каждый узел передаётся
+    только тем правилам, которые подписаны на его имя.
+    """
+    def __init__(self, rules: List[Rule]):
+        self.rules = rules
+        self._directives: Dict[str, List[Rule]] = {}
+        self._blocks: Dict[str, List[Rule]] = {}
+        self._any_directive: List[Rule] = []
+        self._any_block: List[Rule] = []
+        for rule in rules:
+            for name in rule.directives:
+                if name == ANY:
+                    self._any_directive.append(rule)
+                else:
+                    self._directives.setdefault(name, []).append(rule)
+            for name in rule.blocks:
+                if name == ANY:
+                    self._any_block.append(rule)
+                else:
+                    self._blocks.setdefault(name, []).append(rule)
+
+    def _for_name(self, index, any_rules, name) -> List[Rule]:
+        named = index.get(name)
+        if not named:
+            return any_rules
+        if not any_rules:
+            return named
+        # Порядок регистрации правил сохраняется
+        return [r for r in self.rules if r in named or r in any_rules]
+
+    def run(self, tree) -> List[List[Dict[str, Any]]]:
+        """Обходит дерево один раз; возвращает result() каждого правила в порядке rules."""
+        self._dispatch = {}
+        for rule in self.rules:
+            rule.start(tree)
+        self._walk(tree.directives, None)
+        return [rule.result() for rule in self.rules]
+
+    def _walk(self, nodes, parent) -> None:
+        dispatch = self._dispatch
+        for d in iter_nodes(nodes):
+            if isinstance(d, Block):
+                key = (1, d.name)
+                rules = dispatch.get(key)
+                if rules is None:
+                    rules = dispatch[key] = self._for_name(self._blocks, self._any_block, d.name)
+                for rule in rules:
+                    rule.visit(d, parent)
+                self._walk(d.directives, d)
+                for rule in rules:
+                    rule.leave(d, parent)
+            elif isinstance(d, Directive):
+                key = (0, d.name)
+                rules = dispatch.get(key)
+                if rules is None:
+                    rules = dispatch[key] = self._for_name(self._directives, self._any_directive, d.name)
+                for rule in rules:
+                    rule.visit(d, parent)
+
+def supports_merge(rule: Rule) -> bool:
+    """Определяет ли правило merge(other) (см. Rule)."""
+    return callable(getattr(rule, 'merge', None))
+
+def run_rules(tree, rules: List[Rule]) -> List[List[Dict[str, Any]]]:
+    return RuleEngine(rules).run(tree)
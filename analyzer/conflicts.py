@@ -1,65 +1,212 @@
-from analyzer.base import Analyzer
-from typing import List, Dict, Any
-import re
+from analyzer.base import Rule, run_rules
+from parser.nodes import Block
+from typing import List, Dict, Any, Optional
+
+class LocationConflictRule(Rule):
+    """
+    Пересекающиеся location-ы внутри одного server-блока.
+    Результат: [{server, location1, location2}]
+    """
+    blocks = ('server', 'location')
+
+    def __init__(self):
+        # Открытые server-блоки: (server, его location-ы); конфликты каждого server-а
+        # пишутся в ячейку, занятую при входе в него, — порядок как при обходе сверху вниз
+        self._open = []
+        self._slots = []
+
+    def visit(self, node, parent):
+        if node.name == 'server':
+            slot = []
+            self._slots.append(slot)
+            self._open.append((slot, []))
+        else:
+            arg = node.arg
+            if arg:
+                for _, locations in self._open:
+                    locations.append(arg)
+
+    def leave(self, node, parent):
+        if node.name != 'server':
+            return
+        slot, locations = self._open.pop()
+        for i, j in _conflicting_pairs(locations):
+            slot.append({
+                'server': node,
+                'location1': locations[i],
+                'location2': locations[j]
+            })
+
+    def result(self):
+        return [c for slot in self._slots for c in slot]
 
 def find_location_conflicts(tree) -> List[Dict[str, Any]]:
     """
     Находит пересекающиеся location-ы внутри одного server-блока.
     Возвращает список конфликтов: [{server, location1, location2}]
     """
-    analyzer = Analyzer(tree)
-    conflicts = []
-    for d, parent in analyzer.walk():
-        if d.get('block') == 'server':
-            locations = []
-            for sub, _ in analyzer.walk(d['directives'], d):
-                if sub.get('block') == 'location':
-                    arg = sub.get('arg')
-                    if arg:
-                        locations.append(arg)
-            # Проверяем пересечения
-            for i in range(len(locations)):
-                for j in range(i+1, len(locations)):
-                    if _locations_conflict(locations[i], locations[j]):
-                        conflicts.append({
-                            'server': d,
-                            'location1': locations[i],
-                            'location2': locations[j]
-                        })
-    return conflicts
+    return run_rules(tree, [LocationConflictRule()])[0]
+
+# Модификаторы location: '=' — точное совпадение, '^~' — префикс без проверки regex,
+# '~' / '~*' — регулярные выражения, '@' — именованный location, без модификатора — префикс
+def location_modifier(arg: str):
+    """Делит аргумент location на (модификатор, путь); у префиксного location модификатор ''."""
+    if arg.startswith('@'):
+        return '@', arg
+    for mod in ('^~', '~*', '~', '='):
+        if arg.startswith(mod):
+            return mod, arg[len(mod):].strip()
+    return '', arg
+
+_PREFIX = ('', '^~')
 
 def _locations_conflict(loc1, loc2):
-    # Простая эвристика: если один путь — префикс другого
-    return loc1.startswith(loc2) or loc2.startswith(loc1)
+    """
+    Пересекаются ли два location-а:
+    префиксные ('' и '^~') — если один путь является префиксом другого;
+    точные, regex и именованные — только если совпадают полностью (повтор того же location).
+    """
+    mod1, path1 = location_modifier(loc1)
+    mod2, path2 = location_modifier(loc2)
+    if mod1 in _PREFIX and mod2 in _PREFIX:
+        return path1.startswith(path2) or path2.startswith(path1)
+    return mod1 == mod2 and path1 == path2
+
+def _conflicting_pairs(locations: List[str]) -> List[tuple]:
+    """
+    Пары индексов (i, j), i < j, конфликтующих location-ов (см. _locations_conflict)
+    в порядке, в каком их дал бы перебор всех пар.
+
+    Префиксные пути сортируются; все пути, для которых P — префикс, идут в
+    отсортированном списке сразу за P. Поэтому при проходе по списку стек
+    «открытых» путей — цепочка префиксов текущего пути, и каждый конфликт
+    находится за O(1): всего O(L log L + число конфликтов) вместо O(L²).
+    Точные, regex и именованные location-ы конфликтуют только с точными повторами
+    и группируются словарём.
+    """
+    prefix = []
+    exact = {}
+    for i, arg in enumerate(locations):
+        mod, path = location_modifier(arg)
+        if mod in _PREFIX:
+            prefix.append((path, i))
+        else:
+            exact.setdefault((mod, path), []).append(i)
+    pairs = []
+    prefix.sort()
+    stack = []
+    for path, i in prefix:
+        while stack and not path.startswith(stack[-1][0]):
+            stack.pop()
+        for _, j in stack:
+            pairs.append((j, i) if j < i else (i, j))
+        stack.append((path, i))
+    for same in exact.values():
+        for a in range(len(same)):
+            for b in range(a + 1, len(same)):
+                pairs.append((same[a], same[b]))
+    pairs.sort()
+    return pairs
+
+# listen без адреса и server без listen слушают *:80
+DEFAULT_LISTEN = '*:80'
+
+def normalize_listen(args: str) -> Optional[str]:
+    """
+    Адрес сокета из аргументов listen в виде host:port: '80', '*:80' и '0.0.0.0:80' дают '*:80',
+    '127.0.0.1' — '127.0.0.1:80', '[::]:443 ssl' — '[::]:443', 'unix:/run/x.sock' не меняется.
+    Параметры (default_server, ssl, http2, backlog=...) на адрес не влияют.
+    """
+    words = args.split()
+    if not words:
+        return None
+    addr = words[0]
+    if addr.startswith('unix:'):
+        return addr
+    if addr.startswith('['):
+        host, _, rest = addr.partition(']')
+        host += ']'
+        port = rest[1:] if rest.startswith(':') else '80'
+    elif ':' in addr:
+        host, port = addr.rsplit(':', 1)
+    elif addr.isdigit():
+        host, port = '*', addr
+    else:
+        host, port = addr, '80'
+    if host == '0.0.0.0':
+        host = '*'
+    return f"{host.lower()}:{port}"
+
+class ListenServerNameRule(Rule):
+    """
+    Конфликтующие listen/server_name между server-блоками.
+    Результат: [{server1, server2, listen, server_name}]
+
+    Вместо сравнения всех пар server-ов строится инвертированный индекс
+    (адрес listen, server_name) -> server-ы: конфликтуют server-ы из одной корзины.
+    Время — O(сумма listen × server_name по server-ам + число конфликтов).
+    """
+    directives = ('listen', 'server_name')
+    blocks = ('server',)
+
+    def __init__(self):
+        self._open = []
+        self._servers = []
+
+    def visit(self, node, parent):
+        if isinstance(node, Block):
+            # dict вместо set: порядок объявления сохраняется в выводе
+            server = {'block': node, 'listen': {}, 'server_name': {}}
+            self._servers.append(server)
+            self._open.append(server)
+        elif node.name == 'listen':
+            addr = normalize_listen(node['args'])
+            if addr is not None:
+                for server in self._open:
+                    server['listen'][addr] = None
+        else:
+            for server in self._open:
+                for name in node['args'].split():
+                    server['server_name'][name.lower()] = None
+
+    def leave(self, node, parent):
+        self._open.pop()
+
+    def merge(self, other):
+        self._servers.extend(other._servers)
 
+    def result(self):
+        servers = self._servers
+        buckets = {}
+        for i, server in enumerate(servers):
+            listens = server['listen'] or (DEFAULT_LISTEN,)
+            for addr in listens:
+                for name in server['server_name']:
+                    buckets.setdefault((addr, name), []).append(i)
+        # (i, j) -> (общие адреса, общие имена)
+        pairs = {}
+        for (addr, name), owners in buckets.items():
+            for a in range(len(owners)):
+                for b in range(a + 1, len(owners)):
+                    common = pairs.get((owners[a], owners[b]))
+                    if common is None:
+                        common = pairs[(owners[a], owners[b])] = ({}, {})
+                    common[0][addr] = None
+                    common[1][name] = None
+        conflicts = []
+        for i, j in sorted(pairs):
+            listens, names = pairs[(i, j)]
+            conflicts.append({
+                'server1': servers[i]['block'],
+                'server2': servers[j]['block'],
+                'listen': list(listens),
+                'server_name': list(names)
+            })
+        return conflicts
 
 def find_listen_servername_conflicts(tree) -> List[Dict[str, Any]]:
     """
     Находит конфликтующие listen/server_name между server-блоками.
     Возвращает список: [{server1, server2, listen, server_name}]
     """
-    analyzer = Analyzer(tree)
-    servers = []
-    for d, parent in analyzer.walk():
-        if d.get('block') == 'server':
-            listens = set()
-            names = set()
-            for sub, _ in analyzer.walk(d['directives'], d):
-                if sub.get('directive') == 'listen':
-                    listens.add(sub.get('args', '').strip())
-                if sub.get('directive') == 'server_name':
-                    names.update(sub.get('args', '').split())
-            servers.append({'block': d, 'listen': listens, 'server_name': names})
-    conflicts = []
-    for i in range(len(servers)):
-        for j in range(i+1, len(servers)):
-            common_listen = servers[i]['listen'] & servers[j]['listen']
-            common_name = servers[i]['server_name'] & servers[j]['server_name']
-            if common_listen and common_name:
-                conflicts.append({
-                    'server1': servers[i]['block'],
-                    'server2': servers[j]['block'],
-                    'listen': list(common_listen),
-                    'server_name': list(common_name)
-                })
-    return conflicts 
\ No newline at end of file
+    return run_rules(tree, [ListenServerNameRule()])[0]
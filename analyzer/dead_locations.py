@@ -1,34 +1,61 @@
-from analyzer.base import Analyzer
-from typing import List, Dict, Any, Set
-import re
+from analyzer.base import Rule, run_rules
+from analyzer.matcher import MultiPatternMatcher
+from parser.nodes import Block
+from typing import List, Dict, Any
+
+class DeadLocationRule(Rule):
+    """
+    location-ы, которые не упоминаются ни в одном proxy_pass, rewrite, try_files.
+    Результат: [{server, location}]
+    """
+    directives = ('proxy_pass', 'rewrite', 'try_files')
+    blocks = ('server', 'location')
+
+    def __init__(self):
+        # location-ы каждого server-а копятся в ячейке, занятой при входе в него
+        self._open = []
+        self._slots = []
+        self._uses = []
+
+    def visit(self, node, parent):
+        if not isinstance(node, Block):
+            self._uses.append(node['args'])
+        elif node.name == 'server':
+            slot = []
+            self._slots.append((node, slot))
+            self._open.append(slot)
+        else:
+            for slot in self._open:
+                slot.append(node)
+
+    def leave(self, node, parent):
+        if node.name == 'server':
+            self._open.pop()
+
+    def merge(self, other):
+        self._slots.extend(other._slots)
+        self._uses.extend(other._uses)
+
+    def result(self):
+        locations = [{'server': server, 'location': loc} for server, slot in self._slots for loc in slot]
+        # location считается использованным, если его аргумент встречается подстрокой
+        # в аргументах proxy_pass/rewrite/try_files. Все аргументы location-ов ищутся
+        # одним автоматом за проход по каждой строке, а не отдельным `in` на каждую пару.
+        matcher = MultiPatternMatcher(l['location'].get('arg', '') or '' for l in locations)
+        used = set()
+        for args in self._uses:
+            used |= matcher.find_all(args)
+        # Те, что не используются
+        dead = []
+        for l in locations:
+            loc = l['location'].get('arg', '')
+            if not (loc and loc in used):
+                dead.append(l)
+        return dead
 
 def find_dead_locations(tree) -> List[Dict[str, Any]]:
     """
     Находит location-ы, которые не используются ни в одном proxy_pass, rewrite, try_files и т.д.
     Возвращает список: [{server, location}]
     """
-    analyzer = Analyzer(tree)
-    locations = []
-    used = set()
-    # Собираем все location
-    for d, parent in analyzer.walk():
-        if d.get('block') == 'server':
-            for sub, _ in analyzer.walk(d.get('directives', []), d):
-                if sub.get('block') == 'location':
-                    locations.append({'server': d, 'location': sub})
-    # Собираем все использования location (proxy_pass, rewrite, try_files)
-    for d, parent in analyzer.walk():
-        for key in ('proxy_pass', 'rewrite', 'try_files'):
-            if d.get('directive') == key:
-                args = d.get('args', '')
-                for l in locations:
-                    loc = l['location'].get('arg', '')
-                    if loc and loc in args:
-                        used.add((l['server'].get('arg',''), loc))
-    # Те, что не используются
-    dead = []
-    for l in locations:
-        key = (l['server'].get('arg',''), l['location'].get('arg',''))
-        if key not in used:
-            dead.append(l)
-    return dead 
\ No newline at end of file
+    return run_rules(tree, [DeadLocationRule()])[0]
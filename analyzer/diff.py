@@ -1,4 +1,5 @@
 from typing import List, Dict, Any
+from parser.nodes import iter_nodes
 
 def diff_trees(tree1, tree2) -> List[Dict[str, Any]]:
     """
@@ -21,8 +22,8 @@ def _diff_blocks(d1, d2, path, diffs):
         if 'upstream' in d:
             return ('upstream', d['upstream'])
         return ('other', str(d))
-    map1 = {key(x): x for x in d1}
-    map2 = {key(x): x for x in d2}
+    map1 = {key(x): x for x in iter_nodes(d1)}
+    map2 = {key(x): x for x in iter_nodes(d2)}
     all_keys = set(map1) | set(map2)
     for k in all_keys:
         v1 = map1.get(k)
@@ -36,5 +37,9 @@ def _diff_blocks(d1, d2, path, diffs):
             # Рекурсивно сравниваем блоки
             if 'directives' in v1 and 'directives' in v2:
                 _diff_blocks(v1['directives'], v2['directives'], p, diffs)
-            elif v1 != v2:
-                diffs.append({'type': 'changed', 'path': p, 'value1': v1, 'value2': v2}) 
\ No newline at end of file
+            elif _strip_meta(v1) != _strip_meta(v2):
+                diffs.append({'type': 'changed', 'path': p, 'value1': v1, 'value2': v2}) 
+
+def _strip_meta(d):
+    # Служебные ключи (__file__, __span__) не влияют на сравнение
+    return {k: v for k, v in d.items() if not k.startswith('__')}
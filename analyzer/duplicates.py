@@ -1,28 +1,40 @@
-from analyzer.base import Analyzer
+from analyzer.base import Rule, ANY, run_rules
+from parser.nodes import Directive, iter_nodes
 from typing import List, Dict, Any
 
+class DuplicateDirectiveRule(Rule):
+    """
+    Дублирующиеся директивы внутри одного блока (без вложенности).
+    Результат: [{block, directive, count, location}]
+    """
+    blocks = (ANY,)
+
+    def __init__(self):
+        self._duplicates = []
+
+    def visit(self, node, parent):
+        # Считаем только прямые дочерние директивы (без вложенных блоков)
+        seen = {}
+        for sub in iter_nodes(node.directives):
+            if isinstance(sub, Directive):
+                key = (sub.name, sub['args'])
+                seen[key] = seen.get(key, 0) + 1
+        for (directive, args), count in seen.items():
+            if count > 1:
+                self._duplicates.append({
+                    'block': node,
+                    'directive': directive,
+                    'args': args,
+                    'count': count,
+                    'location': node.arg
+                })
+
+    def result(self):
+        return self._duplicates
+
 def find_duplicate_directives(tree) -> List[Dict[str, Any]]:
     """
     Находит дублирующиеся директивы внутри одного блока (без вложенности).
     Возвращает список: [{block, directive, count, location}]
     """
-    analyzer = Analyzer(tree)
-    duplicates = []
-    for d, parent in analyzer.walk():
-        if 'directives' in d:
-            # Считаем только прямые дочерние директивы (без вложенных блоков)
-            seen = {}
-            for sub in d['directives']:
-                if 'directive' in sub:
-                    key = (sub['directive'], str(sub.get('args')))
-                    seen[key] = seen.get(key, 0) + 1
-            for (directive, args), count in seen.items():
-                if count > 1:
-                    duplicates.append({
-                        'block': d,
-                        'directive': directive,
-                        'args': args,
-                        'count': count,
-                        'location': d.get('arg')
-                    })
-    return duplicates 
\ No newline at end of file
+    return run_rules(tree, [DuplicateDirectiveRule()])[0]
@@ -1,14 +1,26 @@
-from analyzer.base import Analyzer
+from analyzer.base import Rule, ANY, run_rules
 from typing import List, Dict, Any
 
+class EmptyBlockRule(Rule):
+    """
+    Пустые блоки (без вложенных директив).
+    Результат: [{block, arg}]
+    """
+    blocks = (ANY,)
+
+    def __init__(self):
+        self._empties = []
+
+    def visit(self, node, parent):
+        if not node.directives:
+            self._empties.append({'block': node.name, 'arg': node.arg})
+
+    def result(self):
+        return self._empties
+
 def find_empty_blocks(tree) -> List[Dict[str, Any]]:
     """
     Находит пустые блоки (без вложенных директив).
     Возвращает список: [{block, arg}]
     """
-    analyzer = Analyzer(tree)
-    empties = []
-    for d, parent in analyzer.walk():
-        if 'block' in d and (not d.get('directives')):
-            empties.append({'block': d.get('block'), 'arg': d.get('arg')})
-    return empties 
\ No newline at end of file
+    return run_rules(tree, [EmptyBlockRule()])[0]
@@ -1,30 +1,29 @@
 import os
-import glob
 from typing import List, Dict, Any, Set
+from parser.resolver import IncludeResolver
 
-def build_include_tree(path: str, visited: Set[str]=None) -> Dict[str, Any]:
+def build_include_tree(path: str, visited: Set[str]=None, resolver: IncludeResolver=None) -> Dict[str, Any]:
     """
     Строит дерево include-ов начиная с path. Возвращает dict: {file: [subincludes]}
+    Файлы читаются и разбираются через resolver: с общим IncludeResolver
+    parse_nginx_config и include-tree не читают одни и те же файлы дважды.
     """
     if visited is None:
         visited = set()
+    if resolver is None:
+        resolver = IncludeResolver()
     path = os.path.abspath(path)
     if path in visited:
         return {path: 'cycle'}
     visited.add(path)
     includes = []
     try:
-        with open(path) as f:
-            lines = f.readlines()
+        patterns = resolver.includes(path)
     except Exception:
         return {path: 'not_found'}
-    for line in lines:
-        line = line.split('#', 1)[0].strip()
-        if line.startswith('include '):
-            pattern = line[len('include '):].rstrip(';').strip()
-            pattern = os.path.join(os.path.dirname(path), pattern) if not os.path.isabs(pattern) else pattern
-            for inc_path in glob.glob(pattern):
-                includes.append(build_include_tree(inc_path, visited.copy()))
+    for pattern in patterns:
+        for inc_path in resolver.match(pattern, os.path.dirname(path), path):
+            includes.append(build_include_tree(inc_path, visited.copy(), resolver))
     return {path: includes}
 
 def find_include_cycles(tree: Dict[str, Any], stack=None) -> List[List[str]]:
@@ -43,21 +42,22 @@ def find_include_cycles(tree: Dict[str, Any], stack=None) -> List[List[str]]:
                     cycles.extend(find_include_cycles(sub, stack + [k]))
     return cycles
 
-def find_include_shadowing(tree: Dict[str, Any], directive: str) -> List[Dict[str, Any]]:
+def find_include_shadowing(tree: Dict[str, Any], directive: str, resolver: IncludeResolver=None) -> List[Dict[str, Any]]:
     """
     Находит переопределения директивы в разных include-ах.
     Возвращает список: [{file, directive, value}]
     """
+    if resolver is None:
+        resolver = IncludeResolver()
     found = []
     def _walk(t):
         for k, v in t.items():
             if isinstance(v, list):
                 # Проверяем сам файл
                 try:
-                    with open(k) as f:
-                        for line in f:
-                            if line.strip().startswith(directive + ' '):
-                                found.append({'file': k, 'directive': directive, 'value': line.strip()})
+                    for line in resolver.read(k).splitlines():
+                        if line.strip().startswith(directive + ' '):
+                            found.append({'file': k, 'directive': directive, 'value': line.strip()})
                 except Exception:
                     pass
                 for sub in v:
@@ -0,0 +1,149 @@
+"""
+Потоковый разбор access.log для nginx-lens logs.
+
+Лог читается большими блоками и разбирается построчно цепочкой генераторов
+(read_lines -> parse_lines -> LogStats.update); строки нигде не накапливаются.
+Счётчики путей, IP и User-Agent ограничены по размеру (TopCounter), поэтому память
+не зависит ни от размера лога, ни от числа различных значений в нём.
+"""
+import gzip
+import heapq
+import re
+from collections import Counter
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Размер блока чтения
+CHUNK_SIZE = 1 << 20
+# Сколько различных значений хранит каждый TopCounter (до сжатия — вдвое больше)
+DEFAULT_CAPACITY = 100_000
+# Как часто LogStats.update проверяет размер счётчиков, строк
+_COMPACT_EVERY = 65536
+
+log_line_re = re.compile(rb'(?P<ip>\S+) \S+ \S+ \[(?P<time>[^\]]+)\] "(?P<method>\S+) (?P<path>\S+) [^\"]+" (?P<status>\d{3})')
+
+def open_log(path: str) -> BinaryIO:
+    """Лог в двоичном режиме; .gz распаковывается на лету."""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb', buffering=0)
+
+def read_lines(f: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Строки файла (без перевода строки), читая его блоками по chunk_size байт."""
+    tail = b''
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        lines = chunk.split(b'\n')
+        lines[0] = tail + lines[0]
+        tail = lines.pop()
+        yield from lines
+    if tail:
+        yield tail
+
+def parse_lines(lines: Iterable[bytes]) -> Iterator[Tuple[Optional[tuple], Optional[bytes]]]:
+    """Для каждой строки — ((ip, path, status) или None, User-Agent или None)."""
+    search = log_line_re.search
+    for line in lines:
+        m = search(line)
+        ua = None
+        # user-agent (если есть)
+        if b'" "' in line:
+            ua = line.rsplit(b'" "', 1)[-1].strip().strip(b'"') or None
+        yield (m.group('ip', 'path', 'status') if m else None), ua
+
+class TopCounter:
+    """
+    Счётчик частых значений с ограниченной памятью. Пока различных значений не больше
+    2 * capacity, счёт точный; дальше остаются не больше capacity самых частых, а редкие отбрасываются
+    (approximate становится True). Для топ-N при N много меньше capacity результат практически точный.
+    """
+    __slots__ = ('capacity', 'counts', 'approximate')
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.counts: Dict[bytes, int] = {}
+        self.approximate = False
+
+    def add(self, key: bytes) -> None:
+        counts = self.counts
+        counts[key] = counts.get(key, 0) + 1
+        if len(counts) > 2 * self.capacity:
+            self.compact()
+
+    def compact(self) -> None:
+        """Оставляет не больше capacity самых частых значений, если их стало больше 2 * capacity."""
+        counts = self.counts
+        if len(counts) <= 2 * self.capacity:
+            return
+        # Порог — счёт capacity-го по частоте значения; остаются значения со счётом выше порога
+        values = sorted(counts.values())
+        threshold = values[len(values) - self.capacity - 1]
+        self.counts = {k: v for k, v in counts.items() if v > threshold}
+        self.approximate = True
+
+    def most_common(self, n: int) -> List[Tuple[bytes, int]]:
+        return heapq.nlargest(n, self.counts.items(), key=lambda kv: kv[1])
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+class LogStats:
+    """Счётчики по логу: статусы, пути, IP, User-Agent и пути ответов 4xx/5xx по каждому статусу."""
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.statuses: Counter = Counter()
+        self.paths = TopCounter(capacity)
+        self.ips = TopCounter(capacity)
+        self.user_agents = TopCounter(capacity)
+        self.errors: Dict[bytes, TopCounter] = {}
+        self.lines = 0
+        self.matched = 0
+
+    def update(self, records: Iterable[Tuple[Optional[tuple], Optional[bytes]]]) -> 'LogStats':
+        statuses = self.statuses
+        errors = self.errors
+        lines = matched = 0
+        # Словари счётчиков — в локальных переменных: вызов метода на каждую строку заметно дороже;
+        # размер проверяется раз в _COMPACT_EVERY строк
+        paths, ips, uas = self.paths.counts, self.ips.counts, self.user_agents.counts
+        check = lines + _COMPACT_EVERY
+        for request, ua in records:
+            lines += 1
+            if request is not None:
+                matched += 1
+                ip, path, status = request
+                statuses[status] += 1
+                paths[path] = paths.get(path, 0) + 1
+                ips[ip] = ips.get(ip, 0) + 1
+                if status[0] in b'45':
+                    counter = errors.get(status)
+                    if counter is None:
+                        counter = errors[status] = TopCounter(self.capacity)
+                    counter.counts[path] = counter.counts.get(path, 0) + 1
+            if ua is not None:
+                uas[ua] = uas.get(ua, 0) + 1
+            if lines == check:
+                check += _COMPACT_EVERY
+                self._compact()
+                paths, ips, uas = self.paths.counts, self.ips.counts, self.user_agents.counts
+        self._compact()
+        self.lines += lines
+        self.matched += matched
+        return self
+
+    def _compact(self) -> None:
+        for counter in (self.paths, self.ips, self.user_agents, *self.errors.values()):
+            counter.compact()
+
+    @property
+    def approximate(self) -> bool:
+        return any(c.approximate for c in (self.paths, self.ips, self.user_agents, *self.errors.values()))
+
+def analyze_log(f: BinaryIO, capacity: int = DEFAULT_CAPACITY, chunk_size: int = CHUNK_SIZE) -> LogStats:
+    """Счётчики по открытому в двоичном режиме логу."""
+    return LogStats(capacity).update(parse_lines(read_lines(f, chunk_size)))
+
+def text(value: bytes) -> str:
+    """Значение из лога для вывода: байты, не являющиеся UTF-8, заменяются."""
+    return value.decode('utf-8', 'replace')
@@ -0,0 +1,62 @@
+from typing import Dict, Iterable, List, Set
+
+class MultiPatternMatcher:
+    """
+    Автомат Ахо–Корасик: ищет сразу все строки-образцы в тексте за один проход.
+
+    Строится один раз по всем образцам (O(суммарной длины)), после чего
+    find_all(text) стоит O(len(text) + число найденных), сколько бы ни было образцов.
+    Находит и пересекающиеся, и вложенные вхождения: в '/api/v1/x' есть и '/api', и '/api/v1'.
+    """
+    def __init__(self, patterns: Iterable[str]):
+        # Состояние — номер; переходы — dict символ -> состояние
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Образцы, которые заканчиваются в состоянии (свой и по цепочке fail)
+        self._out: List[tuple] = [()]
+        for p in dict.fromkeys(patterns):
+            if p:
+                self._add(p)
+        self._build()
+
+    def _add(self, pattern: str) -> None:
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+                self._goto[state][ch] = nxt
+            state = nxt
+        self._out[state] = (pattern,)
+
+    def _build(self) -> None:
+        goto, fail, out = self._goto, self._fail, self._out
+        queue = list(goto[0].values())
+        for state in queue:
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0)
+                fail[nxt] = target if target != nxt else 0
+                if out[fail[nxt]]:
+                    out[nxt] = out[nxt] + out[fail[nxt]]
+
+    def find_all(self, text: str) -> Set[str]:
+        """Все образцы, которые встречаются в text как подстроки."""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        state = 0
+        for ch in text:
+            nxt = goto[state].get(ch)
+            while nxt is None and state:
+                state = fail[state]
+                nxt = goto[state].get(ch)
+            state = nxt or 0
+            if out[state]:
+                found.update(out[state])
+        return found
@@ -0,0 +1,37 @@
+from functools import lru_cache
+from typing import Optional
+import re
+
+try:
+    from re import _parser as _sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse as _sre_parse
+
+# Именованные группы PCRE: (?<name>...) и (?'name'...) -> (?P<name>...)
+_NAMED_GROUP_RE = re.compile(r"\(\?(?:<([A-Za-z_]\w*)>|'([A-Za-z_]\w*)')")
+
+# Верхняя граница повтора у *, + и {n,} в дереве разбора
+MAXREPEAT = _sre_parse.MAXREPEAT
+
+def translate(pattern: str) -> str:
+    """Синтаксис PCRE, которого нет в Python re (именованные группы), в синтаксис re."""
+    return _NAMED_GROUP_RE.sub(lambda m: f"(?P<{m.group(1) or m.group(2)}>", pattern)
+
+@lru_cache(maxsize=None)
+def compile_pattern(pattern: str, ignore_case: bool = False) -> Optional[re.Pattern]:
+    """
+    Регулярное выражение nginx (PCRE) в виде Python re; None, если не компилируется.
+    Результат кэшируется: одинаковые паттерны в тысячах правил компилируются один раз.
+    """
+    try:
+        return re.compile(translate(pattern), re.IGNORECASE if ignore_case else 0)
+    except (re.error, OverflowError, RecursionError):
+        return None
+
+@lru_cache(maxsize=None)
+def parse_pattern(pattern: str):
+    """Дерево разбора regex (модуль re._parser / sre_parse); None при ошибке."""
+    try:
+        return _sre_parse.parse(translate(pattern))
+    except (re.error, OverflowError, RecursionError):
+        return None
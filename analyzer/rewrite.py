@@ -1,37 +1,352 @@
-from analyzer.base import Analyzer
-from typing import List, Dict, Any
+from analyzer.base import Rule, run_rules
+from analyzer.pcre import compile_pattern, parse_pattern, MAXREPEAT
+from analyzer.route import LocationMatcher
+from parser.nodes import Block
+from functools import lru_cache, partial
+from typing import Callable, List, Dict, Any, Optional, Tuple
 import re
 
+_FLAG_RE = re.compile(r'\b(last|break|redirect|permanent)\b')
+
+# $1, ${1}, $name, ${name} в цели rewrite
+_VARIABLE_RE = re.compile(r'\$(?:\{\w+\}|\w+)')
+# Подстановка вместо переменных (кроме групп паттерна) при вычислении цели
+_SAMPLE = 'x'
+# Цели, после которых nginx отвечает редиректом, а не ищет location заново
+_EXTERNAL = ('http://', 'https://', '$scheme')
+
+@lru_cache(maxsize=None)
+def backtracking_risk(pattern: str) -> Optional[str]:
+    """
+    Фрагмент regex, на котором возможен катастрофический откат (None — не найден):
+    неограниченный квантификатор внутри другого неограниченного, как в (a+)+ или (.*\\/)*.
+    """
+    parsed = parse_pattern(pattern)
+    return _nested_repeat(parsed, False) if parsed is not None else None
+
+def _nested_repeat(items, inside: bool) -> Optional[str]:
+    for op, av in items:
+        name = str(op)
+        if name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT'):
+            _, hi, sub = av
+            unbounded = hi == MAXREPEAT and name != 'POSSESSIVE_REPEAT'
+            if unbounded and inside:
+                return 'вложенные неограниченные квантификаторы'
+            found = _nested_repeat(sub, inside or unbounded)
+            if found:
+                return found
+        elif name == 'SUBPATTERN':
+            found = _nested_repeat(av[-1], inside)
+            if found:
+                return found
+        elif name == 'BRANCH':
+            for branch in av[1]:
+                found = _nested_repeat(branch, inside)
+                if found:
+                    return found
+        elif name in ('ASSERT', 'ASSERT_NOT'):
+            found = _nested_repeat(av[1], inside)
+            if found:
+                return found
+    return None
+
+def _literal_prefix(pattern: str) -> Optional[str]:
+    """Обязательное начало строки для паттерна '^/literal...'; None — паттерн не привязан к началу."""
+    # С альтернативой верхнего уровня ('^/a|/b') начало не обязательно
+    if not pattern.startswith('^') or '|' in pattern:
+        return None
+    prefix = []
+    for ch in pattern[1:]:
+        if ch in '.^$*+?{}[]()|\\':
+            # Символ перед квантификатором может не войти в строку
+            if ch in '*?{' and prefix:
+                prefix.pop()
+            break
+        prefix.append(ch)
+    return ''.join(prefix)
+
+@lru_cache(maxsize=None)
+def pattern_example(pattern: str) -> Optional[Tuple[str, Dict[str, str]]]:
+    """
+    Короткая строка, которую паттерн должен принять, и тексты его групп ('1', 'name' -> текст);
+    None, если паттерн не разбирается. Нужна, чтобы подставить $1/$name в цель rewrite.
+    """
+    parsed = parse_pattern(pattern)
+    if parsed is None:
+        return None
+    groups: Dict[str, str] = {}
+    text = _example(parsed, groups)
+    # Состояние разбора: parsed.state, до Python 3.11 — parsed.pattern
+    state = getattr(parsed, 'state', None) or getattr(parsed, 'pattern', None)
+    for name, number in getattr(state, 'groupdict', {}).items():
+        if str(number) in groups:
+            groups[name] = groups[str(number)]
+    return text, groups
+
+# Символы-кандидаты для классов [...] и \w, \d, \s
+_CANDIDATES = 'a1x_-.Z /'
+
+def _example(items, groups) -> str:
+    out = []
+    for op, av in items:
+        name = str(op)
+        if name == 'LITERAL':
+            out.append(chr(av))
+        elif name == 'NOT_LITERAL':
+            out.append('a' if chr(av) != 'a' else 'b')
+        elif name == 'ANY':
+            out.append('a')
+        elif name == 'IN':
+            out.append(_set_example(av))
+        elif name == 'BRANCH':
+            out.append(_example(av[1][0], groups))
+        elif name == 'SUBPATTERN':
+            text = _example(av[-1], groups)
+            if av[0] is not None:
+                groups[str(av[0])] = text
+            out.append(text)
+        elif name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT'):
+            lo, hi, sub = av
+            count = lo or (1 if hi == MAXREPEAT else 0)
+            out.append(_example(sub, groups) * count)
+        elif name == 'GROUPREF':
+            out.append(groups.get(str(av), ''))
+        elif name == 'ATOMIC_GROUP':
+            out.append(_example(av, groups))
+    return ''.join(out)
+
+def _set_example(items) -> str:
+    first = items[0] if items else None
+    if first is not None and str(first[0]) == 'LITERAL':
+        return chr(first[1])
+    if first is not None and str(first[0]) == 'RANGE':
+        return chr(first[1][0])
+    return next((ch for ch in _CANDIDATES if _in_set(items, ch)), 'a')
+
+def _in_set(items, ch: str) -> bool:
+    code = ord(ch)
+    negate = False
+    found = False
+    for op, av in items:
+        name = str(op)
+        if name == 'NEGATE':
+            negate = True
+        elif name == 'LITERAL':
+            found = found or code == av
+        elif name == 'RANGE':
+            found = found or av[0] <= code <= av[1]
+        elif name == 'CATEGORY':
+            category = str(av)
+            if category.endswith('DIGIT'):
+                match = ch.isdigit()
+            elif category.endswith('WORD'):
+                match = ch.isalnum() or ch == '_'
+            elif category.endswith('SPACE'):
+                match = ch.isspace()
+            else:
+                match = False
+            if 'NOT_' in category:
+                match = not match
+            found = found or match
+    return found != negate
+
+def _target_path(target: str, groups: Dict[str, str]) -> str:
+    """Путь после rewrite: $1/$name — тексты групп паттерна, прочие переменные — образец, без аргументов."""
+    def value(m):
+        name = m.group(0)[1:].strip('{}')
+        return groups.get(name, _SAMPLE)
+    return _VARIABLE_RE.sub(value, target.split('?', 1)[0])
+
+class RewriteGraph:
+    """
+    Граф rewrite-правил одного server-а: ребро r -> s, если после r (флаг last или без флага,
+    не редирект) nginx заново выбирает location для нового URI (select), выбирает location правила s,
+    и паттерн s совпадает с этим URI. Циклы графа — петли, которые nginx обрывает
+    через 10 итераций ответом 500. Правила уровня server выполняются один раз до выбора
+    location и в циклы не входят.
+
+    Паттерны с обязательным началом ('^/old/...') раскладываются по этому префиксу,
+    поэтому цель проверяется только против паттернов, префикс которых — её начало,
+    и против непривязанных паттернов. Совпадения для одинаковых целей запоминаются.
+    """
+    def __init__(self, rules: List[Dict[str, Any]], select: Callable[[str], Optional[Block]]):
+        self.rules = rules
+        self.select = select
+        # id(location) -> (префикс -> номера правил, непривязанные правила)
+        self._by_location: Dict[int, tuple] = {}
+        for i, r in enumerate(rules):
+            if r['location'] is None or r['regex'] is None:
+                continue
+            entry = self._by_location.get(id(r['location']))
+            if entry is None:
+                entry = self._by_location[id(r['location'])] = ({}, [])
+            prefix = _literal_prefix(r['pattern'])
+            if prefix is None:
+                entry[1].append(i)
+            else:
+                entry[0].setdefault(prefix, []).append(i)
+        self._memo: Dict[str, List[int]] = {}
+        self.edges = [self._successors(r) for r in rules]
+
+    def matches(self, path: str) -> List[int]:
+        """Номера правил, которые сработают на URI path после выбора location, в порядке объявления."""
+        found = self._memo.get(path)
+        if found is not None:
+            return found
+        found = self._memo[path] = []
+        location = self.select(path)
+        entry = self._by_location.get(id(location)) if location is not None else None
+        if entry is None:
+            return found
+        by_prefix, floating = entry
+        candidates = list(floating)
+        for end in range(len(path) + 1):
+            bucket = by_prefix.get(path[:end])
+            if bucket:
+                candidates.extend(bucket)
+        rules = self.rules
+        found.extend(sorted(i for i in candidates if rules[i]['regex'].search(path)))
+        return found
+
+    def _successors(self, r) -> List[int]:
+        if r['flag'] not in ('last', None) or r['target'].startswith(_EXTERNAL):
+            return []
+        example = pattern_example(r['pattern'])
+        return self.matches(_target_path(r['target'], example[1] if example else {}))
+
+    def cycles(self) -> List[List[int]]:
+        """Циклы: компоненты сильной связности (Тарьян, без рекурсии) из 2+ правил или правило-петля."""
+        edges = self.edges
+        index = {}
+        low = {}
+        on_stack = set()
+        stack = []
+        result = []
+        counter = 0
+        for root in range(len(edges)):
+            if root in index:
+                continue
+            work = [(root, 0)]
+            while work:
+                v, pos = work.pop()
+                if pos == 0:
+                    index[v] = low[v] = counter
+                    counter += 1
+                    stack.append(v)
+                    on_stack.add(v)
+                if pos < len(edges[v]):
+                    work.append((v, pos + 1))
+                    w = edges[v][pos]
+                    if w not in index:
+                        work.append((w, 0))
+                    elif w in on_stack:
+                        low[v] = min(low[v], index[w])
+                    continue
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[v])
+                if low[v] == index[v]:
+                    component = []
+                    while True:
+                        w = stack.pop()
+                        on_stack.discard(w)
+                        component.append(w)
+                        if w == v:
+                            break
+                    if len(component) > 1 or v in edges[v]:
+                        result.append(sorted(component))
+        result.sort()
+        return result
+
+class RewriteRule(Rule):
+    """
+    Проблемы с rewrite: циклы (в том числе через несколько правил), конфликты,
+    правила без флага, regex с риском катастрофического отката.
+    Результат: [{type, context, value}]
+    check_cycles=False — без поиска циклов (они ищутся внутри каждого server-а отдельно,
+    и их можно найти, запустив правило по server-блоку).
+    """
+    directives = ('rewrite',)
+    blocks = ('server', 'location')
+
+    def __init__(self, check_cycles: bool = True):
+        self._check_cycles = check_cycles
+        self._rewrites = []
+        self._no_flag = []
+        self._redos = []
+        # Открытые server-ы и location-ы: у правила — ближайший location и server
+        self._servers = []
+        self._locations = []
+
+    def visit(self, node, parent):
+        if isinstance(node, Block):
+            (self._servers if node.name == 'server' else self._locations).append(node)
+            return
+        args = node['args']
+        parts = args.split()
+        if len(parts) >= 2:
+            pattern, target = parts[0], parts[1]
+            flag = parts[2] if len(parts) > 2 and _FLAG_RE.fullmatch(parts[2]) else None
+            self._rewrites.append({
+                'order': len(self._rewrites), 'pattern': pattern, 'target': target, 'flag': flag, 'context': parent, 'raw': args,
+                'regex': compile_pattern(pattern),
+                'server': self._servers[-1] if self._servers else None,
+                'location': self._locations[-1] if self._locations else None,
+            })
+            risk = backtracking_risk(pattern)
+            if risk:
+                self._redos.append({'type': 'rewrite_redos', 'context': parent, 'value': f"{args} ({risk})"})
+        # Неэффективные rewrite (например, без break/last/redirect/permanent)
+        if not _FLAG_RE.search(args):
+            self._no_flag.append({'type': 'rewrite_no_flag', 'context': parent, 'value': args})
+
+    def leave(self, node, parent):
+        if node.name == 'server':
+            self._servers.pop()
+        else:
+            self._locations.pop()
+
+    def merge(self, other):
+        offset = len(self._rewrites)
+        self._rewrites.extend(dict(r, order=offset + r['order']) for r in other._rewrites)
+        self._no_flag.extend(other._no_flag)
+        self._redos.extend(other._redos)
+
+    def result(self):
+        issues = []
+        if self._check_cycles:
+            issues.extend(self._cycles())
+        # Проверка на потенциальные конфликты (два одинаковых паттерна с разными target)
+        seen = {}
+        for r in self._rewrites:
+            key = r['pattern']
+            if key in seen and seen[key] != r['target']:
+                issues.append({'type': 'rewrite_conflict', 'context': r['context'], 'value': f"{key} -> {seen[key]} и {key} -> {r['target']}"})
+            seen[key] = r['target']
+        return issues + self._no_flag + self._redos
+
+    def _cycles(self) -> List[Dict[str, Any]]:
+        # Циклы ищутся в графе правил каждого server-а
+        groups = {}
+        for r in self._rewrites:
+            server = r['server']
+            groups.setdefault(id(server) if server is not None else None, (server, []))[1].append(r)
+        matcher = LocationMatcher()
+        cycles = []
+        for server, rules in groups.values():
+            if server is None:
+                continue
+            graph = RewriteGraph(rules, partial(matcher.match, server))
+            for component in graph.cycles():
+                cycles.append([rules[i] for i in component])
+        cycles.sort(key=lambda c: c[0]['order'])
+        return [{'type': 'rewrite_cycle', 'context': cycle[0]['context'], 'value': ' → '.join(r['raw'] for r in cycle)}
+                for cycle in cycles]
+
 def find_rewrite_issues(tree) -> List[Dict[str, Any]]:
     """
-    Находит потенциальные проблемы с rewrite: циклы, конфликты, неэффективные правила.
+    Находит потенциальные проблемы с rewrite: циклы, конфликты, неэффективные правила,
+    regex с риском катастрофического отката.
     Возвращает список: [{type, context, value}]
     """
-    analyzer = Analyzer(tree)
-    issues = []
-    rewrites = []
-    for d, parent in analyzer.walk():
-        if d.get('directive') == 'rewrite':
-            args = d.get('args', '')
-            parts = args.split()
-            if len(parts) >= 2:
-                pattern, target = parts[0], parts[1]
-                rewrites.append({'pattern': pattern, 'target': target, 'context': parent, 'raw': args})
-    # Проверка на циклы (rewrite на себя)
-    for r in rewrites:
-        if r['pattern'] == r['target']:
-            issues.append({'type': 'rewrite_cycle', 'context': r['context'], 'value': r['raw']})
-    # Проверка на потенциальные конфликты (два одинаковых паттерна с разными target)
-    seen = {}
-    for r in rewrites:
-        key = r['pattern']
-        if key in seen and seen[key] != r['target']:
-            issues.append({'type': 'rewrite_conflict', 'context': r['context'], 'value': f"{key} -> {seen[key]} и {key} -> {r['target']}"})
-        seen[key] = r['target']
-    # Неэффективные rewrite (например, без break/last/redirect/permanent)
-    for d, parent in analyzer.walk():
-        if d.get('directive') == 'rewrite':
-            args = d.get('args', '')
-            if not re.search(r'\b(last|break|redirect|permanent)\b', args):
-                issues.append({'type': 'rewrite_no_flag', 'context': parent, 'value': args})
-    return issues 
\ No newline at end of file
+    return run_rules(tree, [RewriteRule()])[0]
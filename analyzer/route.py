@@ -1,60 +1,377 @@
-from urllib.parse import urlparse
-from analyzer.base import Analyzer
-from typing import Dict, Any, Optional
-import re
+from urllib.parse import urlparse, unquote
+from typing import Dict, Any, List, Optional, Tuple
+import ipaddress
+from analyzer.conflicts import location_modifier, normalize_listen, DEFAULT_LISTEN
+from analyzer.pcre import compile_pattern
+from parser.nodes import Block, Directive, iter_nodes
 
-def find_route(tree, url: str) -> Optional[Dict[str, Any]]:
+# Директивы, которые route показывает для найденного location/server
+ROUTE_DIRECTIVES = (
+    'root', 'alias', 'index', 'try_files', 'return', 'proxy_set_header', 'add_header',
+    'limit_req', 'limit_conn', 'client_max_body_size',
+)
+
+class _LabelTrie:
+    """
+    Префиксное дерево по меткам имени хоста: для '*.example.com' метки идут с конца
+    (com, example), для 'mail.*' — с начала. Ищется самое длинное совпадение.
+    """
+    __slots__ = ('children', 'server', 'self_match')
+
+    def __init__(self):
+        self.children: Dict[str, '_LabelTrie'] = {}
+        self.server = None
+        # '.example.com' совпадает и с самим example.com
+        self.self_match = False
+
+    def add(self, labels: List[str], server, self_match: bool = False) -> None:
+        node = self
+        for label in labels:
+            node = node.children.setdefault(label, _LabelTrie())
+        # При повторе имени действует первый server
+        if node.server is None:
+            node.server = server
+            node.self_match = self_match
+
+    def longest(self, labels: List[str]):
+        """Server самого длинного шаблона, который совпадает с labels (хотя бы одна метка сверх шаблона)."""
+        node = self
+        found = None
+        for i, label in enumerate(labels):
+            node = node.children.get(label)
+            if node is None:
+                break
+            if node.server is not None and (i + 1 < len(labels) or node.self_match):
+                found = node.server
+        return found
+
+class _ServerNames:
+    """Имена server-ов одного слушающего сокета в порядке проверки nginx."""
+    def __init__(self):
+        self.exact: Dict[str, Block] = {}
+        self.head = _LabelTrie()
+        self.tail = _LabelTrie()
+        self.regexes: List[Tuple[Any, Block]] = []
+        self.default: Optional[Block] = None
+        self.first: Optional[Block] = None
+
+    def add(self, server: Block, names: List[str], default: bool) -> None:
+        if self.first is None:
+            self.first = server
+        if default and self.default is None:
+            self.default = server
+        for name in names:
+            if name.startswith('~'):
+                regex = compile_pattern(name[1:], True)
+                if regex is not None:
+                    self.regexes.append((regex, server))
+                continue
+            name = name.lower()
+            if name.startswith('*.'):
+                self.head.add(name[2:].split('.')[::-1], server)
+            elif name.startswith('.'):
+                self.exact.setdefault(name[1:], server)
+                self.head.add(name[1:].split('.')[::-1], server, self_match=True)
+            elif name.endswith('.*'):
+                self.tail.add(name[:-2].split('.'), server)
+            else:
+                self.exact.setdefault(name, server)
+
+    def select(self, host: str) -> Tuple[Block, str]:
+        """(server, способ выбора): exact, wildcard, regex или default."""
+        server = self.exact.get(host)
+        if server is not None:
+            return server, 'exact'
+        labels = host.split('.')
+        server = self.head.longest(labels[::-1])
+        if server is None:
+            server = self.tail.longest(labels)
+        if server is not None:
+            return server, 'wildcard'
+        for regex, server in self.regexes:
+            if regex.search(host):
+                return server, 'regex'
+        return (self.default if self.default is not None else self.first), 'default'
+
+class _Level:
+    """Location-ы одного уровня (server или location с вложенными): точные, префиксные, regex."""
+    __slots__ = ('exact', 'prefix', 'regexes')
+
+    def __init__(self, blocks: List[Block]):
+        self.exact: Dict[str, Block] = {}
+        # путь -> (location, '^~' ли это)
+        self.prefix: Dict[str, Tuple[Block, bool]] = {}
+        self.regexes: List[Tuple[Any, Block]] = []
+        for block in blocks:
+            mod, path = location_modifier(block.arg or '')
+            if mod == '=':
+                self.exact.setdefault(path, block)
+            elif mod in ('', '^~'):
+                self.prefix.setdefault(path, (block, mod == '^~'))
+            elif mod in ('~', '~*'):
+                regex = compile_pattern(path, mod == '~*')
+                if regex is not None:
+                    self.regexes.append((regex, block))
+
+    def longest_prefix(self, path: str):
+        prefix = self.prefix
+        for end in range(len(path), -1, -1):
+            found = prefix.get(path[:end])
+            if found is not None:
+                return found
+        return None
+
+class LocationMatcher:
+    """
+    Выбор location по алгоритму nginx (ngx_http_core_find_location):
+    точное '=' совпадение; иначе самый длинный префикс, а в нём — вложенные location-ы;
+    если префикс с '^~' — regex этого уровня не проверяются; иначе первый подходящий
+    regex этого уровня (с его вложенными), иначе найденный префикс.
+    Уровни строятся при первом обращении и запоминаются.
+    """
+    def __init__(self):
+        # id(блок) -> его уровень (None — нет вложенных location-ов)
+        self._levels: Dict[int, Optional[_Level]] = {}
+        self._keep: List[Block] = []
+
+    def _level(self, block: Block) -> Optional[_Level]:
+        key = id(block)
+        if key not in self._levels:
+            nested = [d for d in iter_nodes(block.directives) if isinstance(d, Block) and d.name == 'location']
+            self._levels[key] = _Level(nested) if nested else None
+            # Блок держится, пока жив matcher: id не переиспользуется
+            self._keep.append(block)
+        return self._levels[key]
+
+    def match(self, server: Block, path: str) -> Optional[Block]:
+        level = self._level(server)
+        return self._find(level, path)[0] if level is not None else None
+
+    def _find(self, level: _Level, path: str) -> Tuple[Optional[Block], bool]:
+        """(location, окончательный ли выбор): окончательный — точный или regex."""
+        found = level.exact.get(path)
+        if found is not None:
+            return found, True
+        noregex = False
+        prefix = level.longest_prefix(path)
+        if prefix is not None:
+            found, noregex = prefix
+            nested = self._level(found)
+            if nested is not None:
+                inner, done = self._find(nested, path)
+                if inner is not None:
+                    found = inner
+                if done:
+                    return found, True
+        if not noregex:
+            for regex, block in level.regexes:
+                if regex.search(path):
+                    nested = self._level(block)
+                    inner = self._find(nested, path)[0] if nested is not None else None
+                    return (inner if inner is not None else block), True
+        return found, False
+
+def _listens(tree, server: Block) -> Dict[str, bool]:
+    """Адрес -> default_server для listen-ов server-а; без listen — *:80."""
+    result: Dict[str, bool] = {}
+    for d in tree.find('listen', within=server):
+        addr = normalize_listen(d['args'])
+        if addr is not None:
+            words = d['args'].split()[1:]
+            result[addr] = result.get(addr, False) or 'default_server' in words or 'default' in words
+    return result or {DEFAULT_LISTEN: False}
+
+class RoutingTable:
+    """
+    Таблица маршрутизации, собранная один раз по дереву: server выбирается как в nginx —
+    по сокету listen (адрес:порт), затем по имени: точное (хэш), самый длинный wildcard
+    '*.example.com' (дерево меток с конца), 'mail.*', первый подходящий regex '~...',
+    иначе default_server сокета или первый server на нём. Location — LocationMatcher.
+    """
+    def __init__(self, tree):
+        self.tree = tree
+        self.sockets: Dict[str, _ServerNames] = {}
+        for server in tree.servers():
+            names = [w for d in tree.find('server_name', within=server) for w in d['args'].split()]
+            for addr, default in _listens(tree, server).items():
+                table = self.sockets.get(addr)
+                if table is None:
+                    table = self.sockets[addr] = _ServerNames()
+                table.add(server, names, default)
+        self.locations = LocationMatcher()
+
+    def _socket(self, host: str, port: str) -> Optional[_ServerNames]:
+        try:
+            ip = ipaddress.ip_address(host)
+        except ValueError:
+            ip = None
+        candidates = []
+        if ip is not None:
+            candidates.append(f"[{host}]:{port}" if ip.version == 6 else f"{host}:{port}")
+        candidates += [f"*:{port}", f"[::]:{port}"]
+        for addr in candidates:
+            table = self.sockets.get(addr)
+            if table is not None:
+                return table
+        # Сокет на конкретном адресе: запрос на этот порт придёт на один из них
+        suffix = f":{port}"
+        for addr, table in self.sockets.items():
+            if addr.endswith(suffix):
+                return table
+        return None
+
+    def select_server(self, host: str, port: str) -> Tuple[Optional[Block], str]:
+        table = self._socket(host, port)
+        if table is None:
+            return None, ''
+        return table.select((host or '').lower().rstrip('.'))
+
+    def lookup(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        {'server', 'location', 'server_match'} для URL или None, если порт никто не слушает.
+        ValueError — URL не разбирается (порт вне 0-65535, неверный IPv6-адрес).
+        """
+        parsed = urlparse(url)
+        host = parsed.hostname or ''
+        port = str(parsed.port or (443 if parsed.scheme == 'https' else 80))
+        path = unquote(parsed.path or '/')
+        server, how = self.select_server(host, port)
+        if server is None:
+            return None
+        return {'server': server, 'location': self.locations.match(server, path), 'server_match': how}
+
+def find_route(tree, url: str, table: RoutingTable = None) -> Optional[Dict[str, Any]]:
     """
     Находит server и location, которые обслуживают данный URL.
-    Возвращает: {'server': ..., 'location': ..., 'proxy_pass': ...}
-    """
-    parsed = urlparse(url)
-    host = parsed.hostname
-    port = str(parsed.port or (443 if parsed.scheme == 'https' else 80))
-    path = parsed.path or '/'
-    analyzer = Analyzer(tree)
-    best_server = None
-    best_server_score = -1
-    # 1. Ищем подходящий server
-    for d, _ in analyzer.walk():
-        if d.get('block') == 'server':
-            names = []
-            listens = []
-            for sub, _ in analyzer.walk(d['directives'], d):
-                if sub.get('directive') == 'server_name':
-                    names += sub.get('args', '').split()
-                if sub.get('directive') == 'listen':
-                    listens.append(sub.get('args', ''))
-            score = 0
-            if host and any(_host_match(host, n) for n in names):
-                score += 2
-            if port and any(port in l for l in listens):
-                score += 1
-            if score > best_server_score:
-                best_server = d
-                best_server_score = score
-    if not best_server or best_server_score < 2:
+    Возвращает: {'server': ..., 'location': ..., 'proxy_pass': ..., 'proxy_pass_if': ..., 'server_match': ...,
+    'effective': {имя: [args, ...]}}
+    server_match — как выбран server: exact, wildcard, regex или default (имя не подошло).
+    Если у location нет своего proxy_pass, берётся proxy_pass из его блоков if; тогда
+    proxy_pass_if — условие этого if (иначе None).
+    effective — действующие в найденном блоке директивы из ROUTE_DIRECTIVES
+    с учётом наследования из server/http (см. parser/effective.py).
+    Для серии запросов передайте table = RoutingTable(tree), чтобы не строить её заново.
+    """
+    if table is None:
+        table = RoutingTable(tree)
+    found = table.lookup(url)
+    if found is None:
         return None
-    # 2. Внутри server ищем лучший location (longest prefix match)
-    best_loc = None
-    best_len = -1
-    proxy_pass = None
-    for sub, _ in analyzer.walk(best_server['directives'], best_server):
-        if sub.get('block') == 'location':
-            loc = sub.get('arg', '')
-            if path.startswith(loc) and len(loc) > best_len:
-                best_loc = sub
-                best_len = len(loc)
-    if best_loc:
-        for d, _ in analyzer.walk(best_loc.get('directives', []), best_loc):
-            if d.get('directive') == 'proxy_pass':
-                proxy_pass = d.get('args')
-    return {'server': best_server, 'location': best_loc, 'proxy_pass': proxy_pass}
-
-def _host_match(host, pattern):
-    # Примитивная поддержка wildcard
-    if pattern == '_':
-        return True
-    if pattern.startswith('*.'):
-        return host.endswith(pattern[1:])
-    return host == pattern 
\ No newline at end of file
+    best_server, best_loc = found['server'], found['location']
+    effective = tree.effective
+    block = best_loc or best_server
+    proxy_pass = effective.value(best_loc, 'proxy_pass') if best_loc else None
+    condition = None
+    if best_loc is not None and proxy_pass is None:
+        proxy_pass, condition = _conditional_proxy_pass(best_loc)
+    directives = {}
+    for name in ROUTE_DIRECTIVES:
+        values = effective.get(block, name)
+        if values:
+            directives[name] = [d['args'] for d in values]
+    return {'server': best_server, 'location': best_loc, 'proxy_pass': proxy_pass, 'proxy_pass_if': condition,
+            'server_match': found['server_match'], 'effective': directives}
+
+def _conditional_proxy_pass(location: Block) -> Tuple[Optional[str], Optional[str]]:
+    """(аргументы, условие) последнего proxy_pass в блоках if location-а или (None, None)."""
+    found = (None, None)
+    for d in iter_nodes(location.directives):
+        if isinstance(d, Block) and d.name == 'if':
+            for sub in iter_nodes(d.directives):
+                if isinstance(sub, Directive) and sub.name == 'proxy_pass':
+                    found = (sub['args'], d.arg)
+    return found
+
+def proxy_upstream(proxy_pass: Optional[str], upstreams) -> Optional[str]:
+    """Имя upstream-а, на который указывает proxy_pass (http://backend/path -> backend), или None."""
+    if not proxy_pass:
+        return None
+    host = proxy_pass.split('://', 1)[-1].split('/', 1)[0]
+    return host if host in upstreams else None
+
+class RouteResolver:
+    """
+    Поиск маршрутов по нескольким разобранным конфигам: таблицы маршрутизации строятся
+    один раз, после чего каждый URL — только поиск по таблицам.
+    Совпадение по имени в любом конфиге важнее default server-а в первом из них.
+    """
+    def __init__(self, trees: List[Tuple[str, Any]]):
+        # (путь к конфигу, дерево, таблица, upstream-ы)
+        self.configs = [(conf, tree, RoutingTable(tree), tree.get_upstreams()) for conf, tree in trees]
+
+    def resolve(self, url: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """(конфиг, результат find_route) или None."""
+        found = self._resolve(url)
+        return (self.configs[found[0]][0], found[1]) if found is not None else None
+
+    def _resolve(self, url: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        fallback = None
+        for i, (_, tree, table, _) in enumerate(self.configs):
+            res = find_route(tree, url, table)
+            if res is None:
+                continue
+            if res['server_match'] != 'default':
+                return i, res
+            if fallback is None:
+                fallback = (i, res)
+        return fallback
+
+    def view(self, url: str) -> Optional[Dict[str, Any]]:
+        """route_view найденного маршрута или None; ValueError — URL не разбирается."""
+        found = self._resolve(url)
+        if found is None:
+            return None
+        i, res = found
+        conf, tree, _, _ = self.configs[i]
+        return route_view(conf, tree, res)
+
+    def row(self, url: str) -> Dict[str, Any]:
+        """
+        Плоская запись маршрута для выгрузки (NDJSON/CSV); у ненайденного URL поля пустые,
+        у неразбираемого — ещё и error, чтобы один такой URL не прерывал всю выгрузку.
+        """
+        row = dict.fromkeys(ROW_FIELDS)
+        row['url'] = url
+        try:
+            found = self._resolve(url)
+        except ValueError as e:
+            row['error'] = f"неверный URL: {e}"
+            return row
+        if found is None:
+            return row
+        i, res = found
+        conf, tree, _, upstreams = self.configs[i]
+        server, location = res['server'], res['location']
+        names = tree.find('server_name', within=server)
+        row.update({
+            'config': conf,
+            'server': names[0]['args'] if names else None,
+            'server_match': res['server_match'],
+            'location': location.arg if location is not None else None,
+            'proxy_pass': res['proxy_pass'],
+            'upstream': proxy_upstream(res['proxy_pass'], upstreams),
+            'file': (location if location is not None else server).file,
+        })
+        return row
+
+def route_view(conf: str, tree, res: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Маршрут для вывода (commands/render.py): результат find_route без узлов дерева,
+    только строки — его можно передать клиенту демона в JSON. server — первое имя server_name.
+    """
+    server, location = res['server'], res['location']
+    names = tree.find('server_name', within=server) if server is not None else []
+    return {
+        'config': conf,
+        'server': (names[0]['args'] if names else '') if server is not None else None,
+        'server_file': server.get('__file__') if server is not None else None,
+        'server_match': res['server_match'],
+        'location': location.get('arg', '') if location is not None else None,
+        'location_file': location.get('__file__') if location is not None else None,
+        'proxy_pass': res['proxy_pass'],
+        'proxy_pass_if': res.get('proxy_pass_if'),
+        'effective': res.get('effective', {}),
+    }
+
+# Поля записи RouteResolver.row в порядке колонок CSV
+ROW_FIELDS = ('url', 'config', 'server', 'server_match', 'location', 'proxy_pass', 'upstream', 'file', 'error')
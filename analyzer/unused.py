@@ -1,29 +1,44 @@
-from analyzer.base import Analyzer
+from analyzer.base import Rule, ANY, run_rules
 from typing import List, Dict, Any
 import re
 
+_VAR_RE = re.compile(r'\$[a-zA-Z0-9_]+')
+
+class UnusedVariableRule(Rule):
+    """
+    Переменные, определённые через set/map, которые нигде не используются.
+    Результат: [{name, context}]
+    """
+    directives = (ANY,)
+
+    def __init__(self):
+        self._defined = set()
+        self._used = set()
+
+    def visit(self, node, parent):
+        args = node['args']
+        if node.name == 'set' or node.name == 'map':
+            parts = args.split()
+            if parts:
+                self._defined.add(parts[0])
+        # Ищем использование $var в любых аргументах
+        if '$' in args:
+            self._used.update(_VAR_RE.findall(args))
+
+    def merge(self, other):
+        self._defined |= other._defined
+        self._used |= other._used
+
+    def result(self):
+        unused = []
+        for var in self._defined:
+            if var not in self._used:
+                unused.append({'name': var, 'context': None})
+        return unused
+
 def find_unused_variables(tree) -> List[Dict[str, Any]]:
     """
     Находит переменные, определённые через set/map, которые не используются.
     Возвращает список: [{name, context}]
     """
-    analyzer = Analyzer(tree)
-    defined = set()
-    used = set()
-    for d, parent in analyzer.walk():
-        if d.get('directive') == 'set':
-            parts = d.get('args', '').split()
-            if parts:
-                defined.add(parts[0])
-        if d.get('directive') == 'map':
-            parts = d.get('args', '').split()
-            if parts:
-                defined.add(parts[0])
-        # Ищем использование $var в любых аргументах
-        for v in re.findall(r'\$[a-zA-Z0-9_]+', str(d.get('args',''))):
-            used.add(v)
-    unused = []
-    for var in defined:
-        if var not in used:
-            unused.append({'name': var, 'context': None})
-    return unused 
\ No newline at end of file
+    return run_rules(tree, [UnusedVariableRule()])[0]
@@ -1,4 +1,5 @@
-from analyzer.base import Analyzer
+from analyzer.base import Rule, run_rules
+from parser.nodes import Block
 from typing import List, Dict, Any
 import re
 
@@ -37,77 +38,184 @@ def _parse_size(val):
     except Exception:
         return None
 
-def find_warnings(tree) -> List[Dict[str, Any]]:
+_SCHEME_RE = re.compile(r'^(http|https)://')
+
+class WarningsRule(Rule):
     """
-    Находит потенциально опасные или неочевидные директивы и нарушения best practices.
-    Возвращает список: [{type, directive, context, value}]
+    Потенциально опасные или неочевидные директивы и нарушения best practices.
+    Результат: [{type, directive, context, value}]
+    check_headers=False — без проверки security-заголовков по всему дереву
+    (её можно запустить отдельно правилом SecurityHeadersRule),
+    check_limits=False — без проверки limit_req/limit_conn у server-ов (RequestLimitRule).
     """
-    analyzer = Analyzer(tree)
-    warnings = []
-    found_headers = set()
-    for d, parent in analyzer.walk():
+    directives = ('proxy_pass', 'autoindex', 'server_tokens', 'ssl_certificate', 'ssl_certificate_key',
+                  'ssl_protocols', 'ssl_ciphers', 'listen', 'limit_req', 'limit_conn', 'add_header',
+                  *DEPRECATED_DIRECTIVES, *LIMITS)
+    blocks = ('if', 'server')
+
+    def __init__(self, check_headers: bool = True, check_limits: bool = True):
+        self._warnings = []
+        self._headers = SecurityHeadersRule() if check_headers else None
+        self._check_limits = check_limits
+        self._tree = None
+        # Открытые server-блоки: [индекс предупреждения no_limit_req_conn, есть ли limit_*]
+        self._servers = []
+
+    def start(self, tree):
+        self._tree = tree
+
+    def visit(self, d, parent):
+        warnings = self._warnings
+        name = d.name
+        if isinstance(d, Block):
+            if name == 'if':
+                warnings.append({'type': 'if_block', 'directive': 'if', 'context': parent, 'value': ''})
+            elif self._check_limits:
+                # limit_req/limit_conn: предупреждение занимает место при входе в server,
+                # а заполняется при выходе, когда известно, были ли лимиты внутри
+                self._servers.append([len(warnings), False])
+                warnings.append(None)
+            return
+        args = d['args']
         # proxy_pass без схемы
-        if d.get('directive') == 'proxy_pass':
-            val = d.get('args', '')
-            if not re.match(r'^(http|https)://', val):
-                warnings.append({'type': 'proxy_pass_no_scheme', 'directive': 'proxy_pass', 'context': parent, 'value': val})
+        if name == 'proxy_pass':
+            if not _SCHEME_RE.match(args):
+                warnings.append({'type': 'proxy_pass_no_scheme', 'directive': 'proxy_pass', 'context': parent, 'value': args})
         # autoindex on
-        if d.get('directive') == 'autoindex' and d.get('args', '').strip() == 'on':
-            warnings.append({'type': 'autoindex_on', 'directive': 'autoindex', 'context': parent, 'value': 'on'})
-        # if внутри блока
-        if d.get('block') == 'if':
-            warnings.append({'type': 'if_block', 'directive': 'if', 'context': parent, 'value': ''})
+        elif name == 'autoindex':
+            if args.strip() == 'on':
+                warnings.append({'type': 'autoindex_on', 'directive': 'autoindex', 'context': parent, 'value': 'on'})
         # server_tokens on
-        if d.get('directive') == 'server_tokens' and d.get('args', '').strip() == 'on':
-            warnings.append({'type': 'server_tokens_on', 'directive': 'server_tokens', 'context': parent, 'value': 'on'})
+        elif name == 'server_tokens':
+            if args.strip() == 'on':
+                warnings.append({'type': 'server_tokens_on', 'directive': 'server_tokens', 'context': parent, 'value': 'on'})
         # ssl_certificate/ssl_certificate_key
-        if d.get('directive') == 'ssl_certificate' or d.get('directive') == 'ssl_certificate_key':
-            if not d.get('args', '').strip():
-                warnings.append({'type': 'ssl_missing', 'directive': d['directive'], 'context': parent, 'value': ''})
+        elif name == 'ssl_certificate' or name == 'ssl_certificate_key':
+            if not args.strip():
+                warnings.append({'type': 'ssl_missing', 'directive': name, 'context': parent, 'value': ''})
         # ssl_protocols
-        if d.get('directive') == 'ssl_protocols':
-            val = d.get('args', '')
-            if 'TLSv1' in val or 'TLSv1.1' in val:
-                warnings.append({'type': 'ssl_protocols_weak', 'directive': 'ssl_protocols', 'context': parent, 'value': val})
+        elif name == 'ssl_protocols':
+            if 'TLSv1' in args or 'TLSv1.1' in args:
+                warnings.append({'type': 'ssl_protocols_weak', 'directive': 'ssl_protocols', 'context': parent, 'value': args})
         # ssl_ciphers
-        if d.get('directive') == 'ssl_ciphers':
-            val = d.get('args', '')
-            if any(x in val for x in ['RC4', 'MD5', 'DES']):
-                warnings.append({'type': 'ssl_ciphers_weak', 'directive': 'ssl_ciphers', 'context': parent, 'value': val})
-        # listen 443 ssl
-        if d.get('directive') == 'listen' and '443' in d.get('args', '') and 'ssl' not in d.get('args', ''):
-            warnings.append({'type': 'listen_443_no_ssl', 'directive': 'listen', 'context': parent, 'value': d.get('args', '')})
-        # http2
-        if d.get('directive') == 'listen' and '443' in d.get('args', '') and 'http2' not in d.get('args', ''):
-            warnings.append({'type': 'listen_443_no_http2', 'directive': 'listen', 'context': parent, 'value': d.get('args', '')})
-        # limit_req/limit_conn
-        if d.get('block') == 'server':
-            has_limit = False
-            for sub, _ in analyzer.walk(d.get('directives', []), d):
-                if sub.get('directive') in ('limit_req', 'limit_conn'):
-                    has_limit = True
-            if not has_limit:
-                warnings.append({'type': 'no_limit_req_conn', 'directive': 'server', 'context': d, 'value': ''})
+        elif name == 'ssl_ciphers':
+            if any(x in args for x in ['RC4', 'MD5', 'DES']):
+                warnings.append({'type': 'ssl_ciphers_weak', 'directive': 'ssl_ciphers', 'context': parent, 'value': args})
+        elif name == 'listen':
+            if '443' in args:
+                # listen 443 ssl
+                if 'ssl' not in args:
+                    warnings.append({'type': 'listen_443_no_ssl', 'directive': 'listen', 'context': parent, 'value': args})
+                # http2
+                if 'http2' not in args:
+                    warnings.append({'type': 'listen_443_no_http2', 'directive': 'listen', 'context': parent, 'value': args})
+        elif name == 'limit_req' or name == 'limit_conn':
+            for server in self._servers:
+                server[1] = True
         # Security headers
-        if d.get('directive') == 'add_header':
-            for h in SECURITY_HEADERS:
-                if h in d.get('args', ''):
-                    found_headers.add(h)
+        elif name == 'add_header':
+            if self._headers is not None:
+                self._headers.visit(d, parent)
         # Deprecated directives
-        if d.get('directive') in DEPRECATED_DIRECTIVES:
-            warnings.append({'type': 'deprecated', 'directive': d['directive'], 'context': parent, 'value': DEPRECATED_DIRECTIVES[d['directive']]})
+        if name in DEPRECATED_DIRECTIVES:
+            warnings.append({'type': 'deprecated', 'directive': name, 'context': parent, 'value': DEPRECATED_DIRECTIVES[name]})
         # Проверка лимитов и буферов
-        for lim, rng in LIMITS.items():
-            if d.get('directive') == lim:
-                val = d.get('args', '').split()[0]
-                size = _parse_size(val)
-                if size is not None:
-                    if size < rng['min']:
-                        warnings.append({'type': 'limit_too_small', 'directive': lim, 'context': parent, 'value': val})
-                    if size > rng['max']:
-                        warnings.append({'type': 'limit_too_large', 'directive': lim, 'context': parent, 'value': val})
-    # Проверка отсутствующих security headers
-    for h in SECURITY_HEADERS:
-        if h not in found_headers:
-            warnings.append({'type': 'missing_security_header', 'directive': 'add_header', 'context': None, 'value': h})
-    return warnings 
\ No newline at end of file
+        rng = LIMITS.get(name)
+        if rng is not None and args.strip():
+            val = args.split()[0]
+            size = _parse_size(val)
+            if size is not None:
+                if size < rng['min']:
+                    warnings.append({'type': 'limit_too_small', 'directive': name, 'context': parent, 'value': val})
+                if size > rng['max']:
+                    warnings.append({'type': 'limit_too_large', 'directive': name, 'context': parent, 'value': val})
+
+    def leave(self, d, parent):
+        if d.name != 'server' or not self._check_limits:
+            return
+        index, has_limit = self._servers.pop()
+        if not has_limit and not _inherits_limits(self._tree, d):
+            self._warnings[index] = {'type': 'no_limit_req_conn', 'directive': 'server', 'context': d, 'value': ''}
+
+    def result(self):
+        warnings = [w for w in self._warnings if w is not None]
+        # Проверка отсутствующих security headers
+        if self._headers is not None:
+            warnings.extend(self._headers.result())
+        return warnings
+
+def _inherits_limits(tree, server) -> bool:
+    # limit_req/limit_conn, заданные в http (или выше), действуют и в server-е
+    effective = tree.effective
+    return bool(effective.inherited(server, 'limit_req') or effective.inherited(server, 'limit_conn'))
+
+class RequestLimitRule(Rule):
+    """
+    server-блоки без limit_req/limit_conn: ни своих (в том числе в location-ах),
+    ни унаследованных из http. Та же проверка, что в WarningsRule, отдельным правилом.
+    Результат: [{type, directive, context, value}]
+    """
+    directives = ('limit_req', 'limit_conn')
+    blocks = ('server',)
+
+    def __init__(self):
+        self._tree = None
+        self._slots = []
+        self._open = []
+
+    def start(self, tree):
+        self._tree = tree
+
+    def visit(self, d, parent):
+        if isinstance(d, Block):
+            slot = [None, False]
+            self._slots.append(slot)
+            self._open.append(slot)
+        else:
+            for slot in self._open:
+                slot[1] = True
+
+    def leave(self, d, parent):
+        slot = self._open.pop()
+        if not slot[1] and not _inherits_limits(self._tree, d):
+            slot[0] = {'type': 'no_limit_req_conn', 'directive': 'server', 'context': d, 'value': ''}
+
+    def result(self):
+        return [slot[0] for slot in self._slots if slot[0] is not None]
+
+class SecurityHeadersRule(Rule):
+    """
+    Security-заголовки, которые не задаются ни одним add_header во всём дереве.
+    Результат: [{type, directive, context, value}]
+    """
+    directives = ('add_header',)
+
+    def __init__(self):
+        self._found = set()
+
+    def visit(self, d, parent):
+        args = d['args']
+        for h in SECURITY_HEADERS:
+            if h in args:
+                self._found.add(h)
+
+    def merge(self, other):
+        self._found |= other._found
+
+    def result(self):
+        return [{'type': 'missing_security_header', 'directive': 'add_header', 'context': None, 'value': h}
+                for h in SECURITY_HEADERS if h not in self._found]
+
+def find_warnings(tree) -> List[Dict[str, Any]]:
+    """
+    Находит потенциально опасные или неочевидные директивы и нарушения best practices.
+    Возвращает список: [{type, directive, context, value}]
+    """
+    return run_rules(tree, [WarningsRule()])[0]
+
+def find_missing_security_headers(tree) -> List[Dict[str, Any]]:
+    """
+    Только проверка security-заголовков по всему дереву (часть find_warnings).
+    Нужна там, где остальные предупреждения считаются по server-блокам отдельно.
+    """
+    return run_rules(tree, [SecurityHeadersRule()])[0]
@@ -0,0 +1,82 @@
+"""
+Генераторы синтетических nginx-конфигов для бенчмарков.
+"""
+import os
+
+
+def vhost(i: int, locations: int = 8, depth: int = 1) -> str:
+    """Один server-блок с вложенными location/if/limit_except; depth — глубина цепочки location."""
+    out = [
+        "server {",
+        "    listen 80;",
+        f"    server_name site{i}.example.com www.site{i}.example.com;",
+        f"    access_log /var/log/nginx/site{i}.log main; # лог",
+    ]
+    for j in range(locations):
+        pad = "    "
+        prefix = f"/app{j}"
+        for _ in range(depth):
+            out += [
+                f"{pad}location {prefix}/ {{",
+                f"{pad}    proxy_pass http://backend{i % 50};",
+                f"{pad}    proxy_set_header Host $host;",
+            ]
+            pad += "    "
+            prefix += "/sub"
+        out += [
+            f"{pad}location {prefix}/static/ {{",
+            f"{pad}    root /var/www/site{i};",
+            f"{pad}    if ($request_method = POST) {{ return 405; }}",
+            f"{pad}    limit_except GET {{",
+            f"{pad}        deny all;",
+            f"{pad}    }}",
+            f"{pad}}}",
+        ]
+        for _ in range(depth):
+            pad = pad[:-4]
+            out.append(f"{pad}}}")
+    out.append("}")
+    return "\n".join(out)
+
+
+def upstreams(count: int = 50) -> str:
+    out = []
+    for i in range(count):
+        out.append(f"upstream backend{i} {{")
+        out.append(f"    server 10.0.{i // 250}.{i % 250}:8080 weight=5;")
+        out.append(f"    server 10.1.{i // 250}.{i % 250}:8080 backup;")
+        out.append("}")
+    return "\n".join(out)
+
+
+def single_file_config(servers: int, depth: int = 1) -> str:
+    """Один большой файл: http { upstream-ы + servers vhost-ов }."""
+    body = [upstreams(), *(vhost(i, depth=depth) for i in range(servers))]
+    return "http {\n" + "\n".join(body) + "\n}\n"
+
+
+def write_tree(root: str, servers: int, snippet: bool = False) -> str:
+    """
+    Раскладывает конфиг по файлам как в /etc/nginx:
+    nginx.conf + conf.d/upstreams.conf + sites-enabled/site<i>.conf.
+    snippet — каждый server-блок подключает общий snippets/proxy_params.conf.
+    Возвращает путь к nginx.conf.
+    """
+    os.makedirs(os.path.join(root, "conf.d"), exist_ok=True)
+    os.makedirs(os.path.join(root, "sites-enabled"), exist_ok=True)
+    with open(os.path.join(root, "conf.d", "upstreams.conf"), "w") as f:
+        f.write(upstreams())
+    include = ""
+    if snippet:
+        os.makedirs(os.path.join(root, "snippets"), exist_ok=True)
+        path = os.path.join(root, "snippets", "proxy_params.conf")
+        with open(path, "w") as f:
+            f.write("proxy_set_header X-Real-IP $remote_addr;\nproxy_read_timeout 30s;\n")
+        include = f"    include {path};\n"
+    for i in range(servers):
+        with open(os.path.join(root, "sites-enabled", f"site{i:05d}.conf"), "w") as f:
+            f.write(vhost(i).replace("server {\n", "server {\n" + include, 1))
+    main = os.path.join(root, "nginx.conf")
+    with open(main, "w") as f:
+        f.write("worker_processes auto;\nhttp {\n    include conf.d/*.conf;\n    include sites-enabled/*.conf;\n}\n")
+    return main
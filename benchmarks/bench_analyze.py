@@ -0,0 +1,51 @@
+"""
+Бенчмарк analyze: все проверки за один обход (collect_issues, RuleEngine)
+против восьми отдельных find_* — по обходу на каждую проверку.
+Поиск мёртвых location-ов квадратичен сам по себе, поэтому его можно исключить (--no-dead).
+
+Запуск:
+    python benchmarks/bench_analyze.py --servers 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import commands.analyze as analyze  # noqa: E402
+from analyzer.base import run_rules  # noqa: E402
+from parser.nginx_parser import NginxConfigTree, _parse_text  # noqa: E402
+from _synthetic import single_file_config  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--servers", type=int, default=2000)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--no-dead", action="store_true", help="без проверки мёртвых location-ов")
+    opts = ap.parse_args()
+    tree = NginxConfigTree(_parse_text(single_file_config(opts.servers)))
+    checks = [c for c in analyze._CHECKS if not (opts.no_dead and c[0].__name__ == 'DeadLocationRule')]
+
+    def single_pass():
+        return analyze._run_checks(tree, checks)
+
+    def separate_walks():
+        rows = []
+        for make_rule, to_rows in checks:
+            rows.extend(to_rows(run_rules(tree, [make_rule()])[0]))
+        return rows
+
+    assert single_pass() == separate_walks()
+    for name, fn in (("separate walks", separate_walks), ("single pass", single_pass)):
+        best = float("inf")
+        for _ in range(opts.repeat):
+            t0 = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - t0)
+        print(f"{name:>15}: {best:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
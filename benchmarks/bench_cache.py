@@ -0,0 +1,47 @@
+"""
+Бенчмарк дискового кэша разбора: холодный запуск против повторного
+на дереве из nginx.conf + N файлов в sites-enabled.
+
+Запуск:
+    python benchmarks/bench_cache.py --files 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parser.nginx_parser import parse_nginx_config  # noqa: E402
+from parser.cache import ParseCache  # noqa: E402
+from _synthetic import write_tree  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--files", type=int, default=2000)
+    ap.add_argument("--runs", type=int, default=3, help="Сколько «команд» подряд запускать на тёплом кэше")
+    opts = ap.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        main_path = write_tree(os.path.join(tmp, "nginx"), opts.files)
+        cache_dir = os.path.join(tmp, "cache")
+
+        t0 = time.perf_counter()
+        parse_nginx_config(main_path)
+        print(f"без кэша:        {time.perf_counter() - t0:.3f} s")
+
+        cache = ParseCache(cache_dir)
+        t0 = time.perf_counter()
+        parse_nginx_config(main_path, cache=cache)
+        print(f"холодный кэш:    {time.perf_counter() - t0:.3f} s  (misses={cache.misses})")
+
+        for i in range(opts.runs):
+            cache = ParseCache(cache_dir)
+            t0 = time.perf_counter()
+            parse_nginx_config(main_path, cache=cache)
+            print(f"тёплый кэш #{i + 1}:  {time.perf_counter() - t0:.3f} s  (hits={cache.hits}, misses={cache.misses})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Бенчмарк поиска пересекающихся location-ов: сортировка префиксов со стеком
+против прежнего перебора всех пар. Один server с N location-ами в стиле API-шлюза.
+
+Запуск:
+    python benchmarks/bench_conflicts.py --locations 500 1000 2000 4000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzer.conflicts import find_location_conflicts  # noqa: E402
+from parser.nginx_parser import NginxConfigTree, _parse_text  # noqa: E402
+
+
+# --- Прежняя проверка (все пары, startswith по тексту аргумента), только для сравнения ---
+def _legacy_pairs(locations):
+    pairs = 0
+    for i in range(len(locations)):
+        for j in range(i+1, len(locations)):
+            if locations[i].startswith(locations[j]) or locations[j].startswith(locations[i]):
+                pairs += 1
+    return pairs
+
+
+def gateway_config(count: int, seed: int = 0) -> str:
+    rnd = random.Random(seed)
+    services = [f"svc{i}" for i in range(max(1, count // 20))]
+    lines = ["server {", "    listen 80;", "    server_name gw.example.com;"]
+    for i in range(count):
+        svc = rnd.choice(services)
+        kind = rnd.random()
+        if kind < 0.1:
+            lines.append(f"    location ~ ^/{svc}/v{i}/[0-9]+$ {{ proxy_pass http://{svc}; }}")
+        elif kind < 0.2:
+            lines.append(f"    location = /{svc}/health{i} {{ return 200; }}")
+        else:
+            lines.append(f"    location /{svc}/v{i % 7}/r{i} {{ proxy_pass http://{svc}; }}")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--locations", type=int, nargs="+", default=[500, 1000, 2000, 4000])
+    opts = ap.parse_args()
+    print(f"{'locations':>9} {'pairwise, s':>12} {'sorted, s':>10} {'conflicts':>10}")
+    for n in opts.locations:
+        tree = NginxConfigTree(_parse_text(gateway_config(n)))
+        args = [loc.arg for loc in tree.locations()]
+        t0 = time.perf_counter()
+        _legacy_pairs(args)
+        legacy = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        found = find_location_conflicts(tree)
+        new = time.perf_counter() - t0
+        print(f"{n:>9} {legacy:>12.3f} {new:>10.3f} {len(found):>10}")
+
+
+if __name__ == "__main__":
+    main()
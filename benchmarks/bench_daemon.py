@@ -0,0 +1,60 @@
+"""
+Бенчмарк демона nginx-lens serve: задержка запроса route через Unix-сокет
+против разбора конфига и поиска маршрута в каждом вызове.
+
+Запуск:
+    python benchmarks/bench_daemon.py --servers 200 1000 --queries 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _synthetic import write_tree  # noqa: E402
+from analyzer.route import find_route  # noqa: E402
+from daemon.client import DaemonClient  # noqa: E402
+from daemon.server import LensServer, LensState  # noqa: E402
+from parser.nginx_parser import parse_nginx_config  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--servers", type=int, nargs="+", default=[200, 1000])
+    ap.add_argument("--queries", type=int, default=500)
+    opts = ap.parse_args()
+    print(f"{'servers':>8} {'parse+route, ms':>16} {'daemon, ms':>11} {'new conn, ms':>13}")
+    for n in opts.servers:
+        with tempfile.TemporaryDirectory() as root:
+            main_path = write_tree(root, n)
+            urls = [f"http://site{i % n}.example.com/app{i % 8}/x" for i in range(opts.queries)]
+            t0 = time.perf_counter()
+            for url in urls[:5]:
+                find_route(parse_nginx_config(main_path), url)
+            cold = (time.perf_counter() - t0) / 5 * 1000
+            sock = os.path.join(root, "lens.sock")
+            server = LensServer(sock, LensState([main_path], use_cache=False))
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            try:
+                with DaemonClient(sock) as client:
+                    client.request('route', url=urls[0])
+                    t0 = time.perf_counter()
+                    for url in urls:
+                        client.request('route', url=url)
+                    hot = (time.perf_counter() - t0) / len(urls) * 1000
+                t0 = time.perf_counter()
+                for url in urls:
+                    with DaemonClient(sock) as client:
+                        client.request('route', url=url)
+                fresh = (time.perf_counter() - t0) / len(urls) * 1000
+            finally:
+                server.shutdown()
+                server.server_close()
+            print(f"{n:>8} {cold:>16.1f} {hot:>11.3f} {fresh:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Бенчмарк поиска мёртвых location-ов: автомат Ахо–Корасик по аргументам location-ов
+против прежней проверки `loc in args` для каждой пары (директива, location).
+
+Запуск:
+    python benchmarks/bench_dead.py --locations 1000 4000 16000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzer.dead_locations import find_dead_locations  # noqa: E402
+from parser.nginx_parser import NginxConfigTree, _parse_text  # noqa: E402
+
+
+# --- Прежний подсчёт (каждая директива против каждого location), только для сравнения ---
+def _legacy(locations, uses):
+    used = set()
+    for args in uses:
+        for loc in locations:
+            if loc and loc in args:
+                used.add(loc)
+    return [loc for loc in locations if loc not in used]
+
+
+def rewrite_heavy_config(count: int) -> str:
+    lines = []
+    per_server = 50
+    for s in range(max(1, count // per_server)):
+        lines.append(f"server {{ listen 80; server_name s{s}.example.com;")
+        for i in range(per_server):
+            n = s * per_server + i
+            lines.append(f"    location /app{n}/ {{ proxy_pass http://backend{n % 13}; }}")
+            lines.append(f"    rewrite ^/old{n}/(.*)$ /app{n if n % 3 else n + 1}/$1 permanent;")
+            lines.append(f"    location /static{n}/ {{ try_files $uri /app{n}/index.html; }}")
+        lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--locations", type=int, nargs="+", default=[1000, 4000, 16000])
+    ap.add_argument("--legacy-limit", type=int, default=8000, help="больше этого числа location-ов прежняя проверка не запускается")
+    opts = ap.parse_args()
+    print(f"{'locations':>9} {'pairwise, s':>12} {'automaton, s':>13} {'dead':>6}")
+    for n in opts.locations:
+        tree = NginxConfigTree(_parse_text(rewrite_heavy_config(n // 2)))
+        locations = [l.arg for l in tree.locations()]
+        uses = [d['args'] for name in ('proxy_pass', 'rewrite', 'try_files') for d in tree.find(name)]
+        legacy = "-"
+        if len(locations) <= opts.legacy_limit:
+            t0 = time.perf_counter()
+            _legacy(locations, uses)
+            legacy = f"{time.perf_counter() - t0:.3f}"
+        t0 = time.perf_counter()
+        dead = find_dead_locations(tree)
+        new = time.perf_counter() - t0
+        print(f"{len(locations):>9} {legacy:>12} {new:>13.3f} {len(dead):>6}")
+
+
+if __name__ == "__main__":
+    main()
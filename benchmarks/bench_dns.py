@@ -0,0 +1,60 @@
+"""
+Бенчмарк разрешения имён upstream: CachingResolver (все имена одновременно, кэш по TTL)
+против последовательного разрешения каждого сервера, как при соединении по имени.
+
+Источник — StaticResolver с задержкой ответа --rtt (имитация DNS-сервера); у каждого имени
+--dup серверов с тем же именем (разные порты).
+
+Запуск:
+    python benchmarks/bench_dns.py --names 1000 5000 --rtt 0.02
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from upstream_checker.dns import CachingResolver, StaticResolver  # noqa: E402
+
+# Последовательное разрешение слишком медленное: меряется на части серверов
+LEGACY_LIMIT = 50
+
+
+async def legacy(stub, hosts):
+    for host in hosts:
+        await stub.query(host)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--names", type=int, nargs="+", default=[1000, 5000])
+    ap.add_argument("--dup", type=int, default=3)
+    ap.add_argument("--rtt", type=float, default=0.02)
+    opts = ap.parse_args()
+    print(f"{'names':>7} {'servers':>8} {'cold, s':>8} {'queries':>8} {'warm, s':>8} {'sequential, s (est.)':>21}")
+    for n in opts.names:
+        records = {f"app{i}.internal": [f"10.{i // 65536}.{i // 256 % 256}.{i % 256}"] for i in range(n)}
+        hosts = [f"app{i % n}.internal" for i in range(n * opts.dup)]
+        stub = StaticResolver(records, ttl=60, delay=opts.rtt)
+        resolver = CachingResolver(stub)
+
+        async def run():
+            t0 = time.perf_counter()
+            await asyncio.gather(*(resolver.resolve(h) for h in hosts))
+            cold = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            await asyncio.gather(*(resolver.resolve(h) for h in hosts))
+            warm = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            await legacy(StaticResolver(records, delay=opts.rtt), hosts[:LEGACY_LIMIT])
+            slow = (time.perf_counter() - t0) * len(hosts) / LEGACY_LIMIT
+            return cold, warm, slow
+
+        cold, warm, slow = asyncio.run(run())
+        print(f"{n:>7} {len(hosts):>8} {cold:>8.3f} {stub.queries:>8} {warm:>8.3f} {slow:>21.1f}")
+
+
+if __name__ == "__main__":
+    main()
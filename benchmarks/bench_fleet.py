@@ -0,0 +1,53 @@
+"""
+Бенчмарк fleet-режима analyze: много корней конфигов (по одному на хост),
+последовательно и на пуле процессов.
+
+Запуск:
+    python benchmarks/bench_fleet.py --hosts 200 --servers 20 --jobs 1 4 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _synthetic import write_tree  # noqa: E402
+from commands.analyze import FleetReport, _analyze_host  # noqa: E402
+
+
+def run(roots, jobs):
+    report = FleetReport()
+    if jobs <= 1:
+        results = (_analyze_host(path, False) for path in roots)
+        for path, rows, _, _ in results:
+            report.add(path, rows)
+        return report
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(_analyze_host, path, False) for path in roots]
+        for future in as_completed(futures):
+            path, rows, _, _ = future.result()
+            report.add(path, rows)
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--hosts", type=int, default=200)
+    ap.add_argument("--servers", type=int, default=20, help="server-блоков на хост")
+    ap.add_argument("--jobs", type=int, nargs="+", default=[1, 4, 8])
+    opts = ap.parse_args()
+    with tempfile.TemporaryDirectory() as root:
+        roots = [write_tree(os.path.join(root, f"host{h:04d}"), opts.servers) for h in range(opts.hosts)]
+        print(f"{'jobs':>5} {'time, s':>8} {'hosts/s':>8} {'unique issues':>14}")
+        for jobs in opts.jobs:
+            t0 = time.perf_counter()
+            report = run(roots, jobs)
+            elapsed = time.perf_counter() - t0
+            print(f"{jobs:>5} {elapsed:>8.2f} {opts.hosts / elapsed:>8.1f} {len(report.hosts):>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Бенчмарк проверки upstream: asyncio-проверка всех серверов сразу против
+последовательных socket.create_connection (как проверяли бы без asyncio).
+
+Серверы — локальный слушатель (соединение есть) и «чёрная дыра» с переполненной
+очередью accept (соединение не устанавливается до таймаута).
+
+Запуск:
+    python benchmarks/bench_health.py --servers 1000 5000 --timeout 0.5
+"""
+import argparse
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from upstream_checker.checker import check_upstreams, raise_fd_limit  # noqa: E402
+
+# Последовательная проверка слишком медленная: меряется на части серверов
+LEGACY_LIMIT = 20
+
+
+def legacy_check(servers, timeout):
+    for address in servers:
+        host, port = address.rsplit(':', 1)
+        try:
+            socket.create_connection((host, int(port)), timeout=timeout).close()
+        except OSError:
+            pass
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--servers", type=int, nargs="+", default=[1000, 5000])
+    ap.add_argument("--timeout", type=float, default=0.5)
+    opts = ap.parse_args()
+    # Как nginx-lens health: тысячи одновременных соединений
+    raise_fd_limit()
+
+    alive = socket.socket()
+    alive.bind(("127.0.0.1", 0))
+    alive.listen(4096)
+    hole = socket.socket()
+    hole.bind(("127.0.0.1", 0))
+    hole.listen(0)
+    filler = []
+    for _ in range(4):
+        s = socket.socket()
+        s.setblocking(False)
+        s.connect_ex(hole.getsockname())
+        filler.append(s)
+    addresses = [f"127.0.0.1:{alive.getsockname()[1]}", f"127.0.0.1:{hole.getsockname()[1]}"]
+
+    print(f"{'servers':>8} {'asyncio, s':>11} {'healthy':>8} {'sequential, s (est.)':>21}")
+    for n in opts.servers:
+        servers = [addresses[i % 2] for i in range(n)]
+        t0 = time.perf_counter()
+        res = check_upstreams({"bench": servers}, timeout=opts.timeout)
+        fast = time.perf_counter() - t0
+        healthy = sum(s["healthy"] for s in res["bench"])
+        part = servers[:LEGACY_LIMIT]
+        t0 = time.perf_counter()
+        legacy_check(part, opts.timeout)
+        slow = (time.perf_counter() - t0) * n / len(part)
+        print(f"{n:>8} {fast:>11.2f} {healthy:>8} {slow:>21.1f}")
+    for s in filler:
+        s.close()
+    alive.close()
+    hole.close()
+
+
+if __name__ == "__main__":
+    main()
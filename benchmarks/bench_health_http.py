@@ -0,0 +1,79 @@
+"""
+Бенчмарк HTTP-проверки upstream: asyncio-пробы по keep-alive соединениям
+против последовательных запросов requests.Session (пул соединений, но по одному запросу за раз).
+
+Стенд — asyncio HTTP-сервер в отдельном потоке; все серверы upstream указывают на него.
+
+Запуск:
+    python benchmarks/bench_health_http.py --servers 1000 5000 --probes 3
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from upstream_checker.checker import raise_fd_limit  # noqa: E402
+from upstream_checker.http import check_upstreams_http, summarize  # noqa: E402
+
+# Последовательные запросы слишком медленные: меряются на части серверов
+LEGACY_LIMIT = 200
+
+RESPONSE = b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok"
+
+
+async def _serve(reader, writer):
+    try:
+        while True:
+            await reader.readuntil(b"\r\n\r\n")
+            writer.write(RESPONSE)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+def start_server():
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(asyncio.start_server(_serve, "127.0.0.1", 0, backlog=4096))
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return f"127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+
+def legacy_check(servers, path, probes):
+    with requests.Session() as session:
+        for address in servers:
+            for _ in range(probes):
+                session.get(f"http://{address}{path}", timeout=2).close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--servers", type=int, nargs="+", default=[1000, 5000])
+    ap.add_argument("--probes", type=int, default=3)
+    opts = ap.parse_args()
+    # Как nginx-lens health: тысячи одновременных соединений
+    raise_fd_limit()
+    address = start_server()
+    print(f"{'servers':>8} {'asyncio, s':>11} {'healthy':>8} {'p50, ms':>8} {'p95, ms':>8} {'requests, s (est.)':>19}")
+    for n in opts.servers:
+        servers = [address] * n
+        t0 = time.perf_counter()
+        res = check_upstreams_http({"bench": servers}, path="/healthz", probes=opts.probes, timeout=5)
+        fast = time.perf_counter() - t0
+        row = summarize(res)["bench"]
+        part = servers[:LEGACY_LIMIT]
+        t0 = time.perf_counter()
+        legacy_check(part, "/healthz", opts.probes)
+        slow = (time.perf_counter() - t0) * n / len(part)
+        print(f"{n:>8} {fast:>11.2f} {row['healthy']:>8} {row['p50'] * 1000:>8.2f} {row['p95'] * 1000:>8.2f} {slow:>19.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Бенчмарк параллельного раскрытия include: 1, 4 и N (= числу CPU) процессов
+на дереве nginx.conf + sites-enabled/*.conf. Кэш разбора не используется.
+
+Запуск:
+    python benchmarks/bench_jobs.py --files 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parser.nginx_parser import parse_nginx_config  # noqa: E402
+from _synthetic import write_tree  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--files", type=int, default=2000)
+    ap.add_argument("--jobs", type=int, nargs="+", default=sorted({1, 4, os.cpu_count() or 1}))
+    ap.add_argument("--repeat", type=int, default=3)
+    opts = ap.parse_args()
+    print(f"CPU: {os.cpu_count()}")
+    with tempfile.TemporaryDirectory() as tmp:
+        main_path = write_tree(os.path.join(tmp, "nginx"), opts.files)
+        reference = None
+        base = None
+        print(f"{'jobs':>5} {'time, s':>9} {'speedup':>8}")
+        for jobs in opts.jobs:
+            best = None
+            for _ in range(opts.repeat):
+                t0 = time.perf_counter()
+                tree = parse_nginx_config(main_path, jobs=jobs)
+                elapsed = time.perf_counter() - t0
+                best = elapsed if best is None else min(best, elapsed)
+            if reference is None:
+                reference = tree.directives
+            elif tree.directives != reference:
+                raise SystemExit(f"jobs={jobs}: дерево отличается от последовательного разбора")
+            base = base or best
+            print(f"{jobs:>5} {best:>9.3f} {base / best:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
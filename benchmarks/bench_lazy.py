@@ -0,0 +1,47 @@
+"""
+Бенчмарк ленивых include: время до первого ответа (первый server при обходе)
+и полный обход — обычный разбор против lazy=True.
+
+Запуск:
+    python benchmarks/bench_lazy.py --files 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzer.base import Analyzer  # noqa: E402
+from parser.nginx_parser import parse_nginx_config  # noqa: E402
+from _synthetic import write_tree  # noqa: E402
+
+
+def _first_server(tree):
+    return next(d for d, _ in Analyzer(tree).walk() if d.get('block') == 'server')
+
+
+def _full_walk(tree):
+    return sum(1 for _ in Analyzer(tree).walk())
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--files", type=int, default=2000)
+    opts = ap.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        main_path = write_tree(os.path.join(tmp, "nginx"), opts.files)
+        print(f"{'mode':>6} {'first answer, s':>16} {'full walk, s':>13}")
+        for lazy in (False, True):
+            t0 = time.perf_counter()
+            _first_server(parse_nginx_config(main_path, lazy=lazy))
+            first = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            _full_walk(parse_nginx_config(main_path, lazy=lazy))
+            full = time.perf_counter() - t0
+            print(f"{'lazy' if lazy else 'eager':>6} {first:>16.3f} {full:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
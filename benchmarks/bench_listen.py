@@ -0,0 +1,64 @@
+"""
+Бенчмарк конфликтов listen/server_name: инвертированный индекс (адрес, имя) -> server-ы
+против прежнего пересечения множеств для каждой пары server-ов.
+
+Запуск:
+    python benchmarks/bench_listen.py --servers 1000 5000 20000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzer.conflicts import find_listen_servername_conflicts  # noqa: E402
+from parser.nginx_parser import NginxConfigTree, _parse_text  # noqa: E402
+
+# Больше этого числа server-ов прежний перебор пар не запускается
+LEGACY_LIMIT = 5000
+
+
+# --- Прежняя проверка (все пары server-ов), только для сравнения ---
+def _legacy(servers):
+    conflicts = 0
+    for i in range(len(servers)):
+        for j in range(i+1, len(servers)):
+            if servers[i][0] & servers[j][0] and servers[i][1] & servers[j][1]:
+                conflicts += 1
+    return conflicts
+
+
+def hosting_config(count: int) -> str:
+    lines = ["http {"]
+    for i in range(count):
+        # Каждый сотый vhost случайно повторяет имя соседа
+        name = f"site{i - 1 if i % 100 == 99 else i}.example.com"
+        lines.append(f"    server {{ listen 80; listen 443 ssl; server_name {name} www.{name}; root /srv/{i}; }}")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--servers", type=int, nargs="+", default=[1000, 5000, 20000])
+    opts = ap.parse_args()
+    print(f"{'servers':>8} {'pairwise, s':>12} {'index, s':>9} {'conflicts':>10}")
+    for n in opts.servers:
+        tree = NginxConfigTree(_parse_text(hosting_config(n)))
+        legacy = "-"
+        if n <= LEGACY_LIMIT:
+            sets = [({d['args'] for d in tree.find('listen', within=s)},
+                     {w for d in tree.find('server_name', within=s) for w in d['args'].split()})
+                    for s in tree.servers()]
+            t0 = time.perf_counter()
+            _legacy(sets)
+            legacy = f"{time.perf_counter() - t0:.3f}"
+        t0 = time.perf_counter()
+        found = find_listen_servername_conflicts(tree)
+        new = time.perf_counter() - t0
+        print(f"{n:>8} {legacy:>12} {new:>9.3f} {len(found):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Бенчмарк nginx-lens logs: потоковый разбор (analyzer/logs.py) против прежнего
+list(f) с накоплением путей ошибок — пропускная способность (строк/с, МБ/с) и пик памяти.
+
+Пик памяти меряется tracemalloc на отдельном прогоне (он замедляет разбор).
+
+Запуск:
+    python benchmarks/bench_logs.py --lines 200000 1000000
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzer.logs import analyze_log, open_log  # noqa: E402
+
+legacy_re = re.compile(r'(?P<ip>\S+) \S+ \S+ \[(?P<time>[^\]]+)\] "(?P<method>\S+) (?P<path>\S+) [^\"]+" (?P<status>\d{3})')
+
+STATUSES = ["200"] * 80 + ["301", "304", "404", "404", "404", "500", "502", "403"] * 2
+AGENTS = ["Mozilla/5.0 (X11; Linux x86_64)", "curl/8.0", "Googlebot/2.1", "python-requests/2.31"]
+
+
+def write_log(path, lines):
+    rnd = random.Random(0)
+    with open(path, "w") as f:
+        for i in range(lines):
+            f.write(f'10.{rnd.randrange(256)}.{rnd.randrange(256)}.{rnd.randrange(256)} - - '
+                    f'[10/Oct/2026:13:{i // 60 % 60:02d}:{i % 60:02d} +0000] '
+                    f'"GET /app{rnd.randrange(50)}/item/{rnd.randrange(100000)} HTTP/1.1" {rnd.choice(STATUSES)} '
+                    f'{rnd.randrange(10000)} "-" "{rnd.choice(AGENTS)}"\n')
+
+
+def legacy(path):
+    """Прежний commands/logs.py: весь лог в памяти, пути ошибок — списками."""
+    with open(path) as f:
+        lines = list(f)
+    status_counter, path_counter, ip_counter, ua_counter = Counter(), Counter(), Counter(), Counter()
+    errors = defaultdict(list)
+    for line in lines:
+        m = legacy_re.search(line)
+        if m:
+            status = m.group('status')
+            status_counter[status] += 1
+            path_counter[m.group('path')] += 1
+            ip_counter[m.group('ip')] += 1
+            if status.startswith('4') or status.startswith('5'):
+                errors[status].append(m.group('path'))
+        if '" "' in line:
+            ua = line.rsplit('" "', 1)[-1].strip().strip('"')
+            if ua:
+                ua_counter[ua] += 1
+    return status_counter
+
+
+def streaming(path):
+    with open_log(path) as f:
+        return analyze_log(f).statuses
+
+
+def measure(run, path):
+    t0 = time.perf_counter()
+    run(path)
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    run(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--lines", type=int, nargs="+", default=[200000, 1000000])
+    opts = ap.parse_args()
+    print(f"{'lines':>9} {'MB':>6} {'mode':>9} {'lines/s':>10} {'MB/s':>7} {'peak MB':>8}")
+    for n in opts.lines:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "access.log")
+            write_log(path, n)
+            mb = os.path.getsize(path) / 1e6
+            for mode, run in (("streaming", streaming), ("legacy", legacy)):
+                elapsed, peak = measure(run, path)
+                print(f"{n:>9} {mb:>6.0f} {mode:>9} {n / elapsed:>10,.0f} {mb / elapsed:>7.1f} {peak / 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Бенчмарк памяти: узлы со __slots__ (parser/nodes.py) против прежних dict-узлов
+на синтетическом конфиге примерно из 100k директив.
+
+Запуск:
+    python benchmarks/bench_memory.py --directives 100000
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parser.nginx_parser import parse_nginx_config  # noqa: E402
+from _synthetic import single_file_config  # noqa: E402
+
+
+def _fresh(s):
+    # Прежний парсер создавал отдельную строку для каждого узла
+    return (s + ' ')[:-1] if s else s
+
+
+def _as_dicts(nodes):
+    """Прежнее представление: dict на узел, args — строка, __file__ — своя копия пути."""
+    out = []
+    for d in nodes:
+        if 'directives' in d:
+            node = {'block': _fresh(d['block']), 'arg': d['arg'], 'directives': _as_dicts(d['directives']),
+                    '__file__': _fresh(d['__file__']), '__span__': tuple(d['__span__'])}
+            if 'upstream' in d:
+                node['upstream'] = d['upstream']
+                node['servers'] = d['servers']
+            out.append(node)
+        else:
+            out.append({'directive': _fresh(d['directive']), 'args': d['args'],
+                        '__file__': _fresh(d['__file__']), '__span__': tuple(d['__span__'])})
+    return out
+
+
+def _count(nodes):
+    n = 0
+    for d in nodes:
+        n += 1
+        if 'directives' in d:
+            n += _count(d['directives'])
+    return n
+
+
+def _measure(build):
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--directives", type=int, default=100000)
+    opts = ap.parse_args()
+    base = _count(parse_nginx_config_text(single_file_config(0)).directives)
+    per_server = _count(parse_nginx_config_text(single_file_config(1)).directives) - base
+    servers = max(1, (opts.directives - base) // per_server)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "nginx.conf")
+        with open(path, "w") as f:
+            f.write(single_file_config(servers))
+        tree, slots_bytes = _measure(lambda: parse_nginx_config(path))
+        total = _count(tree.directives)
+        dicts, dict_bytes = _measure(lambda: _as_dicts(tree.directives))
+    print(f"узлов: {total}")
+    print(f"dict-узлы:    {dict_bytes / 2**20:8.1f} MiB  ({dict_bytes / total:6.0f} B/узел)")
+    print(f"__slots__:    {slots_bytes / 2**20:8.1f} MiB  ({slots_bytes / total:6.0f} B/узел)")
+    print(f"экономия:     {1 - slots_bytes / dict_bytes:8.0%}")
+
+
+def parse_nginx_config_text(text):
+    with tempfile.NamedTemporaryFile("w", suffix=".conf", delete=False) as f:
+        f.write(text)
+    try:
+        return parse_nginx_config(f.name)
+    finally:
+        os.unlink(f.name)
+
+
+if __name__ == "__main__":
+    main()
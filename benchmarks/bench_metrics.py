@@ -0,0 +1,67 @@
+"""
+Бенчмарк отдачи метрик health: HealthMetrics.render (готовые строки серверов, пересборка
+только проверенных после прошлой отдачи) против полной отрисовки всех серверов при каждом запросе.
+
+Запуск:
+    python benchmarks/bench_metrics.py --members 1000 10000 --scrapes 20
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exporter.prometheus import LATENCY_BUCKETS, HealthMetrics, escape_label  # noqa: E402
+
+
+def legacy_render(state):
+    """Отрисовка с нуля: метки экранируются и строки форматируются для всех серверов."""
+    out = []
+    for upstream, server, up, latency, consecutive, buckets, count, total in state:
+        labels = f'upstream="{escape_label(upstream)}",server="{escape_label(server)}"'
+        out.append(f'nginx_lens_upstream_member_up{{{labels}}} {up}\n')
+        out.append(f'nginx_lens_upstream_member_latency_seconds{{{labels}}} {latency}\n')
+        out.append(f'nginx_lens_upstream_member_consecutive_failures{{{labels}}} {consecutive}\n')
+        acc = 0
+        for bound, n in zip(LATENCY_BUCKETS, buckets):
+            acc += n
+            out.append(f'nginx_lens_upstream_member_probe_latency_seconds_bucket{{{labels},le="{bound}"}} {acc}\n')
+        out.append(f'nginx_lens_upstream_member_probe_latency_seconds_bucket{{{labels},le="+Inf"}} {count}\n')
+        out.append(f'nginx_lens_upstream_member_probe_latency_seconds_sum{{{labels}}} {total}\n')
+        out.append(f'nginx_lens_upstream_member_probe_latency_seconds_count{{{labels}}} {count}\n')
+    return ''.join(out)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--members", type=int, nargs="+", default=[1000, 10000])
+    ap.add_argument("--scrapes", type=int, default=20)
+    opts = ap.parse_args()
+    rnd = random.Random(0)
+    print(f"{'members':>8} {'probed':>7} {'render, ms':>11} {'legacy, ms':>11}")
+    for n in opts.members:
+        members = [(f"backend{i % 100}", f"10.{i // 65536}.{i // 256 % 256}.{i % 256}:8080") for i in range(n)]
+        metrics = HealthMetrics()
+        for upstream, server in members:
+            metrics.observe(upstream, server, True, rnd.random() / 10)
+        metrics.render()
+        state = [(u, s, 1, 0.01, 0, [1] * len(LATENCY_BUCKETS), 5, 0.05) for u, s in members]
+        for share in (0.0, 0.1, 1.0):
+            fast = 0.0
+            for _ in range(opts.scrapes):
+                for upstream, server in rnd.sample(members, int(n * share)):
+                    metrics.observe(upstream, server, rnd.random() > 0.01, rnd.random() / 10)
+                t0 = time.perf_counter()
+                metrics.render()
+                fast += time.perf_counter() - t0
+            t0 = time.perf_counter()
+            for _ in range(opts.scrapes):
+                legacy_render(state)
+            slow = time.perf_counter() - t0
+            print(f"{n:>8} {share:>7.0%} {fast / opts.scrapes * 1000:>11.2f} {slow / opts.scrapes * 1000:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
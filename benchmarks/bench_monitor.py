@@ -0,0 +1,87 @@
+"""
+Бенчмарк мониторинга health --interval: загрузка CPU и «пачки» проверок при непрерывной
+проверке тысяч серверов против повторного check_upstreams раз в интервал (все серверы разом).
+
+Пачка — наибольшее число проверок, начатых за 50 мс.
+
+Запуск:
+    python benchmarks/bench_monitor.py --servers 1000 5000 --interval 1 --duration 5
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from upstream_checker import checker  # noqa: E402
+from upstream_checker.checker import check_upstreams_async, raise_fd_limit  # noqa: E402
+from upstream_checker.monitor import Monitor  # noqa: E402
+
+BUCKET = 0.05
+
+
+def _tracked(starts):
+    original = checker._connect
+
+    async def connect(server, timeout):
+        starts[int(time.monotonic() / BUCKET)] += 1
+        return await original(server, timeout)
+    return connect
+
+
+async def legacy(upstreams, interval, duration):
+    stop = time.monotonic() + duration
+    while time.monotonic() < stop:
+        began = time.monotonic()
+        await check_upstreams_async(upstreams, timeout=1)
+        await asyncio.sleep(max(0.0, interval - (time.monotonic() - began)))
+
+
+def _accept(sock):
+    while True:
+        try:
+            conn, _ = sock.accept()
+        except OSError:
+            return
+        conn.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--servers", type=int, nargs="+", default=[1000, 5000])
+    ap.add_argument("--interval", type=float, default=1.0)
+    ap.add_argument("--duration", type=float, default=5.0)
+    opts = ap.parse_args()
+    # Как nginx-lens health: тысячи одновременных соединений
+    raise_fd_limit()
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(4096)
+    threading.Thread(target=_accept, args=(sock,), daemon=True).start()
+    address = f"127.0.0.1:{sock.getsockname()[1]}"
+    original = checker._connect
+    print(f"{'servers':>8} {'mode':>8} {'CPU, s':>8} {'probes':>8} {'burst':>8}")
+    for n in opts.servers:
+        upstreams = {"bench": [address] * n}
+        for mode, run in (
+            ("monitor", lambda: Monitor(upstreams, opts.interval, timeout=1).run(opts.duration)),
+            ("legacy", lambda: legacy(upstreams, opts.interval, opts.duration)),
+        ):
+            starts = Counter()
+            checker._connect = _tracked(starts)
+            cpu = time.process_time()
+            try:
+                asyncio.run(run())
+            finally:
+                checker._connect = original
+            print(f"{n:>8} {mode:>8} {time.process_time() - cpu:>8.2f} {sum(starts.values()):>8} {max(starts.values()):>8}")
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Бенчмарк парсера: однопроходный токенизатор против старого построчного _parse_block.
+
+Запуск:
+    python benchmarks/bench_parser.py --servers 500 1000 2000
+    python benchmarks/bench_parser.py --servers 200 --depth 1 4 8
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parser.nginx_parser import parse_nginx_config  # noqa: E402
+from _synthetic import single_file_config  # noqa: E402
+
+
+# --- Старый парсер (до перехода на токенизатор), оставлен только для сравнения ---
+def _legacy_strip_comments(line):
+    return line.split('#', 1)[0].strip()
+
+
+def _legacy_parse_block(lines, base_dir, source_file=None):
+    directives = []
+    upstreams = {}
+    i = 0
+    while i < len(lines):
+        line = _legacy_strip_comments(lines[i])
+        if not line:
+            i += 1
+            continue
+        if line.startswith('include '):
+            pattern = line[len('include '):].rstrip(';').strip()
+            pattern = os.path.join(base_dir, pattern) if not os.path.isabs(pattern) else pattern
+            for inc_path in glob.glob(pattern):
+                with open(inc_path) as f:
+                    inc_lines = f.readlines()
+                inc_directives, inc_upstreams = _legacy_parse_block(inc_lines, os.path.dirname(inc_path), inc_path)
+                directives.extend(inc_directives)
+                for k, v in inc_upstreams.items():
+                    upstreams.setdefault(k, []).extend(v)
+            i += 1
+            continue
+        m = re.match(r'upstream\s+(\S+)\s*{', line)
+        if m:
+            name = m.group(1)
+            block_lines = []
+            depth = 1
+            i += 1
+            while i < len(lines) and depth > 0:
+                l = _legacy_strip_comments(lines[i])
+                if '{' in l:
+                    depth += l.count('{')
+                if '}' in l:
+                    depth -= l.count('}')
+                if depth > 0:
+                    block_lines.append(l)
+                i += 1
+            servers = []
+            for bl in block_lines:
+                m_srv = re.match(r'server\s+([^;]+);', bl)
+                if m_srv:
+                    servers.append(m_srv.group(1).strip())
+            upstreams[name] = servers
+            directives.append({'upstream': name, 'servers': servers, '__file__': source_file})
+            continue
+        m = re.match(r'(\S+)\s*(\S+)?\s*{', line)
+        if m:
+            block_name = m.group(1)
+            block_arg = m.group(2)
+            block_lines = []
+            depth = 1
+            i += 1
+            while i < len(lines) and depth > 0:
+                l = _legacy_strip_comments(lines[i])
+                if '{' in l:
+                    depth += l.count('{')
+                if '}' in l:
+                    depth -= l.count('}')
+                if depth > 0:
+                    block_lines.append(l)
+                i += 1
+            sub_directives, sub_upstreams = _legacy_parse_block(block_lines, base_dir, source_file)
+            directives.append({'block': block_name, 'arg': block_arg, 'directives': sub_directives, '__file__': source_file})
+            for k, v in sub_upstreams.items():
+                upstreams.setdefault(k, []).extend(v)
+            continue
+        m = re.match(r'(\S+)\s+([^;]+);', line)
+        if m:
+            directives.append({'directive': m.group(1), 'args': m.group(2), '__file__': source_file})
+        i += 1
+    return directives, upstreams
+
+
+def _legacy_parse(path):
+    with open(path) as f:
+        lines = f.readlines()
+    return _legacy_parse_block(lines, os.path.dirname(os.path.abspath(path)), path)
+
+
+def _best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--servers", type=int, nargs="+", default=[250, 500, 1000])
+    ap.add_argument("--depth", type=int, nargs="+", default=[1, 4],
+                    help="Глубина вложенности location внутри server")
+    ap.add_argument("--repeat", type=int, default=3)
+    opts = ap.parse_args()
+    print(f"{'servers':>8} {'depth':>6} {'lines':>8} {'legacy, s':>10} {'tokenizer, s':>13} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for depth in opts.depth:
+            for servers in opts.servers:
+                path = os.path.join(tmp, f"nginx-{servers}-{depth}.conf")
+                text = single_file_config(servers, depth)
+                with open(path, "w") as f:
+                    f.write(text)
+                lines = text.count("\n")
+                legacy = _best_of(lambda: _legacy_parse(path), opts.repeat)
+                new = _best_of(lambda: parse_nginx_config(path), opts.repeat)
+                print(f"{servers:>8} {depth:>6} {lines:>8} {legacy:>10.3f} {new:>13.3f} {legacy / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Бенчмарк графа rewrite: тысячи «наследственных» редиректов в одном server-е.
+Новый граф (кэш скомпилированных паттернов, раскладка по литеральному префиксу,
+мемоизация целей) против прямого перебора: каждая цель против каждого паттерна.
+
+Запуск:
+    python benchmarks/bench_rewrite.py --rules 500 1000 5000 20000
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzer.rewrite import find_rewrite_issues  # noqa: E402
+from parser.nginx_parser import NginxConfigTree, _parse_text  # noqa: E402
+
+# Больше этого числа правил прямой перебор не запускается
+LEGACY_LIMIT = 1000
+
+
+# --- Прямой перебор всех пар (цель, паттерн), только для сравнения ---
+def _legacy(rules):
+    edges = 0
+    for _, target in rules:
+        path = re.sub(r'\$\w+', 'x', target.split('?', 1)[0])
+        for pattern, _ in rules:
+            if re.search(pattern, path):
+                edges += 1
+    return edges
+
+
+def legacy_config(count: int):
+    rules = []
+    for i in range(count):
+        if i % 500 == 0:
+            # Редкая петля через два правила
+            rules.append((f"^/loop{i}/a/(\\d+)$", f"/loop{i}/b/$1"))
+            rules.append((f"^/loop{i}/b/(\\d+)$", f"/loop{i}/a/$1"))
+        else:
+            rules.append((f"^/old/section{i}/(.*)$", f"/new/section{i}/$1"))
+    body = "\n".join(f"        rewrite {p} {t} last;" for p, t in rules)
+    text = f"http {{\n    server {{\n    listen 80;\n    location / {{\n{body}\n    }}\n    }}\n}}\n"
+    return text, rules
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rules", type=int, nargs="+", default=[500, 1000, 5000, 20000])
+    opts = ap.parse_args()
+    print(f"{'rules':>7} {'pairwise, s':>12} {'graph, s':>9} {'cycles':>7}")
+    for n in opts.rules:
+        text, rules = legacy_config(n)
+        tree = NginxConfigTree(_parse_text(text))
+        legacy = "-"
+        if n <= LEGACY_LIMIT:
+            t0 = time.perf_counter()
+            _legacy(rules)
+            legacy = f"{time.perf_counter() - t0:.3f}"
+        t0 = time.perf_counter()
+        issues = find_rewrite_issues(tree)
+        new = time.perf_counter() - t0
+        cycles = sum(1 for i in issues if i['type'] == 'rewrite_cycle')
+        print(f"{n:>7} {legacy:>12} {new:>9.3f} {cycles:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Бенчмарк route без -c: разбор каждого .conf каталога как отдельного корня (прежнее
+поведение) против поиска корневых конфигов по графу include и одного разбора.
+
+Запуск:
+    python benchmarks/bench_roots.py --servers 200 1000
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _synthetic import write_tree  # noqa: E402
+from parser.nginx_parser import parse_nginx_config  # noqa: E402
+from parser.resolver import IncludeResolver  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--servers", type=int, nargs="+", default=[200, 1000])
+    opts = ap.parse_args()
+    print(f"{'servers':>8} {'files':>6} {'each file, s':>13} {'roots, s':>9} {'roots':>6} {'reads':>6}")
+    for n in opts.servers:
+        with tempfile.TemporaryDirectory() as root:
+            write_tree(root, n)
+            files = sorted(glob.glob(os.path.join(root, "**", "*.conf"), recursive=True))
+            t0 = time.perf_counter()
+            for path in files:
+                parse_nginx_config(path)
+            legacy = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            resolver = IncludeResolver()
+            roots = resolver.roots(files)
+            for path in roots:
+                parse_nginx_config(path, resolver=resolver)
+            new = time.perf_counter() - t0
+            print(f"{n:>8} {len(files):>6} {legacy:>13.3f} {new:>9.3f} {len(roots):>6} {resolver.reads:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Бенчмарк поиска маршрута: RoutingTable, собранная один раз, против прежнего
+find_route, который на каждый URL перебирал все server-ы и location-ы.
+
+Запуск:
+    python benchmarks/bench_route.py --servers 1000 5000 --lookups 2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _synthetic import single_file_config  # noqa: E402
+from analyzer.route import RoutingTable  # noqa: E402
+from parser.nginx_parser import NginxConfigTree, _parse_text  # noqa: E402
+from urllib.parse import urlparse  # noqa: E402
+
+
+# --- Прежний find_route (оценка server-ов и самый длинный префикс), только для сравнения ---
+def _legacy(tree, url):
+    parsed = urlparse(url)
+    host = parsed.hostname
+    port = str(parsed.port or 80)
+    path = parsed.path or '/'
+    best_server, best_score = None, -1
+    for d in tree.servers():
+        names = [w for sub in tree.find('server_name', within=d) for w in sub['args'].split()]
+        listens = [sub['args'] for sub in tree.find('listen', within=d)]
+        score = (2 if host in names else 0) + (1 if any(port in l for l in listens) else 0)
+        if score > best_score:
+            best_server, best_score = d, score
+    if best_server is None or best_score < 2:
+        return None
+    best_loc, best_len = None, -1
+    for sub in tree.locations(best_server):
+        loc = sub.get('arg', '')
+        if path.startswith(loc) and len(loc) > best_len:
+            best_loc, best_len = sub, len(loc)
+    return best_loc
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--servers", type=int, nargs="+", default=[1000, 5000])
+    ap.add_argument("--lookups", type=int, default=2000)
+    opts = ap.parse_args()
+    print(f"{'servers':>8} {'legacy, us/url':>15} {'build, s':>9} {'table, us/url':>14}")
+    rnd = random.Random(1)
+    for n in opts.servers:
+        tree = NginxConfigTree(_parse_text(single_file_config(n, depth=2)))
+        urls = [f"http://site{rnd.randrange(n)}.example.com/app{rnd.randrange(8)}/sub/static/x.css"
+                for _ in range(opts.lookups)]
+        tree.index
+        sample = urls[:max(1, opts.lookups // 20)]
+        t0 = time.perf_counter()
+        for url in sample:
+            _legacy(tree, url)
+        legacy = (time.perf_counter() - t0) / len(sample) * 1e6
+        t0 = time.perf_counter()
+        table = RoutingTable(tree)
+        build = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for url in urls:
+            table.lookup(url)
+        new = (time.perf_counter() - t0) / len(urls) * 1e6
+        print(f"{n:>8} {legacy:>15.1f} {build:>9.3f} {new:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
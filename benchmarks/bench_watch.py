@@ -0,0 +1,64 @@
+"""
+Бенчмарк режима --watch: задержка от правки одного vhost до нового списка проблем.
+Сравнивает полный разбор + анализ с ConfigWatcher.refresh() + IncrementalIssues.update().
+
+Запуск:
+    python benchmarks/bench_watch.py --files 300
+    python benchmarks/bench_watch.py --files 300 --snippet
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from commands.analyze import collect_issues, IncrementalIssues  # noqa: E402
+from parser.nginx_parser import parse_nginx_config  # noqa: E402
+from parser.watch import ConfigWatcher  # noqa: E402
+from _synthetic import write_tree  # noqa: E402
+
+
+def _touch_vhost(path, step):
+    with open(path, 'a') as f:
+        f.write(f"# edit {step}\n")
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--files", type=int, default=300)
+    ap.add_argument("--edits", type=int, default=5)
+    ap.add_argument("--snippet", action="store_true", help="каждый vhost подключает общий snippets/proxy_params.conf")
+    opts = ap.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        main_path = write_tree(os.path.join(tmp, "nginx"), opts.files, snippet=opts.snippet)
+        vhost = os.path.join(tmp, "nginx", "sites-enabled", "site00000.conf")
+        watcher = ConfigWatcher(main_path)
+        watcher.refresh()
+        incremental = IncrementalIssues(watcher.signature)
+        incremental.update(watcher.tree)
+        full = parse = analyze = 0.0
+        for step in range(opts.edits):
+            _touch_vhost(vhost, step)
+            t0 = time.perf_counter()
+            collect_issues(parse_nginx_config(main_path))
+            t1 = time.perf_counter()
+            watcher.refresh()
+            t2 = time.perf_counter()
+            incremental.update(watcher.tree)
+            t3 = time.perf_counter()
+            full += t1 - t0
+            parse += t2 - t1
+            analyze += t3 - t2
+        n = opts.edits
+        print(f"full parse+analyze: {full / n * 1000:9.1f} ms")
+        print(f"watch refresh:      {parse / n * 1000:9.1f} ms")
+        print(f"watch re-analysis:  {analyze / n * 1000:9.1f} ms "
+              f"(server blocks re-analyzed: {incremental.analyzed}, reused: {incremental.reused})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,436 @@
+import glob
+import os
+import time
 import typer
+from collections import Counter
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
 from rich.console import Console
 from rich.table import Table
-from analyzer.conflicts import find_location_conflicts, find_listen_servername_conflicts
-from analyzer.duplicates import find_duplicate_directives
-from analyzer.empty_blocks import find_empty_blocks
-from analyzer.warnings import find_warnings
-from analyzer.unused import find_unused_variables
-from parser.nginx_parser import parse_nginx_config
-from analyzer.rewrite import find_rewrite_issues
-from analyzer.dead_locations import find_dead_locations
+from commands.render import ISSUE_META, SEVERITY_COLOR, print_issues
+from analyzer.base import run_rules, supports_merge
+from analyzer.conflicts import LocationConflictRule, ListenServerNameRule
+from analyzer.duplicates import DuplicateDirectiveRule
+from analyzer.empty_blocks import EmptyBlockRule
+from analyzer.warnings import WarningsRule, SecurityHeadersRule, RequestLimitRule, _inherits_limits
+from analyzer.unused import UnusedVariableRule
+from parser.nginx_parser import parse_nginx_config, NginxConfigTree
+from parser.nodes import Node, Block, iter_nodes
+from analyzer.rewrite import RewriteRule
+from analyzer.dead_locations import DeadLocationRule
 
 app = typer.Typer()
 console = Console()
 
-# Карта советов и критичности для issue_type
-ISSUE_META = {
-    'location_conflict': ("Возможное пересечение location. Это не всегда ошибка: порядок и типы location могут быть корректны. Проверьте, что порядок и типы location соответствуют вашим ожиданиям. Если всё ок — игнорируйте предупреждение.", "medium"),
-    'duplicate_directive': ("Оставьте только одну директиву с нужным значением в этом блоке.", "medium"),
-    'empty_block': ("Удалите или заполните пустой блок.", "low"),
-    'proxy_pass_no_scheme': ("Добавьте http:// или https:// в proxy_pass.", "medium"),
-    'autoindex_on': ("Отключите autoindex, если не требуется публикация файлов.", "medium"),
-    'if_block': ("Избегайте if внутри location, используйте map/try_files.", "medium"),
-    'server_tokens_on': ("Отключите server_tokens для безопасности.", "low"),
-    'ssl_missing': ("Укажите путь к SSL-сертификату/ключу.", "high"),
-    'ssl_protocols_weak': ("Отключите устаревшие протоколы TLS.", "high"),
-    'ssl_ciphers_weak': ("Используйте современные шифры.", "high"),
-    'listen_443_no_ssl': ("Добавьте ssl к listen 443.", "high"),
-    'listen_443_no_http2': ("Добавьте http2 к listen 443 для производительности.", "low"),
-    'no_limit_req_conn': ("Добавьте limit_req/limit_conn для защиты от DDoS.", "medium"),
-    'missing_security_header': ("Добавьте security-заголовок.", "medium"),
-    'deprecated': ("Замените устаревшую директиву.", "medium"),
-    'limit_too_small': ("Увеличьте лимит до рекомендуемого значения.", "medium"),
-    'limit_too_large': ("Уменьшите лимит до разумного значения.", "medium"),
-    'unused_variable': ("Удалите неиспользуемую переменную.", "low"),
-    'listen_servername_conflict': ("Измените listen/server_name для устранения конфликта.", "high"),
-    'rewrite_cycle': ("Проверьте rewrite на циклические правила.", "high"),
-    'rewrite_conflict': ("Проверьте порядок и уникальность rewrite.", "medium"),
-    'rewrite_no_flag': ("Добавьте last/break/redirect/permanent к rewrite.", "low"),
-    'dead_location': ("Удалите неиспользуемый location или используйте его.", "low"),
-}
-SEVERITY_COLOR = {"high": "red", "medium": "orange3", "low": "yellow"}
-
-def analyze(config_path: str = typer.Argument(..., help="Путь к nginx.conf")):
+def _warning_desc(w) -> str:
+    t = w['type']
+    if t == 'proxy_pass_no_scheme':
+        return f"proxy_pass без схемы: {w['value']}"
+    if t == 'autoindex_on':
+        return f"autoindex on в блоке {w['context'].get('block','')}"
+    if t == 'if_block':
+        return f"директива if внутри блока {w['context'].get('block','')}"
+    if t == 'server_tokens_on':
+        return f"server_tokens on в блоке {w['context'].get('block','')}"
+    if t == 'ssl_missing':
+        return f"{w['directive']} не указан"
+    if t == 'ssl_protocols_weak':
+        return f"ssl_protocols содержит устаревшие протоколы: {w['value']}"
+    if t == 'ssl_ciphers_weak':
+        return f"ssl_ciphers содержит слабые шифры: {w['value']}"
+    if t == 'listen_443_no_ssl':
+        return f"listen без ssl: {w['value']}"
+    if t == 'listen_443_no_http2':
+        return f"listen 443 без http2: {w['value']}"
+    if t == 'no_limit_req_conn':
+        return f"server без limit_req/limit_conn"
+    if t == 'missing_security_header':
+        return f"отсутствует security header: {w['value']}"
+    if t == 'deprecated':
+        return f"устаревшая директива: {w['directive']} — {w['value']}"
+    if t == 'limit_too_small':
+        return f"слишком маленькое значение: {w['directive']} = {w['value']}"
+    if t == 'limit_too_large':
+        return f"слишком большое значение: {w['directive']} = {w['value']}"
+    return None
+
+def _conflict_rows(conflicts):
+    for c in conflicts:
+        yield "location_conflict", f"server: {c['server'].get('arg', '')} location: {c['location1']} ↔ {c['location2']}"
+
+def _duplicate_rows(dups):
+    for d in dups:
+        loc = d.get('location')
+        yield "duplicate_directive", f"{d['directive']} ({d['args']}) — {d['count']} раз в блоке {d['block'].get('block', d['block'])}{' location: '+str(loc) if loc else ''}"
+
+def _empty_rows(empties):
+    for e in empties:
+        yield "empty_block", f"{e['block']} {e['arg'] or ''}"
+
+def _warning_rows(warnings):
+    for w in warnings:
+        desc = _warning_desc(w)
+        if desc is not None:
+            yield w['type'], desc
+
+def _unused_rows(unused_vars):
+    for v in unused_vars:
+        yield "unused_variable", v['name']
+
+def _listen_rows(listen_conflicts):
+    for c in listen_conflicts:
+        yield "listen_servername_conflict", f"server1: {c['server1'].get('arg','')} server2: {c['server2'].get('arg','')} listen: {','.join(c['listen'])} server_name: {','.join(c['server_name'])}"
+
+def _rewrite_rows(issues):
+    for r in issues:
+        yield r['type'], r['value']
+
+def _dead_rows(dead_locations):
+    for l in dead_locations:
+        yield "dead_location", f"server: {l['server'].get('arg','')} location: {l['location'].get('arg','')}"
+
+# Правила и форматирование их результатов — в порядке строк таблицы analyze
+_CHECKS = (
+    (LocationConflictRule, _conflict_rows),
+    (DuplicateDirectiveRule, _duplicate_rows),
+    (EmptyBlockRule, _empty_rows),
+    (WarningsRule, _warning_rows),
+    (UnusedVariableRule, _unused_rows),
+    (ListenServerNameRule, _listen_rows),
+    (RewriteRule, _rewrite_rows),
+    (DeadLocationRule, _dead_rows),
+)
+
+def _run_checks(tree, checks) -> List[Tuple[str, str]]:
+    # Все проверки — за один обход дерева (см. analyzer/base.py)
+    results = run_rules(tree, [make_rule() for make_rule, _ in checks])
+    rows = []
+    for (_, to_rows), found in zip(checks, results):
+        rows.extend(to_rows(found))
+    return rows
+
+def collect_issues(tree) -> List[Tuple[str, str]]:
+    """
+    Все найденные проблемы в виде строк (issue_type, описание) — в том порядке,
+    в каком они выводятся в таблице analyze.
+    """
+    return _run_checks(tree, _CHECKS)
+
+# Проблемы rewrite, которые находятся внутри одного server-а (циклы ищутся по server-ам)
+_LOCAL_REWRITE_TYPES = ('rewrite_cycle', 'rewrite_no_flag', 'rewrite_redos')
+
+def _local_rewrites(issues):
+    return _rewrite_rows(r for r in issues if r['type'] in _LOCAL_REWRITE_TYPES)
+
+def _global_rewrites(issues):
+    return _rewrite_rows(r for r in issues if r['type'] not in _LOCAL_REWRITE_TYPES)
+
+# Проверки, результат которых для server-блока зависит только от его содержимого
+_LOCAL_CHECKS = (
+    (LocationConflictRule, _conflict_rows),
+    (DuplicateDirectiveRule, _duplicate_rows),
+    (EmptyBlockRule, _empty_rows),
+    (partial(WarningsRule, check_headers=False, check_limits=False), _warning_rows),
+    (RewriteRule, _local_rewrites),
+)
+
+# Проверки, которые сравнивают server-блоки между собой или смотрят на всё дерево.
+# Их правила собирают данные по каждому server-блоку отдельно, перед result()
+# данные блоков добавляются (Rule.merge) к данным каркаса дерева
+_GLOBAL_CHECKS = (
+    (SecurityHeadersRule, _warning_rows),
+    (UnusedVariableRule, _unused_rows),
+    (ListenServerNameRule, _listen_rows),
+    (partial(RewriteRule, check_cycles=False), _global_rewrites),
+    (DeadLocationRule, _dead_rows),
+)
+
+class _ServerSlot(Node):
+    """
+    Место server-блока в каркасе дерева; key — отпечаток блока (IncrementalIssues._fingerprint).
+    Не директива и не блок, поэтому проверки его не видят, но у него есть родитель
+    в каркасе — по нему считается наследование limit_req/limit_conn.
+    """
+    __slots__ = ('key',)
+
+    def __init__(self, key: tuple, server: Block):
+        self.key = key
+        self.file = server.file
+        self.span = server.span
+
+def _split_servers(nodes, servers, fingerprint) -> List:
+    """
+    Каркас дерева: те же узлы, но server-блоки заменены на _ServerSlot.
+    Сами server-блоки по порядку складываются в servers парами (блок, место).
+    """
+    result = []
+    for d in iter_nodes(nodes):
+        if isinstance(d, Block):
+            if d.name == 'server':
+                slot = _ServerSlot(fingerprint(d), d)
+                servers.append((d, slot))
+                d = slot
+            else:
+                d = d.with_directives(_split_servers(d.directives, servers, fingerprint))
+        result.append(d)
+    return result
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+class IncrementalIssues:
+    """
+    Повторный анализ дерева после правки конфига (analyze --watch).
+
+    Server-блок узнаётся по отпечатку: месту в файле и (mtime, размер) всех файлов,
+    из которых собрано его содержимое (с include-ами). Для каждого отпечатка запоминаются
+    строки локальных проверок (location, дубли, пустые блоки, предупреждения, rewrite)
+    и данные, собранные правилами межблочных проверок. Обходятся заново только
+    server-блоки с новым отпечатком и каркас дерева без server-блоков; межблочные проверки
+    считаются по объединённым данным (Rule.merge), без обхода всего дерева; правила
+    без merge обходят всё дерево.
+    signature(path) — (mtime, размер) файла, по умолчанию — os.stat.
+    Набор строк совпадает с collect_issues, порядок — по типам проблем.
+    """
+    def __init__(self, signature: Callable[[str], Optional[Tuple[int, int]]] = None):
+        self.signature = signature or _file_signature
+        self._memo = {}
+        self.reused = 0
+        self.analyzed = 0
+
+    def _fingerprint(self, block: Block, signatures: Dict[str, tuple]) -> tuple:
+        files = {block.file: None}
+        stack = [block.directives]
+        while stack:
+            for d in iter_nodes(stack.pop()):
+                files[d.file] = None
+                if isinstance(d, Block):
+                    stack.append(d.directives)
+        if None in files:
+            # Узлы не из файла сравнить не с чем: такой блок узнаётся только по самому объекту
+            return (id(block),)
+        for f in files:
+            if f not in signatures:
+                signatures[f] = self.signature(f)
+        return (block.file, block.line, block.col, tuple((f, signatures[f]) for f in files))
+
+    def update(self, tree) -> List[Tuple[str, str]]:
+        servers = []
+        signatures = {}
+        frame = NginxConfigTree(_split_servers(tree.directives, servers,
+                                               partial(self._fingerprint, signatures=signatures)))
+        rules = [make_rule() for make_rule, _ in _LOCAL_CHECKS + _GLOBAL_CHECKS]
+        found = run_rules(frame, rules)
+        rows = []
+        for (_, to_rows), result in zip(_LOCAL_CHECKS, found):
+            rows.extend(to_rows(result))
+        # Правила межблочных проверок, прошедшие по каркасу; к ним добавляются данные server-блоков.
+        # Правила без merge вместо этого обходят всё дерево
+        merged = rules[len(_LOCAL_CHECKS):]
+        whole = [make_rule() for (make_rule, _), rule in zip(_GLOBAL_CHECKS, merged) if not supports_merge(rule)]
+        whole_found = iter(run_rules(tree, whole) if whole else ())
+        memo = {}
+        self.reused = self.analyzed = 0
+        for server, slot in servers:
+            entry = memo.get(slot.key) or self._memo.get(slot.key)
+            if entry is None:
+                entry = self._analyze(server)
+                self.analyzed += 1
+            else:
+                self.reused += 1
+            # В записи хранится сам блок: пока он жив, id его узлов не переиспользуются
+            memo[slot.key] = entry
+            _, local_rows, limit_rows, collected = entry
+            rows.extend(local_rows)
+            # limit_req/limit_conn могут быть унаследованы из http — это видно по месту блока в каркасе
+            if limit_rows and not _inherits_limits(frame, slot):
+                rows.extend(limit_rows)
+            for rule, other in zip(merged, collected):
+                if supports_merge(rule):
+                    rule.merge(other)
+        self._memo = memo
+        for (_, to_rows), rule in zip(_GLOBAL_CHECKS, merged):
+            rows.extend(to_rows(rule.result() if supports_merge(rule) else next(whole_found)))
+        order = {t: i for i, t in enumerate(ISSUE_META)}
+        rows.sort(key=lambda r: order.get(r[0], len(order)))
+        return rows
+
+    @staticmethod
+    def _analyze(server: Block) -> tuple:
+        """(блок, строки локальных проверок, строки no_limit_req_conn, правила межблочных проверок)."""
+        rules = [make_rule() for make_rule, _ in _LOCAL_CHECKS] + [RequestLimitRule()]
+        rules += [make_rule() for make_rule, _ in _GLOBAL_CHECKS]
+        found = run_rules(NginxConfigTree([server]), rules)
+        local_rows = []
+        for (_, to_rows), result in zip(_LOCAL_CHECKS, found):
+            local_rows.extend(to_rows(result))
+        n = len(_LOCAL_CHECKS)
+        return server, local_rows, list(_warning_rows(found[n])), rules[n + 1:]
+
+def _print_issues(rows) -> None:
+    print_issues(console, rows)
+
+def issues_delta(before, after) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+    """(новые, исчезнувшие) строки проблем; одинаковые строки считаются поштучно."""
+    old, new = Counter(before), Counter(after)
+    added = list((new - old).elements())
+    resolved = list((old - new).elements())
+    return added, resolved
+
+def _watch(config_path: str, no_cache: bool, jobs: int, interval: float) -> None:
+    from parser.cache import ParseCache
+    from parser.watch import ConfigWatcher
+    watcher = ConfigWatcher(config_path, cache=None if no_cache else ParseCache(), jobs=jobs)
+    incremental = IncrementalIssues(watcher.signature)
+    previous = None
+    console.print(f"[bold]Слежение за {config_path}[/bold] (Ctrl+C — выход)")
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                changed = watcher.refresh()
+            except Exception as e:
+                console.print(f"[red]Ошибка при разборе {config_path}: {e}[/red]")
+                changed = []
+            if changed:
+                parsed = time.perf_counter()
+                rows = incremental.update(watcher.tree)
+                done = time.perf_counter()
+                if previous is None:
+                    _print_issues(rows)
+                else:
+                    added, resolved = issues_delta(previous, rows)
+                    console.print(f"[bold]Изменено:[/bold] {', '.join(changed)}")
+                    for issue_type, desc in added:
+                        console.print(f"[red]+ {issue_type}[/red] {desc}")
+                    for issue_type, desc in resolved:
+                        console.print(f"[green]- {issue_type}[/green] {desc}")
+                    if not added and not resolved:
+                        console.print("[dim]Набор проблем не изменился[/dim]")
+                console.print(
+                    f"[dim]разбор {(parsed - start) * 1000:.1f} мс, анализ {(done - parsed) * 1000:.1f} мс "
+                    f"(server-блоков пересчитано: {incremental.analyzed}, из памяти: {incremental.reused}), "
+                    f"проблем: {len(rows)}[/dim]"
+                )
+                previous = rows
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+def _analyze_host(path: str, use_cache: bool) -> Tuple[str, Optional[List[Tuple[str, str]]], float, Optional[str]]:
+    """
+    Разбор и анализ одного корня конфига (в процессе пула fleet-режима).
+    Возвращает (path, строки проблем или None, время в секундах, ошибка или None).
+    """
+    start = time.perf_counter()
+    try:
+        tree = parse_nginx_config(path, use_cache=use_cache)
+        rows = collect_issues(tree)
+    except FileNotFoundError:
+        return path, None, time.perf_counter() - start, "файл не найден"
+    except Exception as e:
+        return path, None, time.perf_counter() - start, str(e)
+    return path, rows, time.perf_counter() - start, None
+
+def expand_roots(patterns: List[str]) -> List[str]:
+    """Пути и glob-шаблоны (если оболочка их не раскрыла) -> отсортированный список путей без повторов."""
+    paths = []
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            paths.extend(sorted(glob.glob(pattern, recursive=True)))
+        else:
+            paths.append(pattern)
+    return list(dict.fromkeys(paths))
+
+class FleetReport:
+    """
+    Сводный отчёт по многим хостам: одинаковая проблема на разных хостах — одна строка
+    с числом хостов. Повторы на одном хосте считаются один раз.
+    """
+    def __init__(self):
+        # (issue_type, описание) -> хосты, в порядке поступления
+        self.hosts: Dict[Tuple[str, str], List[str]] = {}
+        self.failed: Dict[str, str] = {}
+        self.analyzed = 0
+
+    def add(self, host: str, rows: List[Tuple[str, str]]) -> None:
+        self.analyzed += 1
+        for row in dict.fromkeys(rows):
+            self.hosts.setdefault(row, []).append(host)
+
+    def fail(self, host: str, error: str) -> None:
+        self.failed[host] = error
+
+    def rows(self) -> List[Tuple[str, str, int]]:
+        """(issue_type, описание, число хостов): сначала самые частые, затем по типу проблемы."""
+        order = {t: i for i, t in enumerate(ISSUE_META)}
+        rows = [(t, desc, len(hosts)) for (t, desc), hosts in self.hosts.items()]
+        rows.sort(key=lambda r: (-r[2], order.get(r[0], len(order))))
+        return rows
+
+def _fleet_table(report: FleetReport) -> Table:
+    table = Table(show_header=True, header_style="bold blue")
+    table.add_column("issue_type")
+    table.add_column("issue_description")
+    table.add_column("hosts", justify="right")
+    table.add_column("solution")
+    for issue_type, desc, count in report.rows():
+        solution, severity = ISSUE_META.get(issue_type, ("", "low"))
+        color = SEVERITY_COLOR.get(severity, "yellow")
+        table.add_row(f"[{color}]{issue_type}[/{color}]", desc, f"{count}/{report.analyzed}", f"[{color}]{solution}[/{color}]")
+    return table
+
+def _fleet(patterns: List[str], no_cache: bool, jobs: int) -> None:
+    roots = expand_roots(patterns)
+    if not roots:
+        console.print(f"[red]Не найдено ни одного конфига по шаблону: {' '.join(patterns)}[/red]")
+        return
+    report = FleetReport()
+    total = len(roots)
+    start = time.perf_counter()
+
+    def on_result(done, result):
+        path, rows, elapsed, error = result
+        if error is not None:
+            report.fail(path, error)
+            console.print(f"[dim][{done}/{total}][/dim] [red]{path}: {error}[/red] [dim]{elapsed * 1000:.1f} мс[/dim]")
+        else:
+            report.add(path, rows)
+            console.print(f"[dim][{done}/{total}][/dim] {path}: проблем {len(rows)} [dim]{elapsed * 1000:.1f} мс[/dim]")
+
+    if jobs <= 1 or total < 2:
+        for done, path in enumerate(roots, 1):
+            on_result(done, _analyze_host(path, not no_cache))
+    else:
+        # Каждый корень разбирается и анализируется целиком в своём процессе;
+        # в главный процесс возвращаются только строки проблем
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(_analyze_host, path, not no_cache) for path in roots]
+            for done, future in enumerate(as_completed(futures), 1):
+                on_result(done, future.result())
+    elapsed = time.perf_counter() - start
+    if report.hosts:
+        console.print(_fleet_table(report))
+    elif report.analyzed:
+        console.print("[green]Проблем не найдено[/green]")
+    console.print(
+        f"[dim]хостов: {report.analyzed}, с ошибками разбора: {len(report.failed)}, "
+        f"уникальных проблем: {len(report.hosts)}, время {elapsed:.2f} с[/dim]"
+    )
+
+def analyze(
+    config_paths: List[str] = typer.Argument(..., metavar="CONFIG_PATH...", help="Путь к nginx.conf (с --fleet — несколько путей или glob-шаблонов)"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Не использовать дисковый кэш разбора"),
+    jobs: int = typer.Option(1, "--jobs", "-j", help="Число процессов для разбора файлов include, с --fleet — для анализа хостов (1 — последовательно)"),
+    fleet: bool = typer.Option(False, "--fleet", help="Анализировать много корней конфигов (по хосту на корень) и вывести сводный отчёт"),
+    watch: bool = typer.Option(False, "--watch", "-w", help="Следить за изменениями файлов и выводить новые/исчезнувшие проблемы"),
+    interval: float = typer.Option(1.0, "--interval", help="Период опроса файлов в режиме --watch, секунды")
+):
     """
     Анализирует конфигурацию Nginx на типовые проблемы и best practices.
 
@@ -55,83 +444,36 @@ def analyze(config_path: str = typer.Argument(..., help="Путь к nginx.conf"
       - Проблемы с rewrite
       - Мертвые location-ы
 
+    С --fleet каждый корень разбирается и анализируется в отдельном процессе,
+    результаты по хостам выводятся по мере готовности, а в сводном отчёте одинаковая
+    проблема показывается один раз с числом хостов.
+
     Пример:
         nginx-lens analyze /etc/nginx/nginx.conf
+        nginx-lens analyze /etc/nginx/nginx.conf --no-cache
+        nginx-lens analyze /etc/nginx/nginx.conf --jobs 8
+        nginx-lens analyze /etc/nginx/nginx.conf --watch
+        nginx-lens analyze --fleet 'snapshots/*/nginx.conf' --jobs 8
     """
+    if fleet and watch:
+        console.print("[red]--watch не поддерживается вместе с --fleet: следить можно только за одним корнем конфига[/red]")
+        raise typer.Exit(2)
+    if fleet:
+        _fleet(config_paths, no_cache, jobs)
+        return
+    if len(config_paths) > 1:
+        console.print("[red]Передано несколько путей к конфигам; для анализа нескольких корней используйте --fleet[/red]")
+        return
+    config_path = config_paths[0]
+    if watch:
+        _watch(config_path, no_cache, jobs, interval)
+        return
     try:
-        tree = parse_nginx_config(config_path)
+        tree = parse_nginx_config(config_path, use_cache=not no_cache, jobs=jobs)
     except FileNotFoundError:
         console.print(f"[red]Файл {config_path} не найден. Проверьте путь к конфигу.[/red]")
         return
     except Exception as e:
         console.print(f"[red]Ошибка при разборе {config_path}: {e}[/red]")
         return
-    conflicts = find_location_conflicts(tree)
-    dups = find_duplicate_directives(tree)
-    empties = find_empty_blocks(tree)
-    warnings = find_warnings(tree)
-    unused_vars = find_unused_variables(tree)
-    listen_conflicts = find_listen_servername_conflicts(tree)
-    rewrite_issues = find_rewrite_issues(tree)
-    dead_locations = find_dead_locations(tree)
-
-    table = Table(show_header=True, header_style="bold blue")
-    table.add_column("issue_type")
-    table.add_column("issue_description")
-    table.add_column("solution")
-
-    def add_row(issue_type, desc):
-        solution, severity = ISSUE_META.get(issue_type, ("", "low"))
-        color = SEVERITY_COLOR.get(severity, "yellow")
-        table.add_row(f"[{color}]{issue_type}[/{color}]", desc, f"[{color}]{solution}[/{color}]")
-
-    for c in conflicts:
-        add_row("location_conflict", f"server: {c['server'].get('arg', '')} location: {c['location1']} ↔ {c['location2']}")
-    for d in dups:
-        loc = d.get('location')
-        add_row("duplicate_directive", f"{d['directive']} ({d['args']}) — {d['count']} раз в блоке {d['block'].get('block', d['block'])}{' location: '+str(loc) if loc else ''}")
-    for e in empties:
-        add_row("empty_block", f"{e['block']} {e['arg'] or ''}")
-    for w in warnings:
-        t = w['type']
-        if t == 'proxy_pass_no_scheme':
-            add_row(t, f"proxy_pass без схемы: {w['value']}")
-        elif t == 'autoindex_on':
-            add_row(t, f"autoindex on в блоке {w['context'].get('block','')}")
-        elif t == 'if_block':
-            add_row(t, f"директива if внутри блока {w['context'].get('block','')}")
-        elif t == 'server_tokens_on':
-            add_row(t, f"server_tokens on в блоке {w['context'].get('block','')}")
-        elif t == 'ssl_missing':
-            add_row(t, f"{w['directive']} не указан")
-        elif t == 'ssl_protocols_weak':
-            add_row(t, f"ssl_protocols содержит устаревшие протоколы: {w['value']}")
-        elif t == 'ssl_ciphers_weak':
-            add_row(t, f"ssl_ciphers содержит слабые шифры: {w['value']}")
-        elif t == 'listen_443_no_ssl':
-            add_row(t, f"listen без ssl: {w['value']}")
-        elif t == 'listen_443_no_http2':
-            add_row(t, f"listen 443 без http2: {w['value']}")
-        elif t == 'no_limit_req_conn':
-            add_row(t, f"server без limit_req/limit_conn")
-        elif t == 'missing_security_header':
-            add_row(t, f"отсутствует security header: {w['value']}")
-        elif t == 'deprecated':
-            add_row(t, f"устаревшая директива: {w['directive']} — {w['value']}")
-        elif t == 'limit_too_small':
-            add_row(t, f"слишком маленькое значение: {w['directive']} = {w['value']}")
-        elif t == 'limit_too_large':
-            add_row(t, f"слишком большое значение: {w['directive']} = {w['value']}")
-    for v in unused_vars:
-        add_row("unused_variable", v['name'])
-    for c in listen_conflicts:
-        add_row("listen_servername_conflict", f"server1: {c['server1'].get('arg','')} server2: {c['server2'].get('arg','')} listen: {','.join(c['listen'])} server_name: {','.join(c['server_name'])}")
-    for r in rewrite_issues:
-        add_row(r['type'], r['value'])
-    for l in dead_locations:
-        add_row("dead_location", f"server: {l['server'].get('arg','')} location: {l['location'].get('arg','')}")
-
-    if table.row_count == 0:
-        console.print("[green]Проблем не найдено[/green]")
-    else:
-        console.print(table) 
\ No newline at end of file
+    _print_issues(collect_issues(tree))
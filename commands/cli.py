@@ -9,6 +9,7 @@ from commands.include import include_tree
 from commands.graph import graph
 from commands.logs import logs
 from commands.syntax import syntax
+from commands.serve import serve
 
 app = typer.Typer(help="nginx-lens — анализ и диагностика конфигураций Nginx")
 console = Console()
@@ -22,6 +23,7 @@ app.command()(include_tree)
 app.command()(graph)
 app.command()(logs)
 app.command()(syntax)
+app.command()(serve)
 
 if __name__ == "__main__":
     app() 
\ No newline at end of file
@@ -1,6 +1,7 @@
 import typer
 from rich.console import Console
 from parser.nginx_parser import parse_nginx_config
+from parser.nodes import iter_nodes
 from exporter.graph import tree_to_dot, tree_to_mermaid
 from rich.text import Text
 import os
@@ -9,7 +10,9 @@ app = typer.Typer()
 console = Console()
 
 def graph(
-    config_path: str = typer.Argument(..., help="Путь к nginx.conf")
+    config_path: str = typer.Argument(..., help="Путь к nginx.conf"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Не использовать дисковый кэш разбора"),
+    jobs: int = typer.Option(1, "--jobs", "-j", help="Число процессов для разбора файлов include (1 — последовательно)")
 ):
     """
     Показывает все возможные маршруты nginx в виде цепочек server → location → proxy_pass → upstream → server.
@@ -18,50 +21,36 @@ def graph(
         nginx-lens graph /etc/nginx/nginx.conf
     """
     try:
-        tree = parse_nginx_config(config_path)
+        tree = parse_nginx_config(config_path, use_cache=not no_cache, jobs=jobs)
     except FileNotFoundError:
         console.print(f"[red]Файл {config_path} не найден. Проверьте путь к конфигу.[/red]")
         return
     except Exception as e:
         console.print(f"[red]Ошибка при разборе {config_path}: {e}[/red]")
         return
+    # Маршруты: server -> location-ы -> proxy_pass [-> upstream -> server]; узлы ищутся по индексам дерева
+    upstreams = {}
+    for up in tree.blocks('upstream'):
+        upstreams.setdefault(up.arg, up)
     routes = []
-    # Для каждого server/location строим маршрут
-    def walk(d, chain, upstreams):
-        if d.get('block') == 'server':
-            for sub in d.get('directives', []):
-                walk(sub, chain + [('server', None)], upstreams)
-        elif d.get('block') == 'location':
-            loc = d.get('arg','')
-            for sub in d.get('directives', []):
-                walk(sub, chain + [('location', loc)], upstreams)
-        elif d.get('directive') == 'proxy_pass':
-            val = d.get('args','')
+    for server_block in tree.servers():
+        for pp in tree.find('proxy_pass', within=server_block):
+            chain = [('server', server_block)]
+            inside = False
+            for block in reversed(tree.ancestors(pp)):
+                if inside and block.name == 'location':
+                    chain.append(('location', block))
+                inside = inside or block is server_block
+            val = pp['args']
             # ищем, есть ли такой upstream
-            up_name = None
+            up_block = None
             if val.startswith('http://') or val.startswith('https://'):
-                up = val.split('://',1)[1].split('/',1)[0]
-                if up in upstreams:
-                    up_name = up
-            if up_name:
-                for srv in upstreams[up_name]:
-                    routes.append(chain + [('proxy_pass', val), ('upstream', up_name), ('upstream_server', srv)])
+                up_block = upstreams.get(val.split('://',1)[1].split('/',1)[0])
+            if up_block is not None:
+                for srv in up_block['servers']:
+                    routes.append(chain + [('proxy_pass', val), ('upstream', up_block), ('upstream_server', srv)])
             else:
                 routes.append(chain + [('proxy_pass', val)])
-        elif d.get('upstream'):
-            # собираем upstream-ы
-            upstreams[d['upstream']] = d.get('servers',[])
-        # рекурсивно по всем директивам
-        for sub in d.get('directives', []):
-            walk(sub, chain, upstreams)
-    # Собираем upstream-ы
-    upstreams = {}
-    for d in tree.directives:
-        if d.get('upstream'):
-            upstreams[d['upstream']] = d.get('servers',[])
-    # Строим маршруты
-    for d in tree.directives:
-        walk(d, [], upstreams)
     if not routes:
         console.print("[yellow]Не найдено ни одного маршрута[/yellow]")
         return
@@ -69,54 +58,33 @@ def graph(
     # Красивый вывод
     seen = set()
     for route in routes:
-        if not route or route[0][0] != 'server':
-            continue
-        key = tuple(route)
+        key = tuple(val if isinstance(val, str) else id(val) for _, val in route)
         if key in seen:
             continue
         seen.add(key)
         t = Text()
-        # Получаем label для server
-        server_val = route[0][1]
-        server_block = None
-        for d in tree.directives:
-            if d.get('block') == 'server':
-                server_block = d
-                break
-        label = get_server_label(server_block) if server_block else 'default'
-        server_file = server_block.get('__file__') if server_block else None
+        server_block = route[0][1]
+        label = get_server_label(server_block)
+        server_file = server_block.get('__file__')
         t.append(f"[", style="white")
         t.append(f"server: {label}", style="bold blue")
         if server_file and os.path.abspath(server_file) != main_file:
             t.append(f" ({server_file})", style="grey50")
         t.append("]", style="white")
-        for i, (typ, val) in enumerate(route[1:]):
-            block = None
-            if typ == 'location' and server_block:
-                # Найти location-блок внутри server
-                for sub in server_block.get('directives', []):
-                    if sub.get('block') == 'location' and sub.get('arg') == val:
-                        block = sub
-                        break
-            elif typ == 'upstream':
-                # Найти upstream-блок
-                for d in tree.directives:
-                    if d.get('upstream') == val:
-                        block = d
-                        break
+        for typ, val in route[1:]:
             if typ == 'location':
                 t.append(f" -> [", style="white")
-                t.append(f"location: {val}", style="yellow")
-                if block and block.get('__file__') and os.path.abspath(block['__file__']) != main_file:
-                    t.append(f" ({block['__file__']})", style="grey50")
+                t.append(f"location: {val.arg or ''}", style="yellow")
+                if val.file and os.path.abspath(val.file) != main_file:
+                    t.append(f" ({val.file})", style="grey50")
                 t.append("]", style="white")
             elif typ == 'proxy_pass':
                 t.append(f" -> proxy_pass: {val}", style="green")
             elif typ == 'upstream':
                 t.append(f" -> [", style="white")
-                t.append(f"upstream: {val}", style="magenta")
-                if block and block.get('__file__') and os.path.abspath(block['__file__']) != main_file:
-                    t.append(f" ({block['__file__']})", style="grey50")
+                t.append(f"upstream: {val.arg}", style="magenta")
+                if val.file and os.path.abspath(val.file) != main_file:
+                    t.append(f" ({val.file})", style="grey50")
                 t.append("]", style="white")
             elif typ == 'upstream_server':
                 t.append(f" -> [", style="white")
@@ -131,7 +99,7 @@ def get_server_label(server_block):
     # Ищем server_name
     names = []
     listens = []
-    for sub in server_block.get('directives', []):
+    for sub in iter_nodes(server_block.get('directives', [])):
         if sub.get('directive') == 'server_name':
             names += sub.get('args', '').split()
         if sub.get('directive') == 'listen':
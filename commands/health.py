@@ -1,7 +1,15 @@
+import asyncio
+import threading
+import time
 import typer
 from rich.console import Console
+from rich.live import Live
 from rich.table import Table
-from upstream_checker.checker import check_upstreams
+from exporter.prometheus import HealthMetrics, MetricsServer, write_textfile
+from upstream_checker.checker import check_upstreams, parse_time, raise_fd_limit
+from upstream_checker.dns import CachingResolver
+from upstream_checker.monitor import DISABLED, DOWN, FAILING, UNKNOWN, UNRESOLVED, UP, Monitor
+from upstream_checker.http import DEFAULT_EXPECT, check_upstreams_http, parse_expect, percentile, summarize
 from parser.nginx_parser import parse_nginx_config
 
 app = typer.Typer()
@@ -10,7 +18,21 @@ console = Console()
 def health(
     config_path: str = typer.Argument(..., help="Путь к nginx.conf"),
     timeout: float = typer.Option(2.0, help="Таймаут проверки (сек)"),
-    retries: int = typer.Option(1, help="Количество попыток")
+    retries: int = typer.Option(1, help="Количество попыток"),
+    concurrency: int = typer.Option(None, "--concurrency", help="Сколько соединений открывать одновременно (по умолчанию — по лимиту открытых файлов)"),
+    http: str = typer.Option(None, "--http", help="HTTP-проверка: GET этого пути (например, /healthz) вместо TCP-соединения"),
+    probes: int = typer.Option(1, "--probes", help="Сколько HTTP-запросов отправить каждому серверу (для p50/p95)"),
+    expect: str = typer.Option(DEFAULT_EXPECT, "--expect", help="Ожидаемые коды ответа: 200,204 / 2xx,3xx / 200-299"),
+    host: str = typer.Option(None, "--host", help="Заголовок Host HTTP-проверки (по умолчанию — адрес сервера)"),
+    https: bool = typer.Option(False, "--https", help="HTTP-проверка по TLS (сертификат не проверяется)"),
+    interval: str = typer.Option(None, "--interval", help="Непрерывный мониторинг: проверять каждый сервер раз в интервал (5s, 1m)"),
+    jitter: float = typer.Option(0.1, "--jitter", help="Случайный сдвиг следующей проверки, доля интервала"),
+    max_backoff: str = typer.Option(None, "--max-backoff", help="Наибольшая задержка проверки падающего сервера (по умолчанию — 10 интервалов)"),
+    duration: str = typer.Option(None, "--duration", help="Остановить мониторинг через это время"),
+    metrics_port: int = typer.Option(None, "--metrics-port", help="Отдавать метрики Prometheus/OpenMetrics на этом порту (/metrics; с --interval)"),
+    metrics_file: str = typer.Option(None, "--metrics-file", help="Записывать метрики в файл для textfile collector node_exporter"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Не использовать дисковый кэш разбора"),
+    jobs: int = typer.Option(1, "--jobs", "-j", help="Число процессов для разбора файлов include (1 — последовательно)")
 ):
     """
     Проверяет доступность upstream-серверов, определённых в nginx.conf. Выводит таблицу.
@@ -18,9 +40,31 @@ def health(
     Пример:
         nginx-lens health /etc/nginx/nginx.conf
         nginx-lens health /etc/nginx/nginx.conf --timeout 5 --retries 3
+        nginx-lens health /etc/nginx/nginx.conf --concurrency 200
+        nginx-lens health /etc/nginx/nginx.conf --http /healthz --probes 5 --expect 200,204
+        nginx-lens health /etc/nginx/nginx.conf --interval 5s --http /healthz
+        nginx-lens health /etc/nginx/nginx.conf --interval 5s --metrics-port 9113
     """
+    # Сначала опции: опечатка в них не должна стоить разбора конфига и смены лимитов процесса
     try:
-        tree = parse_nginx_config(config_path)
+        parse_expect(expect)
+    except ValueError as e:
+        console.print(f"[red]Неверный --expect: {e}[/red]")
+        raise typer.Exit(2)
+    if interval is not None:
+        try:
+            every, backoff, stop = (parse_time(v) if v is not None else None
+                                    for v in (interval, max_backoff, duration))
+            if every <= 0:
+                raise ValueError("--interval должен быть больше нуля")
+        except ValueError as e:
+            console.print(f"[red]{e}[/red]")
+            raise typer.Exit(2)
+    elif metrics_port is not None:
+        console.print("[red]--metrics-port работает только в режиме мониторинга (--interval)[/red]")
+        raise typer.Exit(2)
+    try:
+        tree = parse_nginx_config(config_path, use_cache=not no_cache, jobs=jobs)
     except FileNotFoundError:
         console.print(f"[red]Файл {config_path} не найден. Проверьте путь к конфигу.[/red]")
         return
@@ -28,13 +72,187 @@ def health(
         console.print(f"[red]Ошибка при разборе {config_path}: {e}[/red]")
         return
     upstreams = tree.get_upstreams()
-    results = check_upstreams(upstreams, timeout=timeout, retries=retries)
+    if concurrency is None:
+        # По умолчанию соединений столько, сколько позволяет лимит открытых файлов — поднимаем его до жёсткого
+        raise_fd_limit()
+    # Имена серверов разрешаются все одновременно; в режиме --interval — заново по истечении TTL
+    resolver = CachingResolver(timeout=timeout)
+    try:
+        if interval is not None:
+            monitor = Monitor(upstreams, every, timeout=timeout, retries=retries, jitter=jitter,
+                              max_backoff=backoff, concurrency=concurrency, http=http, probes=probes,
+                              expect=expect, host=host, tls=https, resolver=resolver)
+            _monitor(monitor, stop, metrics_port, metrics_file)
+            return
+        if http is not None:
+            results = check_upstreams_http(upstreams, path=http, timeout=timeout, retries=retries, probes=probes,
+                                           expect=expect, host=host, tls=https, concurrency=concurrency,
+                                           resolver=resolver)
+            _print_http(results)
+        else:
+            results = check_upstreams(upstreams, timeout=timeout, retries=retries, concurrency=concurrency,
+                                      resolver=resolver)
+            _print_tcp(results)
+        _print_dns(results)
+        if metrics_file is not None:
+            metrics = HealthMetrics()
+            metrics.observe_results(results)
+            write_textfile(metrics_file, metrics)
+    finally:
+        # Пул потоков getaddrinfo: закрывается при любом выходе, в том числе по Ctrl-C
+        resolver.close()
+
+def _print_tcp(results) -> None:
+    table = Table(show_header=True, header_style="bold blue")
+    table.add_column("upstream_name")
+    table.add_column("server")
+    table.add_column("upstream_status")
+    table.add_column("latency", justify="right")
+    table.add_column("error")
+    for name, servers in results.items():
+        for srv in servers:
+            if srv.get("resolve_error"):
+                continue
+            latency = srv.get("latency")
+            table.add_row(name, _server(srv), _status(srv), _ms(latency), srv.get("error") or "")
+    console.print(table)
+
+def _server(srv) -> str:
+    """Адрес сервера; для заданного именем — с проверенным IP-адресом."""
+    if srv.get("name") and srv.get("ip"):
+        return f"{srv['address']} ({srv['ip']})"
+    return srv["address"]
+
+def _print_dns(results) -> None:
+    """Разрешение имён отдельно от ошибок соединения: время и ошибки по каждому имени."""
+    names = {}
+    for name, servers in results.items():
+        for srv in servers:
+            if srv.get("name"):
+                names.setdefault((name, srv["address"]), srv)
+    if not names:
+        return
+    failed = [(key, srv) for key, srv in names.items() if srv.get("resolve_error")]
+    latencies = [srv["resolve_latency"] for srv in names.values() if srv.get("resolve_latency") is not None]
+    console.print(f"DNS: имён — {len(names)}, не разрешилось — {len(failed)}, "
+                  f"время разрешения p50 {_ms(percentile(latencies, 50))}, max {_ms(max(latencies, default=None))}")
+    if not failed:
+        return
+    table = Table(show_header=True, header_style="bold blue", title="Ошибки разрешения имён")
+    table.add_column("upstream_name")
+    table.add_column("server")
+    table.add_column("error")
+    table.add_column("latency", justify="right")
+    for (name, address), srv in failed:
+        table.add_row(name, address, f"[red]{srv['resolve_error']}[/red]", _ms(srv.get("resolve_latency")))
+    console.print(table)
+
+def _status(srv) -> str:
+    if srv.get("down"):
+        status = "[dim]Down[/dim]"
+    elif srv["healthy"]:
+        status = "[green]Healthy[/green]"
+    else:
+        status = "[red]Unhealthy[/red]"
+    if srv.get("backup"):
+        status += " (backup)"
+    return status
+
+def _ms(seconds) -> str:
+    return f"{seconds * 1000:.1f} ms" if seconds is not None else "-"
+
+STATE_STYLE = {UP: "green", FAILING: "yellow", DOWN: "red", UNKNOWN: "dim", DISABLED: "dim", UNRESOLVED: "magenta"}
+
+class _MonitorView:
+    """Таблица для rich Live: сводка по состояниям и последние смены состояния серверов."""
+    def __init__(self, monitor: Monitor, rows: int = 20):
+        self.monitor = monitor
+        self.rows = rows
+
+    def __rich__(self):
+        monitor = self.monitor
+        counts = monitor.counts()
+        header = "  ".join(f"[{STATE_STYLE[state]}]{state}: {n}[/{STATE_STYLE[state]}]"
+                           for state, n in counts.items() if n)
+        table = Table(show_header=True, header_style="bold blue",
+                      title=f"Интервал {monitor.interval:g} с, проверок: {monitor.probes}   {header}")
+        table.add_column("time")
+        table.add_column("upstream_name")
+        table.add_column("server")
+        table.add_column("change")
+        table.add_column("latency", justify="right")
+        table.add_column("error")
+        # Копия: deque пополняется из цикла проверок
+        for change in reversed(list(monitor.changes)[-self.rows:]):
+            style = STATE_STYLE[change.new]
+            table.add_row(time.strftime("%H:%M:%S", time.localtime(change.time)), change.upstream, change.address,
+                          f"{change.old} → [{style}]{change.new}[/{style}]", _ms(change.latency), change.error or "")
+        return table
+
+def _monitor(monitor: Monitor, duration, metrics_port=None, metrics_file=None) -> None:
+    for name, spec, error in monitor.invalid:
+        console.print(f"[red]{name}: неверная директива server {spec!r}: {error}[/red]")
+    metrics = server = writer = None
+    stop = threading.Event()
+    if metrics_port is not None or metrics_file is not None:
+        metrics = HealthMetrics()
+        monitor.on_probe = lambda m: metrics.observe(m.upstream, m.address, m.state == UP, m.latency, m.consecutive)
+    if metrics_port is not None:
+        try:
+            server = MetricsServer(metrics, metrics_port).start()
+        except OSError as e:
+            console.print(f"[red]Не удалось открыть --metrics-port {metrics_port}: {e.strerror or e}[/red]")
+            raise typer.Exit(2)
+        console.print(f"Метрики: http://localhost:{metrics_port}/metrics")
+    if metrics_file is not None:
+        writer = threading.Thread(target=_write_metrics, args=(metrics_file, metrics, monitor.interval, stop), daemon=True)
+        writer.start()
+    try:
+        # Перерисовка раз в секунду независимо от числа проверок
+        with Live(_MonitorView(monitor), console=console, refresh_per_second=1):
+            try:
+                asyncio.run(monitor.run(duration))
+            except KeyboardInterrupt:
+                pass
+    finally:
+        stop.set()
+        if writer is not None:
+            writer.join()
+        if server is not None:
+            server.stop()
+    for member in monitor.members:
+        if member.state == UNRESOLVED:
+            console.print(f"[magenta]{member.upstream}: {member.address}: {member.error}[/magenta]")
+
+def _write_metrics(path: str, metrics: HealthMetrics, every: float, stop: threading.Event) -> None:
+    """Перезаписывает файл метрик раз в интервал и при остановке мониторинга."""
+    while not stop.wait(every):
+        write_textfile(path, metrics)
+    write_textfile(path, metrics)
+
+def _print_http(results) -> None:
     table = Table(show_header=True, header_style="bold blue")
     table.add_column("upstream_name")
+    table.add_column("server")
     table.add_column("upstream_status")
+    table.add_column("code", justify="right")
+    table.add_column("p50", justify="right")
+    table.add_column("p95", justify="right")
+    table.add_column("max", justify="right")
+    table.add_column("error")
     for name, servers in results.items():
         for srv in servers:
-            status = "Healthy" if srv["healthy"] else "Unhealthy"
-            color = "green" if srv["healthy"] else "red"
-            table.add_row(srv["address"], f"[{color}]{status}[/{color}]")
-    console.print(table) 
\ No newline at end of file
+            if srv.get("resolve_error"):
+                continue
+            table.add_row(name, _server(srv), _status(srv), str(srv.get("status") or "-"),
+                          _ms(srv["p50"]), _ms(srv["p95"]), _ms(srv["max"]), srv.get("error") or "")
+    console.print(table)
+    summary = Table(show_header=True, header_style="bold blue", title="Задержка по upstream")
+    summary.add_column("upstream_name")
+    summary.add_column("healthy", justify="right")
+    summary.add_column("p50", justify="right")
+    summary.add_column("p95", justify="right")
+    summary.add_column("max", justify="right")
+    for name, row in summarize(results).items():
+        summary.add_row(name, f"{row['healthy']}/{row['servers']}", _ms(row["p50"]), _ms(row["p95"]), _ms(row["max"]))
+    console.print(summary)
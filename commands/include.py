@@ -2,7 +2,8 @@ import typer
 from rich.console import Console
 from rich.tree import Tree
 from rich.table import Table
-from analyzer.include import build_include_tree, find_include_cycles, find_include_shadowing
+from analyzer.include import build_include_tree, find_include_shadowing
+from parser.resolver import IncludeResolver
 
 app = typer.Typer()
 console = Console()
@@ -19,7 +20,8 @@ def include_tree(
         nginx-lens include-tree /etc/nginx/nginx.conf --directive server_name
     """
     try:
-        tree = build_include_tree(config_path)
+        resolver = IncludeResolver()
+        tree = build_include_tree(config_path, resolver=resolver)
     except FileNotFoundError:
         console.print(f"[red]Файл {config_path} не найден. Проверьте путь к конфигу.[/red]")
         return
@@ -40,15 +42,15 @@ def include_tree(
                         _add(sub, sub_t)
     _add(rich_tree, tree)
     console.print(rich_tree)
-    # Циклы
-    cycles = find_include_cycles(tree)
+    # Циклы — по графу include, который resolver собрал при построении дерева
+    cycles = resolver.cycles()
     if cycles:
         console.print("[red]Обнаружены циклы include-ов:[/red]")
         for c in cycles:
             console.print(" -> ".join(c))
     # Shadowing
     if directive:
-        shadow = find_include_shadowing(tree, directive)
+        shadow = find_include_shadowing(tree, directive, resolver)
         if shadow:
             table = Table(show_header=True, header_style="bold blue")
             table.add_column("file")
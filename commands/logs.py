@@ -1,21 +1,22 @@
+import time
 import typer
 from rich.console import Console
 from rich.table import Table
-import re
-from collections import Counter, defaultdict
+from analyzer.logs import DEFAULT_CAPACITY, analyze_log, open_log, text
 
 app = typer.Typer(help="Анализ access.log/error.log: топ-статусы, пути, IP, User-Agent, ошибки.")
 console = Console()
 
-log_line_re = re.compile(r'(?P<ip>\S+) \S+ \S+ \[(?P<time>[^\]]+)\] "(?P<method>\S+) (?P<path>\S+) [^\"]+" (?P<status>\d{3})')
-
 def logs(
-    log_path: str = typer.Argument(..., help="Путь к access.log или error.log"),
-    top: int = typer.Option(10, help="Сколько топ-значений выводить")
+    log_path: str = typer.Argument(..., help="Путь к access.log или error.log (можно .gz)"),
+    top: int = typer.Option(10, help="Сколько топ-значений выводить"),
+    max_keys: int = typer.Option(DEFAULT_CAPACITY, "--max-keys", help="Сколько различных путей, IP и User-Agent хранить в памяти (дальше счёт приблизительный)")
 ):
     """
     Анализирует access.log/error.log.
 
+    Лог читается потоком: память не зависит от размера файла.
+
     Показывает:
       - Топ HTTP-статусов (404, 500 и др.)
       - Топ путей
@@ -25,73 +26,60 @@ def logs(
 
     Пример:
         nginx-lens logs /var/log/nginx/access.log --top 20
+        nginx-lens logs /var/log/nginx/access.log.1.gz
     """
+    start = time.perf_counter()
     try:
-        with open(log_path) as f:
-            lines = list(f)
+        with open_log(log_path) as f:
+            stats = analyze_log(f, capacity=max_keys)
+            size = f.tell()
     except FileNotFoundError:
         console.print(f"[red]Файл {log_path} не найден. Проверьте путь к логу.[/red]")
         return
     except Exception as e:
         console.print(f"[red]Ошибка при чтении {log_path}: {e}[/red]")
         return
-    status_counter = Counter()
-    path_counter = Counter()
-    ip_counter = Counter()
-    user_agent_counter = Counter()
-    errors = defaultdict(list)
-    for line in lines:
-        m = log_line_re.search(line)
-        if m:
-            ip = m.group('ip')
-            path = m.group('path')
-            status = m.group('status')
-            status_counter[status] += 1
-            path_counter[path] += 1
-            ip_counter[ip] += 1
-            if status.startswith('4') or status.startswith('5'):
-                errors[status].append(path)
-        # user-agent (если есть)
-        if '" "' in line:
-            ua = line.rsplit('" "', 1)[-1].strip().strip('"')
-            if ua:
-                user_agent_counter[ua] += 1
+    elapsed = time.perf_counter() - start
     # Топ статусов
     table = Table(title="Top HTTP Status Codes", show_header=True, header_style="bold blue")
     table.add_column("Status")
     table.add_column("Count")
-    for status, count in status_counter.most_common(top):
-        table.add_row(status, str(count))
+    for status, count in stats.statuses.most_common(top):
+        table.add_row(text(status), str(count))
     console.print(table)
     # Топ путей
     table = Table(title="Top Paths", show_header=True, header_style="bold blue")
     table.add_column("Path")
     table.add_column("Count")
-    for path, count in path_counter.most_common(top):
-        table.add_row(path, str(count))
+    for path, count in stats.paths.most_common(top):
+        table.add_row(text(path), str(count))
     console.print(table)
     # Топ IP
     table = Table(title="Top IPs", show_header=True, header_style="bold blue")
     table.add_column("IP")
     table.add_column("Count")
-    for ip, count in ip_counter.most_common(top):
-        table.add_row(ip, str(count))
+    for ip, count in stats.ips.most_common(top):
+        table.add_row(text(ip), str(count))
     console.print(table)
     # Топ User-Agent
-    if user_agent_counter:
+    if stats.user_agents:
         table = Table(title="Top User-Agents", show_header=True, header_style="bold blue")
         table.add_column("User-Agent")
         table.add_column("Count")
-        for ua, count in user_agent_counter.most_common(top):
-            table.add_row(ua, str(count))
+        for ua, count in stats.user_agents.most_common(top):
+            table.add_row(text(ua), str(count))
         console.print(table)
     # Топ 404/500
-    for err in ('404', '500'):
-        if errors[err]:
-            table = Table(title=f"Top {err} Paths", show_header=True, header_style="bold blue")
+    for err in (b'404', b'500'):
+        if err in stats.errors:
+            table = Table(title=f"Top {text(err)} Paths", show_header=True, header_style="bold blue")
             table.add_column("Path")
             table.add_column("Count")
-            c = Counter(errors[err])
-            for path, count in c.most_common(top):
-                table.add_row(path, str(count))
-            console.print(table) 
\ No newline at end of file
+            for path, count in stats.errors[err].most_common(top):
+                table.add_row(text(path), str(count))
+            console.print(table)
+    if stats.approximate:
+        console.print(f"[yellow]Различных значений больше --max-keys ({max_keys}): счётчики редких значений приблизительные[/yellow]")
+    mb = size / 1e6
+    console.print(f"[dim]Строк: {stats.lines} ({mb:.1f} МБ) за {elapsed:.2f} с — "
+                  f"{stats.lines / elapsed if elapsed else 0:,.0f} строк/с, {mb / elapsed if elapsed else 0:.1f} МБ/с[/dim]")
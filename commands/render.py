@@ -0,0 +1,104 @@
+"""
+Вывод результатов analyze и route.
+
+Общий для обычного CLI и клиента демона (daemon/client.py): при запущенном демоне
+вывод команд тот же, что без него. Поэтому модуль импортирует только rich —
+без typer и парсера конфигов.
+"""
+from typing import Any, Dict, List, Tuple
+from rich.console import Console
+from rich.markup import escape
+from rich.panel import Panel
+from rich.table import Table
+
+# Карта советов и критичности для issue_type
+ISSUE_META = {
+    'location_conflict': ("Возможное пересечение location. Это не всегда ошибка: порядок и типы location могут быть корректны. Проверьте, что порядок и типы location соответствуют вашим ожиданиям. Если всё ок — игнорируйте предупреждение.", "medium"),
+    'duplicate_directive': ("Оставьте только одну директиву с нужным значением в этом блоке.", "medium"),
+    'empty_block': ("Удалите или заполните пустой блок.", "low"),
+    'proxy_pass_no_scheme': ("Добавьте http:// или https:// в proxy_pass.", "medium"),
+    'autoindex_on': ("Отключите autoindex, если не требуется публикация файлов.", "medium"),
+    'if_block': ("Избегайте if внутри location, используйте map/try_files.", "medium"),
+    'server_tokens_on': ("Отключите server_tokens для безопасности.", "low"),
+    'ssl_missing': ("Укажите путь к SSL-сертификату/ключу.", "high"),
+    'ssl_protocols_weak': ("Отключите устаревшие протоколы TLS.", "high"),
+    'ssl_ciphers_weak': ("Используйте современные шифры.", "high"),
+    'listen_443_no_ssl': ("Добавьте ssl к listen 443.", "high"),
+    'listen_443_no_http2': ("Добавьте http2 к listen 443 для производительности.", "low"),
+    'no_limit_req_conn': ("Добавьте limit_req/limit_conn для защиты от DDoS.", "medium"),
+    'missing_security_header': ("Добавьте security-заголовок.", "medium"),
+    'deprecated': ("Замените устаревшую директиву.", "medium"),
+    'limit_too_small': ("Увеличьте лимит до рекомендуемого значения.", "medium"),
+    'limit_too_large': ("Уменьшите лимит до разумного значения.", "medium"),
+    'unused_variable': ("Удалите неиспользуемую переменную.", "low"),
+    'listen_servername_conflict': ("Измените listen/server_name для устранения конфликта.", "high"),
+    'rewrite_cycle': ("Проверьте rewrite на циклические правила.", "high"),
+    'rewrite_conflict': ("Проверьте порядок и уникальность rewrite.", "medium"),
+    'rewrite_no_flag': ("Добавьте last/break/redirect/permanent к rewrite.", "low"),
+    'rewrite_redos': ("Упростите regex: вложенные квантификаторы вроде (a+)+ могут выполняться экспоненциально долго.", "medium"),
+    'dead_location': ("Удалите неиспользуемый location или используйте его.", "low"),
+}
+SEVERITY_COLOR = {"high": "red", "medium": "orange3", "low": "yellow"}
+
+def order_issues(rows) -> List[Tuple[str, str]]:
+    """
+    Строки (issue_type, описание) в порядке таблицы: по типам проблем (как в ISSUE_META),
+    внутри типа — по описанию. Порядок не зависит от того, как строки собраны
+    (collect_issues или IncrementalIssues в демоне).
+    """
+    order = {t: i for i, t in enumerate(ISSUE_META)}
+    return sorted((tuple(row) for row in rows), key=lambda r: (order.get(r[0], len(order)), r[0], r[1]))
+
+def issues_table(rows) -> Table:
+    table = Table(show_header=True, header_style="bold blue")
+    table.add_column("issue_type")
+    table.add_column("issue_description")
+    table.add_column("solution")
+    for issue_type, desc in order_issues(rows):
+        solution, severity = ISSUE_META.get(issue_type, ("", "low"))
+        color = SEVERITY_COLOR.get(severity, "yellow")
+        table.add_row(f"[{color}]{issue_type}[/{color}]", desc, f"[{color}]{solution}[/{color}]")
+    return table
+
+def print_issues(console: Console, rows) -> None:
+    if not rows:
+        console.print("[green]Проблем не найдено[/green]")
+    else:
+        console.print(issues_table(rows))
+
+# Как выбран server (см. analyzer/route.py)
+SERVER_MATCH = {
+    'exact': "точное имя",
+    'wildcard': "wildcard-имя",
+    'regex': "regex-имя",
+    'default': "default server (имя не подошло)",
+}
+
+def print_route(console: Console, view: Dict[str, Any]) -> None:
+    """Найденный маршрут; view — словарь analyzer.route.route_view."""
+    text = f"[bold]Config:[/bold] {view['config']}\n"
+    if view['server'] is not None:
+        text += f"[bold]Server:[/bold] {escape(view['server']) or escape('[no server_name]')}"
+        if view['server_file']:
+            text += f" ([dim]{view['server_file']}[/dim])"
+        text += f" [dim]— {SERVER_MATCH.get(view['server_match'], view['server_match'])}[/dim]\n"
+    if view['location'] is not None:
+        text += f"[bold]Location:[/bold] {view['location']}"
+        if view['location_file']:
+            text += f" ([dim]{view['location_file']}[/dim])"
+        text += "\n"
+    if view['proxy_pass']:
+        text += f"[bold]proxy_pass:[/bold] {view['proxy_pass']}"
+        if view['proxy_pass_if']:
+            text += f" [dim](только если {view['proxy_pass_if']})[/dim]"
+        text += "\n"
+    for name, values in view['effective'].items():
+        for args in values:
+            text += f"[dim]{name}[/dim] {args}\n"
+    console.print(Panel(text, title="Route", style="green"))
+
+def print_no_route(console: Console, url: str, search_dir: str) -> None:
+    console.print(Panel(f"Маршрут для {url} не найден ни в одном .conf в {search_dir}", style="yellow"))
+
+def print_bad_url(console: Console, url: str, error: str) -> None:
+    console.print(f"[red]Неверный URL {url}: {error}[/red]")
@@ -1,64 +1,134 @@
 import typer
 from rich.console import Console
 from rich.panel import Panel
-from analyzer.route import find_route
+from analyzer.route import RouteResolver, ROW_FIELDS
+from commands.render import print_bad_url, print_no_route, print_route
+from parser.cache import ParseCache
 from parser.nginx_parser import parse_nginx_config
+from parser.resolver import IncludeResolver
+import csv
 import glob
+import json
 import os
+import sys
+import time
 
 app = typer.Typer(help="Показывает, какой server/location обслуживает указанный URL. По умолчанию ищет во всех .conf в /etc/nginx/. Для кастомного пути используйте -c/--config.")
 console = Console()
+err_console = Console(stderr=True)
+
+def _parse_configs(configs, no_cache: bool, jobs: int, lazy: bool, out: Console, discover: bool = False):
+    """
+    Разбирает конфиги с общим IncludeResolver: каждый файл читается и разбирается один раз.
+    discover — configs это все .conf каталога: разбираются только корневые (которые никто
+    не подключает), остальные попадают в дерево через include.
+    """
+    resolver = IncludeResolver(None if no_cache else ParseCache())
+    if discover:
+        configs = resolver.roots(configs)
+    trees = []
+    for conf in configs:
+        try:
+            trees.append((conf, parse_nginx_config(conf, jobs=jobs, lazy=lazy, resolver=resolver)))
+        except FileNotFoundError:
+            out.print(f"[red]Файл {conf} не найден. Проверьте путь к конфигу.[/red]")
+        except Exception as e:
+            out.print(f"[red]Ошибка при разборе {conf}: {e}[/red]")
+    return trees
+
+def _read_urls(source):
+    for line in source:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line
+
+def _batch(resolver: RouteResolver, batch: str, fmt: str, parse_time: float) -> None:
+    source = sys.stdin if batch == '-' else open(batch, encoding='utf-8')
+    out = sys.stdout
+    writer = None
+    if fmt == 'csv':
+        writer = csv.DictWriter(out, fieldnames=ROW_FIELDS)
+        writer.writeheader()
+    total = resolved = 0
+    start = time.perf_counter()
+    try:
+        for url in _read_urls(source):
+            row = resolver.row(url)
+            total += 1
+            if row['config'] is not None:
+                resolved += 1
+            if writer is not None:
+                writer.writerow(row)
+            else:
+                out.write(json.dumps(row, ensure_ascii=False) + "\n")
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    out.flush()
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed > 0 else 0.0
+    # Сводка — в stderr, чтобы не смешиваться с потоком результатов
+    err_console.print(
+        f"[dim]URL: {total}, найдено маршрутов: {resolved}, без маршрута: {total - resolved}; "
+        f"разбор конфигов {parse_time:.2f} с, поиск {elapsed:.2f} с ({rate:,.0f} URL/с)[/dim]"
+    )
 
 def route(
-    url: str = typer.Argument(..., help="URL для маршрутизации (например, http://host/path)"),
-    config_path: str = typer.Option(None, "-c", "--config", help="Путь к кастомному nginx.conf (если не указан — поиск по всем .conf в /etc/nginx)")
+    url: str = typer.Argument(None, help="URL для маршрутизации (например, http://host/path)"),
+    config_path: str = typer.Option(None, "-c", "--config", help="Путь к кастомному nginx.conf (если не указан — поиск по всем .conf в /etc/nginx)"),
+    lazy: bool = typer.Option(False, "--lazy", help="Разбирать include-файлы только при обходе (быстрее на больших деревьях include)"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Не использовать дисковый кэш разбора"),
+    jobs: int = typer.Option(1, "--jobs", "-j", help="Число процессов для разбора файлов include (1 — последовательно)"),
+    batch: str = typer.Option(None, "--batch", "-b", help="Файл со списком URL (по одному в строке, '-' — stdin); результат — поток NDJSON/CSV"),
+    fmt: str = typer.Option("ndjson", "--format", "-f", help="Формат результата --batch: ndjson или csv")
 ):
     """
     Показывает, какой server/location обслуживает указанный URL.
 
-    По умолчанию ищет во всех .conf в /etc/nginx/.
+    По умолчанию ищет во всех .conf в /etc/nginx/: по графу include находит корневые
+    конфиги (файлы, которые никто не подключает) и разбирает только их, каждый файл —
+    один раз. Для каждого server-а и location-а выводится файл, где он объявлен.
     Для кастомного пути используйте опцию -c/--config.
 
+    С --batch конфиги разбираются один раз, а для каждого URL из файла (или stdin)
+    выводится строка NDJSON/CSV: server, location, proxy_pass, upstream и файл-источник
+    (для неразбираемого URL — колонка error).
+    В конце в stderr выводится число URL и скорость поиска.
+
     Примеры:
         nginx-lens route http://example.com/api/v1
         nginx-lens route -c /etc/nginx/nginx.conf http://example.com/api/v1
+        nginx-lens route -c /etc/nginx/nginx.conf --batch urls.txt > routes.ndjson
+        cat urls.txt | nginx-lens route --batch - --format csv > routes.csv
     """
+    if batch is None and url is None:
+        console.print("[red]Укажите URL или --batch файл со списком URL[/red]")
+        raise typer.Exit(1)
+    if fmt not in ('ndjson', 'csv'):
+        console.print(f"[red]Неизвестный формат {fmt}: ожидается ndjson или csv[/red]")
+        raise typer.Exit(1)
+    # В режиме --batch stdout занят результатами, сообщения идут в stderr
+    out = err_console if batch is not None else console
     configs = []
     if config_path:
         configs = [config_path]
     else:
         configs = glob.glob("/etc/nginx/**/*.conf", recursive=True)
         if not configs:
-            console.print(Panel("Не найдено ни одного .conf файла в /etc/nginx. Если конфигурация находится в другом месте, используйте опцию -c/--config.", style="red"))
-            return
-    for conf in configs:
-        try:
-            tree = parse_nginx_config(conf)
-        except FileNotFoundError:
-            console.print(f"[red]Файл {conf} не найден. Проверьте путь к конфигу.[/red]")
-            continue
-        except Exception as e:
-            console.print(f"[red]Ошибка при разборе {conf}: {e}[/red]")
-            continue
-        res = find_route(tree, url)
-        if res:
-            server = res['server']
-            location = res['location']
-            proxy_pass = res['proxy_pass']
-            text = f"[bold]Config:[/bold] {conf}\n"
-            if server:
-                text += f"[bold]Server:[/bold] {server.get('arg','') or '[no arg]'}"
-                if server.get('__file__'):
-                    text += f" ([dim]{server.get('__file__')}[/dim])"
-                text += "\n"
-            if location:
-                text += f"[bold]Location:[/bold] {location.get('arg','')}"
-                if location.get('__file__'):
-                    text += f" ([dim]{location.get('__file__')}[/dim])"
-                text += "\n"
-            if proxy_pass:
-                text += f"[bold]proxy_pass:[/bold] {proxy_pass}\n"
-            console.print(Panel(text, title="Route", style="green"))
+            out.print(Panel("Не найдено ни одного .conf файла в /etc/nginx. Если конфигурация находится в другом месте, используйте опцию -c/--config.", style="red"))
             return
-    search_dir = os.path.dirname(configs[0]) if configs else '/etc/nginx'
-    console.print(Panel(f"Маршрут для {url} не найден ни в одном .conf в {search_dir}", style="yellow")) 
\ No newline at end of file
+    start = time.perf_counter()
+    trees = _parse_configs(configs, no_cache, jobs, lazy, out, discover=not config_path)
+    resolver = RouteResolver(trees)
+    if batch is not None:
+        _batch(resolver, batch, fmt, time.perf_counter() - start)
+        return
+    try:
+        view = resolver.view(url)
+    except ValueError as e:
+        print_bad_url(console, url, e)
+        raise typer.Exit(1)
+    if view is not None:
+        print_route(console, view)
+        return
+    print_no_route(console, url, os.path.dirname(config_path) if config_path else '/etc/nginx')
@@ -0,0 +1,48 @@
+import typer
+from typing import List
+from rich.console import Console
+from daemon.client import socket_path
+from daemon.server import LensServer, LensState, DEFAULT_CONFIG_DIR
+
+app = typer.Typer()
+console = Console()
+
+def serve(
+    socket: str = typer.Option(None, "--socket", "-s", help="Unix-сокет демона (по умолчанию NGINX_LENS_SOCKET или /run/nginx-lens.sock)"),
+    configs: List[str] = typer.Option(None, "-c", "--config", help="Корневой nginx.conf (можно несколько; по умолчанию — корневые .conf в /etc/nginx)"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Не использовать дисковый кэш разбора"),
+    jobs: int = typer.Option(1, "--jobs", "-j", help="Число процессов для разбора файлов include (1 — последовательно)"),
+    interval: float = typer.Option(1.0, "--interval", help="Как часто (не чаще, секунды) проверять изменения файлов перед ответом")
+):
+    """
+    Запускает демон, который держит разобранные конфиги, индексы и таблицы маршрутизации
+    в памяти и отвечает на JSON-запросы через Unix-сокет (по одному объекту в строке):
+    {"cmd": "route", "url": ...}, {"cmd": "analyze"}, {"cmd": "tree", "block": "server"},
+    {"cmd": "upstreams"}, {"cmd": "status"}. Изменившиеся файлы перечитываются инкрементально.
+
+    Пока демон запущен, nginx-lens route URL и nginx-lens analyze CONFIG отвечают через него.
+
+    Пример:
+        nginx-lens serve --socket /run/nginx-lens.sock
+        nginx-lens serve -c /etc/nginx/nginx.conf --interval 5
+    """
+    path = socket or socket_path()
+    state = LensState(configs or None, config_dir=DEFAULT_CONFIG_DIR, use_cache=not no_cache, jobs=jobs, interval=interval)
+    # Корни разбираются сразу, чтобы первый запрос не ждал разбора
+    for root in state.default:
+        try:
+            state.handle({'cmd': 'tree', 'config': root, 'depth': 0})
+        except Exception as e:
+            console.print(f"[red]Ошибка при разборе {root}: {e}[/red]")
+    try:
+        server = LensServer(path, state)
+    except (RuntimeError, OSError) as e:
+        console.print(f"[red]Не удалось открыть сокет {path}: {e}[/red]")
+        raise typer.Exit(1)
+    console.print(f"[bold]nginx-lens serve[/bold]: {path}, корневых конфигов: {len(state.default)} (Ctrl+C — выход)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -1,30 +1,72 @@
+import time
 import typer
 from rich.console import Console
 from rich.tree import Tree as RichTree
 from parser.nginx_parser import parse_nginx_config
+from parser.nodes import iter_nodes
 
 app = typer.Typer()
 console = Console()
 
 def _build_tree(directives, parent):
-    for d in directives:
-        if 'block' in d:
-            label = f"[bold]{d['block']}[/bold] {d.get('arg') or ''}".strip()
-            node = parent.add(label)
-            if d.get('directives'):
-                _build_tree(d['directives'], node)
-        elif 'upstream' in d:
+    for d in iter_nodes(directives):
+        if 'upstream' in d:
             label = f"[bold magenta]upstream[/bold magenta] {d['upstream']}"
             node = parent.add(label)
             for srv in d.get('servers', []):
                 node.add(f"[green]server[/green] {srv}")
+        elif 'block' in d:
+            label = f"[bold]{d['block']}[/bold] {d.get('arg') or ''}".strip()
+            node = parent.add(label)
+            if d.get('directives'):
+                _build_tree(d['directives'], node)
         elif 'directive' in d:
             parent.add(f"[cyan]{d['directive']}[/cyan] {d.get('args','')}")
 
+def _print_tree(tree_obj, markdown: bool, html: bool) -> None:
+    root = RichTree(f"[bold blue]nginx.conf[/bold blue]")
+    _build_tree(tree_obj.directives, root)
+    if markdown:
+        from exporter.markdown import tree_to_markdown
+        md = tree_to_markdown(tree_obj.directives)
+        console.print(md)
+    elif html:
+        from exporter.html import tree_to_html
+        html_code = tree_to_html(tree_obj.directives)
+        console.print(html_code)
+    else:
+        console.print(root)
+
+def _watch(config_path: str, no_cache: bool, jobs: int, interval: float, markdown: bool, html: bool) -> None:
+    from parser.cache import ParseCache
+    from parser.watch import ConfigWatcher
+    watcher = ConfigWatcher(config_path, cache=None if no_cache else ParseCache(), jobs=jobs)
+    first = True
+    try:
+        while True:
+            try:
+                changed = watcher.refresh()
+            except Exception as e:
+                console.print(f"[red]Ошибка при разборе {config_path}: {e}[/red]")
+                changed = []
+            if changed:
+                if not first:
+                    console.print(f"[bold]Изменено:[/bold] {', '.join(changed)}")
+                first = False
+                _print_tree(watcher.tree, markdown, html)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
 def tree(
     config_path: str = typer.Argument(..., help="Путь к nginx.conf"),
     markdown: bool = typer.Option(False, help="Экспортировать в Markdown"),
-    html: bool = typer.Option(False, help="Экспортировать в HTML")
+    html: bool = typer.Option(False, help="Экспортировать в HTML"),
+    lazy: bool = typer.Option(False, "--lazy", help="Разбирать include-файлы только при обходе (быстрее на больших деревьях include)"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Не использовать дисковый кэш разбора"),
+    jobs: int = typer.Option(1, "--jobs", "-j", help="Число процессов для разбора файлов include (1 — последовательно)"),
+    watch: bool = typer.Option(False, "--watch", "-w", help="Следить за изменениями файлов и перерисовывать дерево"),
+    interval: float = typer.Option(1.0, "--interval", help="Период опроса файлов в режиме --watch, секунды")
 ):
     """
     Визуализирует структуру nginx.conf в виде дерева.
@@ -33,24 +75,17 @@ def tree(
         nginx-lens tree /etc/nginx/nginx.conf
         nginx-lens tree /etc/nginx/nginx.conf --markdown
         nginx-lens tree /etc/nginx/nginx.conf --html
+        nginx-lens tree /etc/nginx/nginx.conf --watch
     """
+    if watch:
+        _watch(config_path, no_cache, jobs, interval, markdown, html)
+        return
     try:
-        tree_obj = parse_nginx_config(config_path)
+        tree_obj = parse_nginx_config(config_path, use_cache=not no_cache, jobs=jobs, lazy=lazy)
     except FileNotFoundError:
         console.print(f"[red]Файл {config_path} не найден. Проверьте путь к конфигу.[/red]")
         return
     except Exception as e:
         console.print(f"[red]Ошибка при разборе {config_path}: {e}[/red]")
         return
-    root = RichTree(f"[bold blue]nginx.conf[/bold blue]")
-    _build_tree(tree_obj.directives, root)
-    if markdown:
-        from exporter.markdown import tree_to_markdown
-        md = tree_to_markdown(tree_obj.directives)
-        console.print(md)
-    elif html:
-        from exporter.html import tree_to_html
-        html_code = tree_to_html(tree_obj.directives)
-        console.print(html_code)
-    else:
-        console.print(root) 
\ No newline at end of file
+    _print_tree(tree_obj, markdown, html)
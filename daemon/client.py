@@ -0,0 +1,145 @@
+"""
+Тонкий клиент демона nginx-lens (nginx-lens serve).
+
+Модуль не импортирует typer и парсер: если демон запущен, route и analyze отвечают
+за миллисекунды без разбора конфигов, а ответ выводится тем же кодом, что и в обычном
+CLI (commands/render.py, только rich). Иначе — обычный CLI (commands/cli.py).
+"""
+import json
+import os
+import socket
+import sys
+from typing import Any, Dict, List, Optional
+
+DEFAULT_SOCKET = '/run/nginx-lens.sock'
+
+def socket_path() -> str:
+    """Путь к сокету демона: NGINX_LENS_SOCKET или /run/nginx-lens.sock."""
+    return os.environ.get('NGINX_LENS_SOCKET', DEFAULT_SOCKET)
+
+class DaemonUnavailable(ConnectionError):
+    """Демон не запущен или не отвечает."""
+
+class DaemonError(RuntimeError):
+    """Демон вернул ошибку на запрос."""
+
+class DaemonClient:
+    """Соединение с демоном; запросы и ответы — по одному JSON-объекту в строке."""
+    def __init__(self, path: str = None, timeout: float = 30.0):
+        self.path = path or socket_path()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(self.path)
+        except OSError as e:
+            sock.close()
+            raise DaemonUnavailable(f"демон nginx-lens не отвечает на {self.path}: {e}") from e
+        self._sock = sock
+        self._file = sock.makefile('rb')
+
+    def request(self, cmd: str, **params) -> Any:
+        """Результат команды cmd; DaemonError — демон ответил ошибкой."""
+        params['cmd'] = cmd
+        try:
+            self._sock.sendall(json.dumps(params, ensure_ascii=False).encode() + b"\n")
+            line = self._file.readline()
+        except OSError as e:
+            raise DaemonUnavailable(f"соединение с демоном на {self.path} прервано: {e}") from e
+        if not line:
+            raise DaemonUnavailable(f"демон на {self.path} закрыл соединение")
+        response = json.loads(line)
+        if not response.get('ok'):
+            raise DaemonError(response.get('error', 'неизвестная ошибка'))
+        return response['result']
+
+    def close(self) -> None:
+        self._file.close()
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _parse_args(argv: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    Разбирает вызовы, которые умеет обслужить демон:
+    route URL [-c CONFIG] и analyze CONFIG. Для остальных — None.
+    """
+    if not argv or argv[0] not in ('route', 'analyze'):
+        return None
+    command, rest = argv[0], argv[1:]
+    config = None
+    positional = []
+    i = 0
+    while i < len(rest):
+        arg = rest[i]
+        if arg in ('-c', '--config') and command == 'route' and i + 1 < len(rest):
+            config = rest[i + 1]
+            i += 2
+            continue
+        if arg.startswith('--config=') and command == 'route':
+            config = arg.split('=', 1)[1]
+        elif arg.startswith('-'):
+            # --batch, --watch, --fleet и прочие режимы — в обычном CLI
+            return None
+        else:
+            positional.append(arg)
+        i += 1
+    if len(positional) != 1:
+        return None
+    # Пути — относительно каталога клиента, а не демона
+    if command == 'route':
+        return {'cmd': 'route', 'url': positional[0], 'view': True,
+                'config': os.path.abspath(config) if config else None, 'config_arg': config}
+    return {'cmd': 'analyze', 'config': os.path.abspath(positional[0])}
+
+def _print(cmd: str, request: Dict[str, Any], result: Any, out) -> int:
+    """Выводит ответ демона теми же функциями, что и обычный CLI (commands/render.py)."""
+    from rich.console import Console
+    from commands import render
+    console = Console(file=out)
+    if cmd == 'analyze':
+        render.print_issues(console, [row for rows in result.values() for row in rows])
+        return 0
+    url = request['url']
+    if 'error' in result:
+        render.print_bad_url(console, url, result['error'])
+        return 1
+    if result['view'] is None:
+        config = request.get('config_arg')
+        render.print_no_route(console, url, os.path.dirname(config) if config else '/etc/nginx')
+        return 0
+    render.print_route(console, result['view'])
+    return 0
+
+def run_client(argv: List[str], out=None) -> Optional[int]:
+    """
+    Выполняет команду через демон; код возврата или None, если команду должен выполнить
+    обычный CLI (демон не запущен, неподдерживаемые опции, NGINX_LENS_NO_DAEMON=1).
+    """
+    if os.environ.get('NGINX_LENS_NO_DAEMON'):
+        return None
+    request = _parse_args(argv)
+    if request is None or not os.path.exists(socket_path()):
+        return None
+    out = out or sys.stdout
+    cmd = request.pop('cmd')
+    try:
+        with DaemonClient() as client:
+            result = client.request(cmd, **{k: v for k, v in request.items() if k != 'config_arg'})
+    except DaemonUnavailable:
+        return None
+    except DaemonError as e:
+        sys.stderr.write(f"nginx-lens serve: {e}\n")
+        return 1
+    return _print(cmd, request, result, out)
+
+def main() -> None:
+    """Точка входа nginx-lens: сначала демон, затем обычный CLI."""
+    code = run_client(sys.argv[1:])
+    if code is not None:
+        sys.exit(code)
+    from commands.cli import app
+    app()
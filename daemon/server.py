@@ -0,0 +1,222 @@
+import glob
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from analyzer.route import RouteResolver
+from parser.cache import ParseCache
+from parser.nodes import Block, Include, LazyInclude, iter_nodes
+from parser.resolver import IncludeResolver
+from parser.watch import ConfigWatcher
+
+# Каталог, в котором ищутся корневые конфиги, если они не заданы явно
+DEFAULT_CONFIG_DIR = '/etc/nginx'
+
+class _Root:
+    """Один корневой конфиг в памяти демона: дерево с перечитыванием изменившихся файлов и кэш анализа."""
+    def __init__(self, path: str, cache: Optional[ParseCache], jobs: int):
+        self.path = path
+        self.watcher = ConfigWatcher(path, cache=cache, jobs=jobs)
+        self.issues = None
+        self.rows = None
+        self.checked = 0.0
+
+    def refresh(self, interval: float) -> bool:
+        """Проверяет файлы не чаще раза в interval секунд; True — дерево перестроено."""
+        now = time.monotonic()
+        if self.watcher.tree is not None and now - self.checked < interval:
+            return False
+        self.checked = now
+        changed = self.watcher.refresh()
+        if changed:
+            self.rows = None
+        return bool(changed)
+
+    def analyze(self):
+        if self.rows is None:
+            from commands.analyze import IncrementalIssues
+            if self.issues is None:
+                self.issues = IncrementalIssues(self.watcher.signature)
+            self.rows = self.issues.update(self.watcher.tree)
+        return self.rows
+
+class LensState:
+    """
+    Разобранные конфиги, индексы и таблицы маршрутизации, которые демон держит в памяти.
+
+    Корни — явно заданные конфиги или корневые .conf каталога (см. IncludeResolver.roots);
+    конфиг, о котором спросили впервые (config в запросе), загружается и тоже остаётся в памяти.
+    Перед ответом изменившиеся файлы перечитываются (ConfigWatcher), не чаще раза в interval секунд;
+    таблицы маршрутизации строятся заново, только если дерево изменилось.
+    """
+    def __init__(self, configs: List[str] = None, config_dir: str = DEFAULT_CONFIG_DIR,
+                 use_cache: bool = True, jobs: int = 1, interval: float = 1.0):
+        self.cache = ParseCache() if use_cache else None
+        self.jobs = jobs
+        self.interval = interval
+        self.started = time.time()
+        self.queries = 0
+        self.reloads = 0
+        if not configs:
+            files = sorted(glob.glob(os.path.join(config_dir, '**', '*.conf'), recursive=True))
+            configs = IncludeResolver().roots(files) if files else []
+        self.default = [os.path.abspath(p) for p in configs]
+        self.roots: Dict[str, _Root] = {}
+        self._routers: Dict[tuple, RouteResolver] = {}
+        self._lock = threading.Lock()
+
+    def _root(self, path: str) -> _Root:
+        path = os.path.abspath(path)
+        root = self.roots.get(path)
+        if root is None:
+            root = self.roots[path] = _Root(path, self.cache, self.jobs)
+        if root.refresh(self.interval):
+            self.reloads += 1
+            self._routers = {k: v for k, v in self._routers.items() if path not in k}
+        return root
+
+    def _selected(self, config: Optional[str]) -> List[str]:
+        return [os.path.abspath(config)] if config else self.default
+
+    def _router(self, config: Optional[str]) -> RouteResolver:
+        paths = tuple(self._selected(config))
+        roots = [self._root(p) for p in paths]
+        router = self._routers.get(paths)
+        if router is None:
+            router = self._routers[paths] = RouteResolver([(r.path, r.watcher.tree) for r in roots])
+        return router
+
+    def handle(self, request: Dict[str, Any]) -> Any:
+        """Результат запроса {'cmd': ..., ...}; ValueError — неизвестная команда."""
+        cmd = request.get('cmd')
+        handler = _COMMANDS.get(cmd)
+        if handler is None:
+            raise ValueError(f"неизвестная команда: {cmd!r}")
+        with self._lock:
+            self.queries += 1
+            return handler(self, request)
+
+    # --- Команды ---
+    def _status(self, request):
+        return {
+            'roots': self.default,
+            'loaded': sorted(self.roots),
+            'files': sum(len(r.watcher.files()) for r in self.roots.values()),
+            'uptime': round(time.time() - self.started, 3),
+            'queries': self.queries,
+            'reloads': self.reloads,
+        }
+
+    def _route(self, request):
+        router = self._router(request.get('config'))
+        if request.get('view'):
+            # Маршрут для вывода как в nginx-lens route (analyzer.route.route_view)
+            try:
+                return {'view': router.view(request['url'])}
+            except ValueError as e:
+                return {'error': str(e)}
+        urls = request.get('urls')
+        if urls is None:
+            return router.row(request['url'])
+        return [router.row(url) for url in urls]
+
+    def _analyze(self, request):
+        result = {}
+        for path in self._selected(request.get('config')):
+            result[path] = [list(row) for row in self._root(path).analyze()]
+        return result
+
+    def _upstreams(self, request):
+        result = {}
+        for path in self._selected(request.get('config')):
+            result[path] = self._root(path).watcher.tree.get_upstreams()
+        return result
+
+    def _tree(self, request):
+        """Часть дерева: блоки типа block (по умолчанию server), при file — только из этого файла."""
+        name = request.get('block', 'server')
+        file = request.get('file')
+        depth = int(request.get('depth', 1))
+        result = {}
+        for path in self._selected(request.get('config')):
+            tree = self._root(path).watcher.tree
+            blocks = tree.blocks(name)
+            if file:
+                file = os.path.abspath(file)
+                blocks = [b for b in blocks if b.file == file]
+            result[path] = [node_to_json(b, depth) for b in blocks]
+        return result
+
+_COMMANDS = {
+    'status': LensState._status,
+    'route': LensState._route,
+    'analyze': LensState._analyze,
+    'upstreams': LensState._upstreams,
+    'tree': LensState._tree,
+}
+
+def node_to_json(node, depth: int = 1) -> Dict[str, Any]:
+    """Узел в виде JSON: имя, аргументы, файл и строка; вложенные узлы — на depth уровней."""
+    if isinstance(node, (Include, LazyInclude)):
+        return {'name': 'include', 'args': node.pattern, 'file': node.file, 'line': node.line}
+    result = {'name': node.name, 'args': ' '.join(node.args), 'file': node.file, 'line': node.line}
+    if isinstance(node, Block) and depth > 0:
+        result['directives'] = [node_to_json(d, depth - 1) for d in iter_nodes(node.directives)]
+    return result
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Запросы и ответы — по одному JSON-объекту в строке; соединение можно держать открытым."""
+    def handle(self):
+        state = self.server.state
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("ожидается JSON-объект")
+            except ValueError as e:
+                response = {'ok': False, 'error': f"неверный запрос: {e}"}
+            else:
+                try:
+                    response = {'ok': True, 'result': state.handle(request)}
+                except KeyError as e:
+                    response = {'ok': False, 'error': f"в запросе нет поля {e}"}
+                except Exception as e:
+                    response = {'ok': False, 'error': str(e)}
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode() + b"\n")
+            self.wfile.flush()
+
+class LensServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, state: LensState):
+        _remove_stale(socket_path)
+        self.state = state
+        super().__init__(socket_path, _Handler)
+        os.chmod(socket_path, 0o660)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+def _remove_stale(socket_path: str) -> None:
+    """Удаляет сокет, оставшийся от упавшего демона; если демон жив — RuntimeError."""
+    if not os.path.exists(socket_path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except OSError:
+        os.unlink(socket_path)
+        return
+    finally:
+        probe.close()
+    raise RuntimeError(f"демон уже слушает {socket_path}")
@@ -1,4 +1,5 @@
 from typing import List
+from parser.nodes import iter_nodes
 
 def tree_to_dot(directives) -> str:
     lines = ["digraph nginx {", "  rankdir=LR;"]
@@ -8,7 +9,7 @@ def tree_to_dot(directives) -> str:
         node_id += 1
         return f"n{node_id}", label
     def walk(dirs, parent_id=None):
-        for d in dirs:
+        for d in iter_nodes(dirs):
             if 'block' in d and d['block'] == 'server':
                 nid, label = node(f"server {d.get('arg','')}")
                 lines.append(f'  {nid} [label="{label}", shape=box, style=filled, fillcolor=lightblue];')
@@ -47,7 +48,7 @@ def tree_to_mermaid(directives) -> str:
         node_id += 1
         return f"n{node_id}", label
     def walk(dirs, parent_id=None):
-        for d in dirs:
+        for d in iter_nodes(dirs):
             if 'block' in d and d['block'] == 'server':
                 nid, label = node(f"server {d.get('arg','')}")
                 lines.append(f'{nid}["{label}"]:::server')
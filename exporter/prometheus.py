@@ -0,0 +1,242 @@
+"""
+Метрики проверки upstream в формате Prometheus (text 0.0.4) и OpenMetrics.
+
+Отрисовка инкрементальная: начала строк с метками строятся один раз, текст строк сервера
+пересобирается только после его новой проверки, а склеенный текст группы серверов — только
+если в группе была проверка. Поэтому отдача 10 000 серверов — в основном склейка готовых строк.
+"""
+import math
+from itertools import accumulate
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+PREFIX = 'nginx_lens_upstream'
+# Границы корзин гистограммы задержки проверок, сек
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Серверы группами по _SEGMENT: склеенный текст группы пересобирается, только если в ней была проверка
+_SEGMENT = 256
+
+PROMETHEUS_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+OPENMETRICS_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+# (имя, тип, описание) метрик сервера в порядке вывода
+_MEMBER_FAMILIES = (
+    (f'{PREFIX}_member_up', 'gauge', 'Сервер доступен по последней проверке (1) или нет (0)'),
+    (f'{PREFIX}_member_latency_seconds', 'gauge', 'Задержка последней удачной проверки'),
+    (f'{PREFIX}_member_consecutive_failures', 'gauge', 'Неудачных проверок подряд'),
+    (f'{PREFIX}_member_probe_latency_seconds', 'histogram', 'Задержка удачных проверок'),
+)
+_UPSTREAM_FAMILIES = (
+    (f'{PREFIX}_members', 'gauge', 'Серверов в upstream'),
+    (f'{PREFIX}_members_up', 'gauge', 'Доступных серверов в upstream'),
+)
+
+def escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _number(value: Optional[float]) -> str:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return 'NaN'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _le(bound: float) -> str:
+    return repr(float(bound))
+
+class _Member:
+    """Состояние одного сервера и готовые строки его метрик."""
+    __slots__ = ('upstream', 'segment', 'templates', 'up', 'latency', 'consecutive', 'buckets', 'count', 'sum', 'chunks')
+
+    def __init__(self, upstream: str, server: str, les: List[str], segment: int):
+        self.upstream = upstream
+        self.segment = segment
+        labels = f'upstream="{escape_label(upstream)}",server="{escape_label(server)}"'
+        hist = _MEMBER_FAMILIES[3][0]
+        # Строки (имя и метки) строятся один раз: при проверке в шаблоны подставляются только значения
+        labels = labels.replace('%', '%%')
+        self.templates = tuple(f'{name}{{{labels}}} %s\n' for name, _, _ in _MEMBER_FAMILIES[:3]) + (''.join(
+            [f'{hist}_bucket{{{labels},le="{le}"}} %d\n' for le in les]
+            + [f'{hist}_sum{{{labels}}} %s\n', f'{hist}_count{{{labels}}} %d\n']
+        ),)
+        self.up = None
+        self.latency = None
+        self.consecutive = 0
+        self.buckets = [0] * (len(les) - 1)
+        self.count = 0
+        self.sum = 0.0
+        self.chunks: Optional[Tuple[str, ...]] = None
+
+class HealthMetrics:
+    """
+    Метрики серверов upstream. observe() вызывается после каждой проверки сервера
+    (монитор, health --interval) или для каждого результата check_upstreams (observe_results),
+    render() отдаёт текст метрик. Методы потокобезопасны: HTTP-сервер метрик работает в своём потоке.
+    """
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._les = [_le(b) for b in self.buckets] + ['+Inf']
+        self._members: Dict[Tuple[str, str], _Member] = {}
+        self._order: List[_Member] = []
+        self._segments: List[Optional[Tuple[bytes, ...]]] = []
+        self._upstreams: Dict[str, List[_Member]] = {}
+        self._up: Dict[str, int] = {}
+        self.probes = 0
+        self.rendered = 0  # сколько раз пересобраны строки серверов (для бенчмарка)
+        self._dirty = True
+        self._text: Dict[bool, bytes] = {}
+        self._lock = threading.Lock()
+
+    def _member(self, upstream: str, server: str) -> _Member:
+        key = (upstream, server)
+        member = self._members.get(key)
+        if member is None:
+            segment = len(self._order) // _SEGMENT
+            member = self._members[key] = _Member(upstream, server, self._les, segment)
+            self._order.append(member)
+            if segment == len(self._segments):
+                self._segments.append(None)
+            self._upstreams.setdefault(upstream, []).append(member)
+            self._up.setdefault(upstream, 0)
+            self._dirty = True
+        return member
+
+    def observe(self, upstream: str, server: str, healthy: bool, latency: Optional[float] = None,
+                consecutive: Optional[int] = None) -> None:
+        """Результат проверки сервера; consecutive — неудач подряд (по умолчанию считается здесь)."""
+        with self._lock:
+            member = self._member(upstream, server)
+            up = 1 if healthy else 0
+            # Число доступных серверов upstream ведётся здесь, а не считается при отрисовке
+            self._up[upstream] += up - (member.up or 0)
+            member.up = up
+            if consecutive is None:
+                consecutive = 0 if healthy else member.consecutive + 1
+            member.consecutive = consecutive
+            if healthy and latency is not None:
+                member.latency = latency
+                member.count += 1
+                member.sum += latency
+                for i, bound in enumerate(self.buckets):
+                    if latency <= bound:
+                        member.buckets[i] += 1
+                        break
+            member.chunks = None
+            self._segments[member.segment] = None
+            self.probes += 1
+            self._dirty = True
+
+    def observe_results(self, results: Dict[str, List[Dict[str, Any]]]) -> None:
+        """Результаты check_upstreams / check_upstreams_http."""
+        for upstream, servers in results.items():
+            for srv in servers:
+                if srv.get('down'):
+                    continue
+                server = f"{srv['address']} ({srv['ip']})" if srv.get('name') and srv.get('ip') else srv['address']
+                self.observe(upstream, server, srv['healthy'], srv.get('latency', srv.get('p50')))
+
+    def _chunks(self, member: _Member) -> Tuple[str, ...]:
+        t = member.templates
+        self.rendered += 1
+        # Корзины накопительные; +Inf — все удачные проверки, включая длиннее последней границы
+        return (
+            t[0] % _number(member.up),
+            t[1] % _number(member.latency),
+            t[2] % member.consecutive,
+            t[3] % (*accumulate(member.buckets), member.count, _number(member.sum), member.count),
+        )
+
+    def render(self, openmetrics: bool = False) -> bytes:
+        """Текст всех метрик (UTF-8); строки пересобираются только для серверов, проверенных после прошлой отрисовки."""
+        with self._lock:
+            if not self._dirty and openmetrics in self._text:
+                return self._text[openmetrics]
+            members = self._order
+            segments = self._segments
+            for n, text in enumerate(segments):
+                if text is not None:
+                    continue
+                group = members[n * _SEGMENT:(n + 1) * _SEGMENT]
+                for member in group:
+                    if member.chunks is None:
+                        member.chunks = self._chunks(member)
+                segments[n] = tuple(''.join(m.chunks[i] for m in group).encode('utf-8')
+                                    for i in range(len(_MEMBER_FAMILIES)))
+            out = []
+            for i, (name, kind, help_text) in enumerate(_MEMBER_FAMILIES):
+                out.append(f'# HELP {name} {help_text}\n# TYPE {name} {kind}\n'.encode('utf-8'))
+                out.extend(text[i] for text in segments)
+            tail = []
+            for name, kind, help_text in _UPSTREAM_FAMILIES:
+                tail.append(f'# HELP {name} {help_text}\n# TYPE {name} {kind}\n')
+                up_only = name.endswith('_up')
+                for upstream, group in self._upstreams.items():
+                    value = self._up[upstream] if up_only else len(group)
+                    tail.append(f'{name}{{upstream="{escape_label(upstream)}"}} {value}\n')
+            probes = f'{PREFIX}_probes'
+            if openmetrics:
+                tail.append(f'# HELP {probes} Выполнено проверок\n# TYPE {probes} counter\n')
+            else:
+                tail.append(f'# HELP {probes}_total Выполнено проверок\n# TYPE {probes}_total counter\n')
+            tail.append(f'{probes}_total {self.probes}\n')
+            if openmetrics:
+                tail.append('# EOF\n')
+            out.append(''.join(tail).encode('utf-8'))
+            # Склейка bytes — копирование памяти; str с кириллицей в HELP пришлось бы расширять
+            text = b''.join(out)
+            if self._dirty:
+                self._text.clear()
+                self._dirty = False
+            self._text[openmetrics] = text
+            return text
+
+def write_textfile(path: str, metrics: HealthMetrics) -> None:
+    """Записывает метрики для textfile collector node_exporter: во временный файл и переименованием."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.nginx-lens-', suffix='.prom.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(metrics.render())
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        openmetrics = 'application/openmetrics-text' in self.headers.get('Accept', '')
+        body = self.server.metrics.render(openmetrics)
+        self.send_response(200)
+        self.send_header('Content-Type', OPENMETRICS_TYPE if openmetrics else PROMETHEUS_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class MetricsServer(ThreadingHTTPServer):
+    """HTTP-сервер /metrics в фоновом потоке."""
+    daemon_threads = True
+
+    def __init__(self, metrics: HealthMetrics, port: int, host: str = ''):
+        self.metrics = metrics
+        super().__init__((host, port), _MetricsHandler)
+        self._thread = threading.Thread(target=self.serve_forever, name='nginx-lens-metrics', daemon=True)
+
+    def start(self) -> 'MetricsServer':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,140 @@
+import os
+import sys
+import marshal
+import hashlib
+import tempfile
+from typing import List, Any, Optional
+from parser.nodes import pack_nodes, unpack_nodes
+
+# Версия формата записей; меняется при изменении структуры узлов
+CACHE_FORMAT = 2
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+def default_cache_dir() -> str:
+    """
+    Каталог кэша: $NGINX_LENS_CACHE_DIR, иначе $XDG_CACHE_HOME/nginx-lens, иначе ~/.cache/nginx-lens.
+    """
+    path = os.environ.get('NGINX_LENS_CACHE_DIR')
+    if path:
+        return path
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'nginx-lens')
+
+class ParseCache:
+    """
+    Дисковый кэш разобранных файлов (до раскрытия include).
+    Запись ищется по абсолютному пути и считается актуальной, пока совпадают
+    mtime и размер файла (и sha1 содержимого, если verify_hash).
+    Общий размер кэша ограничен max_bytes: при превышении удаляются
+    давно не использованные записи.
+    """
+    def __init__(self, cache_dir: str = None, max_bytes: int = None, verify_hash: bool = None):
+        self.cache_dir = os.path.join(cache_dir or default_cache_dir(), f"v{CACHE_FORMAT}-py{sys.version_info[0]}{sys.version_info[1]}")
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('NGINX_LENS_CACHE_MAX_MB', 0)) * 1024 * 1024 or DEFAULT_MAX_BYTES
+        self.max_bytes = max_bytes
+        if verify_hash is None:
+            verify_hash = os.environ.get('NGINX_LENS_CACHE_HASH', '') not in ('', '0')
+        self.verify_hash = verify_hash
+        self.hits = 0
+        self.misses = 0
+        self._written = 0
+        self._pending = {}
+
+    def _entry_path(self, path: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha1(path.encode('utf-8', 'surrogateescape')).hexdigest())
+
+    def _key(self, path: str, st, text: Optional[str]) -> tuple:
+        digest = hashlib.sha1(text.encode('utf-8', 'surrogateescape')).hexdigest() if self.verify_hash else None
+        return (path, st.st_mtime_ns, st.st_size, digest)
+
+    def get(self, path: str, text: str = None) -> Optional[List[Any]]:
+        """
+        Узлы файла path из кэша или None, если записи нет или файл изменился.
+        text — уже прочитанное содержимое файла (для verify_hash, чтобы не читать его снова).
+        """
+        abs_path = os.path.abspath(path)
+        st = os.stat(abs_path)
+        if self.verify_hash and text is None:
+            with open(path) as f:
+                text = f.read()
+        key = self._key(abs_path, st, text)
+        entry = self._entry_path(abs_path)
+        try:
+            with open(entry, 'rb') as f:
+                cached_key, packed = marshal.loads(f.read())
+            if tuple(cached_key) == key:
+                self.hits += 1
+                # Обновляем mtime записи — по нему работает вытеснение
+                os.utime(entry)
+                return unpack_nodes(packed, path)
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+        self.misses += 1
+        self._pending[abs_path] = key
+        return None
+
+    def put(self, path: str, nodes) -> None:
+        """
+        Сохраняет разобранные узлы файла. Ключ берётся из последнего промаха get(),
+        поэтому сохраняется состояние файла на момент проверки, а не записи.
+        """
+        abs_path = os.path.abspath(path)
+        key = self._pending.pop(abs_path, None)
+        if key is None:
+            text = None
+            if self.verify_hash:
+                with open(path) as f:
+                    text = f.read()
+            key = self._key(abs_path, os.stat(abs_path), text)
+        self._store(self._entry_path(abs_path), key, nodes)
+
+    def _store(self, entry: str, key: tuple, nodes) -> None:
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix='.tmp-')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(marshal.dumps((key, pack_nodes(nodes))))
+            os.replace(tmp, entry)
+            self._written += 1
+        except OSError:
+            # Кэш — только ускорение: недоступный каталог не должен ломать разбор
+            pass
+
+    def trim(self) -> None:
+        """
+        Удаляет самые старые записи, пока кэш не уложится в max_bytes.
+        Вызывается один раз после разбора, а не на каждую запись.
+        """
+        if not self._written:
+            return
+        self._written = 0
+        try:
+            entries = []
+            total = 0
+            with os.scandir(self.cache_dir) as it:
+                for e in it:
+                    st = e.stat()
+                    entries.append((st.st_mtime, st.st_size, e.path))
+                    total += st.st_size
+        except OSError:
+            return
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, p in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(p)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for e in it:
+                    os.remove(e.path)
+        except OSError:
+            pass
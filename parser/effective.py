@@ -0,0 +1,91 @@
+from typing import Dict, List, Optional, Tuple
+from parser.nodes import Directive, Block, iter_nodes
+
+# Директивы, которые nginx не наследует во вложенные блоки: обработчики запроса,
+# директивы модуля rewrite и то, что имеет смысл только в своём блоке
+NOT_INHERITED = frozenset({
+    'proxy_pass', 'fastcgi_pass', 'uwsgi_pass', 'scgi_pass', 'grpc_pass', 'memcached_pass',
+    'return', 'rewrite', 'set', 'break', 'try_files', 'alias', 'internal',
+    'listen', 'server_name', 'stub_status',
+})
+
+class EffectiveConfig:
+    """
+    Действующие директивы в каждом блоке с учётом наследования main → http → server → location.
+
+    Как в nginx, директива, заданная в блоке, целиком заменяет унаследованную:
+    для «массивов» (add_header, proxy_set_header, limit_req, ...) один add_header в location
+    отменяет все add_header уровня server. Результат для блока считается один раз и
+    запоминается; блок без своих наследуемых директив делит словарь с родителем.
+    Родители берутся из индексов дерева (tree.parent).
+    """
+    def __init__(self, tree):
+        self.tree = tree
+        # id(блок) (None — main) -> действующие директивы блока
+        self._memo: Dict[Optional[int], Dict[str, Tuple[Directive, ...]]] = {}
+        # id(блок) -> то, что блок передаёт вложенным блокам (без NOT_INHERITED)
+        self._down: Dict[Optional[int], Dict[str, Tuple[Directive, ...]]] = {}
+
+    def directives(self, block: Block = None) -> Dict[str, Tuple[Directive, ...]]:
+        """Имя -> действующие директивы (в порядке объявления) в блоке; None — уровень main."""
+        key = None if block is None else id(block)
+        result = self._memo.get(key)
+        if result is not None:
+            return result
+        if block is None:
+            result = self._memo[None] = _merge({}, self.tree.directives)
+            return result
+        # Цепочка ещё не посчитанных предков, затем подсчёт сверху вниз — без рекурсии
+        chain = [block]
+        parent = self.tree.parent(block)
+        while parent is not None and id(parent) not in self._memo:
+            chain.append(parent)
+            parent = self.tree.parent(parent)
+        if parent is None:
+            self.directives(None)
+        parent_key = None if parent is None else id(parent)
+        for b in reversed(chain):
+            result = self._memo[id(b)] = _merge(self._passed_down(parent_key), b.directives)
+            parent_key = id(b)
+        return result
+
+    def _passed_down(self, key) -> Dict[str, Tuple[Directive, ...]]:
+        down = self._down.get(key)
+        if down is None:
+            effective = self._memo[key]
+            if any(name in NOT_INHERITED for name in effective):
+                down = {k: v for k, v in effective.items() if k not in NOT_INHERITED}
+            else:
+                down = effective
+            self._down[key] = down
+        return down
+
+    def get(self, block: Optional[Block], name: str) -> Tuple[Directive, ...]:
+        return self.directives(block).get(name, ())
+
+    def has(self, block: Optional[Block], name: str) -> bool:
+        return name in self.directives(block)
+
+    def value(self, block: Optional[Block], name: str) -> Optional[str]:
+        """Аргументы последней действующей директивы name или None."""
+        found = self.directives(block).get(name)
+        return found[-1]['args'] if found else None
+
+    def inherited(self, block: Block, name: str) -> Tuple[Directive, ...]:
+        """Директивы name, которые блок получает от родителя (без своих)."""
+        parent = self.tree.parent(block)
+        self.directives(parent)
+        return self._passed_down(None if parent is None else id(parent)).get(name, ())
+
+def _merge(inherited, nodes) -> Dict[str, Tuple[Directive, ...]]:
+    """Унаследованное, в котором каждое имя, заданное в nodes, заменено своими директивами."""
+    own: Dict[str, List[Directive]] = {}
+    for d in iter_nodes(nodes):
+        if isinstance(d, Directive):
+            own.setdefault(d.name, []).append(d)
+    if not own:
+        return inherited
+    result = dict(inherited)
+    for name, found in own.items():
+        result[name] = tuple(found)
+    return result
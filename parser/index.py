@@ -0,0 +1,82 @@
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+from parser.nodes import Node, Directive, Block, iter_nodes
+
+class TreeIndex:
+    """
+    Индексы дерева конфига, строятся одним обходом:
+    директивы по имени, блоки по типу, узлы по файлу, родитель каждого узла
+    и диапазон потомков каждого блока (для запросов «внутри этого server-а»).
+
+    Узлы нумеруются в порядке обхода сверху вниз; потомки блока — узлы с номерами
+    в (start, end], поэтому поиск внутри блока — бинарный поиск по спискам имён.
+    Если один и тот же файл подключён дважды, его узлы — одни и те же объекты:
+    в списках имён они встречаются дважды, а parent() и ancestors() отвечают
+    по первому вхождению.
+    """
+    def __init__(self, directives: List[Node]):
+        # имя -> (номера узлов, узлы)
+        self.directives: Dict[str, Tuple[List[int], List[Node]]] = {}
+        self.blocks: Dict[str, Tuple[List[int], List[Node]]] = {}
+        self.files: Dict[str, List[Node]] = {}
+        self._parent: Dict[int, Optional[Block]] = {}
+        self._range: Dict[int, Tuple[int, int]] = {}
+        self.size = self._build(directives, None, 0)
+
+    def _build(self, nodes, parent, pos) -> int:
+        for d in iter_nodes(nodes):
+            pos += 1
+            key = id(d)
+            if key not in self._parent:
+                self._parent[key] = parent
+            if isinstance(d, Block):
+                index = self.blocks
+            elif isinstance(d, Directive):
+                index = self.directives
+            else:
+                index = None
+            if index is not None:
+                entry = index.get(d.name)
+                if entry is None:
+                    entry = index[d.name] = ([], [])
+                entry[0].append(pos)
+                entry[1].append(d)
+            if d.file is not None:
+                self.files.setdefault(d.file, []).append(d)
+            if isinstance(d, Block):
+                start = pos
+                pos = self._build(d.directives, d, pos)
+                if key not in self._range:
+                    self._range[key] = (start, pos)
+        return pos
+
+    def _select(self, entry, within: Block = None) -> List[Node]:
+        if entry is None:
+            return []
+        if within is None:
+            return list(entry[1])
+        span = self._range.get(id(within))
+        if span is None:
+            return []
+        positions, nodes = entry
+        return nodes[bisect_right(positions, span[0]):bisect_right(positions, span[1])]
+
+    def find(self, name: str, within: Block = None) -> List[Directive]:
+        return self._select(self.directives.get(name), within)
+
+    def find_blocks(self, name: str, within: Block = None) -> List[Block]:
+        return self._select(self.blocks.get(name), within)
+
+    def parent(self, node: Node) -> Optional[Block]:
+        return self._parent.get(id(node))
+
+    def ancestors(self, node: Node) -> List[Block]:
+        chain = []
+        parent = self._parent.get(id(node))
+        while parent is not None:
+            chain.append(parent)
+            parent = self._parent.get(id(parent))
+        return chain
+
+    def in_file(self, path: str) -> List[Node]:
+        return list(self.files.get(path, ()))
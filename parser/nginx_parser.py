@@ -1,95 +1,359 @@
 import os
-import glob
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple, Optional
+from functools import partial
 import re
+from parser.cache import ParseCache
+from parser.resolver import IncludeResolver
+from parser.index import TreeIndex
+from parser.effective import EffectiveConfig
+from parser.nodes import Node, Directive, Include, LazyInclude, Block, Upstream, make_block, pack_nodes, unpack_nodes, iter_nodes
 
 class NginxConfigTree:
     def __init__(self, directives=None, upstreams=None):
         self.directives = directives or []
-        self._upstreams = upstreams or {}
+        # None — upstream-ы ещё не собраны (ленивый режим)
+        self._upstreams = upstreams
+        self._index = None
+        self._effective = None
+
+    @property
+    def effective(self) -> EffectiveConfig:
+        """Действующие директивы блоков с учётом наследования (parser/effective.py), с мемоизацией."""
+        if self._effective is None:
+            self._effective = EffectiveConfig(self)
+        return self._effective
+
+    @property
+    def index(self) -> TreeIndex:
+        """Индексы дерева (parser/index.py); строятся при первом запросе, в ленивом режиме раскрывают все include."""
+        if self._index is None:
+            self._index = TreeIndex(self.directives)
+        return self._index
+
+    # --- Запросы по индексам ---
+    def find(self, name: str, within: Block = None) -> List[Directive]:
+        """Директивы name в порядке обхода; within — только внутри этого блока."""
+        return self.index.find(name, within)
+
+    def blocks(self, name: str, within: Block = None) -> List[Block]:
+        """Блоки типа name (server, location, upstream, ...) в порядке обхода."""
+        return self.index.find_blocks(name, within)
+
+    def servers(self) -> List[Block]:
+        return self.index.find_blocks('server')
+
+    def locations(self, server: Block = None) -> List[Block]:
+        return self.index.find_blocks('location', server)
+
+    def parent(self, node: Node) -> Optional[Block]:
+        return self.index.parent(node)
+
+    def ancestors(self, node: Node) -> List[Block]:
+        """Родитель, его родитель и так далее до верхнего уровня."""
+        return self.index.ancestors(node)
+
+    def nodes_in_file(self, path: str) -> List[Node]:
+        """Узлы, пришедшие из файла path (путь — как в __file__)."""
+        return self.index.in_file(path)
+
     def get_upstreams(self) -> Dict[str, List[str]]:
+        if self._upstreams is None:
+            # В ленивом режиме это раскрывает все include
+            self._upstreams = {}
+            _collect_upstreams(self.directives, self._upstreams)
         return self._upstreams
 
-# --- Вспомогательные функции ---
-def _strip_comments(line: str) -> str:
-    return line.split('#', 1)[0].strip()
+def _collect_upstreams(nodes, upstreams) -> None:
+    for d in iter_nodes(nodes):
+        if isinstance(d, Upstream):
+            upstreams.setdefault(d.arg, []).extend(d.servers)
+        elif isinstance(d, Block):
+            _collect_upstreams(d.directives, upstreams)
 
-def _parse_block(lines, base_dir, source_file=None) -> (List[Any], Dict[str, List[str]]):
-    directives = []
-    upstreams = {}
-    i = 0
-    while i < len(lines):
-        line = _strip_comments(lines[i])
-        if not line:
-            i += 1
-            continue
-        if line.startswith('include '):
-            pattern = line[len('include '):].rstrip(';').strip()
-            pattern = os.path.join(base_dir, pattern) if not os.path.isabs(pattern) else pattern
-            for inc_path in glob.glob(pattern):
-                with open(inc_path) as f:
-                    inc_lines = f.readlines()
-                inc_directives, inc_upstreams = _parse_block(inc_lines, os.path.dirname(inc_path), inc_path)
-                directives.extend(inc_directives)
-                for k, v in inc_upstreams.items():
-                    upstreams.setdefault(k, []).extend(v)
-            i += 1
-            continue
-        m = re.match(r'upstream\s+(\S+)\s*{', line)
-        if m:
-            name = m.group(1)
-            block_lines = []
-            depth = 1
-            i += 1
-            while i < len(lines) and depth > 0:
-                l = _strip_comments(lines[i])
-                if '{' in l:
-                    depth += l.count('{')
-                if '}' in l:
-                    depth -= l.count('}')
-                if depth > 0:
-                    block_lines.append(l)
-                i += 1
-            servers = []
-            for bl in block_lines:
-                m_srv = re.match(r'server\s+([^;]+);', bl)
-                if m_srv:
-                    servers.append(m_srv.group(1).strip())
-            upstreams[name] = servers
-            directives.append({'upstream': name, 'servers': servers, '__file__': source_file})
-            continue
-        # Блоки (например, server, http, location)
-        m = re.match(r'(\S+)\s*(\S+)?\s*{', line)
-        if m:
-            block_name = m.group(1)
-            block_arg = m.group(2)
-            block_lines = []
-            depth = 1
-            i += 1
-            while i < len(lines) and depth > 0:
-                l = _strip_comments(lines[i])
-                if '{' in l:
-                    depth += l.count('{')
-                if '}' in l:
-                    depth -= l.count('}')
-                if depth > 0:
-                    block_lines.append(l)
-                i += 1
-            sub_directives, sub_upstreams = _parse_block(block_lines, base_dir, source_file)
-            directives.append({'block': block_name, 'arg': block_arg, 'directives': sub_directives, '__file__': source_file})
-            for k, v in sub_upstreams.items():
-                upstreams.setdefault(k, []).extend(v)
+# --- Токенизатор ---
+# Одно регулярное выражение находит сразу целую инструкцию: всё до ближайшего
+# ';', '{' или '}' вне кавычек и комментариев. Серии обычных символов берутся
+# целиком (lookahead запрещает делить их на части), а остальные альтернативы
+# различаются по первому символу, поэтому откатов нет и разбор линейный.
+_STMT_RE = re.compile(r'''
+    ((?:
+        [^;{}"'\\\#$]+(?![^;{}"'\\\#$])
+      | "(?:[^"\\]|\\.)*(?:"|\Z)
+      | '(?:[^'\\]|\\.)*(?:'|\Z)
+      | (?<![^\s;{}])\#[^\n]*
+      | (?<=[^\s;{}])\#
+      | \$\{[^}\s]*\}
+      | \$
+      | \\.
+    )*)
+    ([;{}])
+''', re.VERBOSE | re.DOTALL)
+
+# Символы, при которых тело инструкции нельзя делить простым split()
+_SPECIAL_RE = re.compile(r'''[#"'\\]''')
+
+# Слова внутри одной инструкции. '#' в начале слова — комментарий, внутри слова — обычный символ.
+_WORD_RE = re.compile(r'''
+    (?P<comment>\#[^\n]*)
+  | (?P<word>(?:
+        "(?:[^"\\]|\\.)*(?:"|\Z)
+      | '(?:[^'\\]|\\.)*(?:'|\Z)
+      | \$\{[^}\s]*\}
+      | \\.
+      | [^\s"'\\]
+    )+)
+''', re.VERBOSE | re.DOTALL)
+
+def _split_words(body: str) -> Tuple[List[str], int]:
+    """
+    Делит тело инструкции с кавычками/комментариями на слова.
+    Возвращает (слова, смещение первого слова внутри body).
+    """
+    words = []
+    first = 0
+    for m in _WORD_RE.finditer(body):
+        if m.lastgroup == 'word':
+            if not words:
+                first = m.start()
+            words.append(m.group())
+    return words, first
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in ('"', "'"):
+        return value[1:-1]
+    return value
+
+# --- Разбор одного файла ---
+def _parse_text(text: str, source_file=None) -> List[Node]:
+    """
+    Строит дерево узлов (parser/nodes.py) одного файла за один проход по тексту.
+    include не раскрываются, а остаются узлами Include.
+    Каждый узел получает span: (строка, колонка, строка_конца, колонка_конца),
+    с 1; конец — позиция завершающего ';' или '}'.
+    """
+    root = []
+    children = root
+    stack = []
+    # pos — смещение, до которого переводы строк уже посчитаны
+    pos = 0
+    line = 1
+    line_start = 0
+    count = text.count
+    rfind = text.rfind
+    for m in _STMT_RE.finditer(text):
+        body, term = m.groups()
+        end = m.end() - 1
+        if _SPECIAL_RE.search(body) is None:
+            words = body.split()
+            offset = len(body) - len(body.lstrip()) if words else 0
+        else:
+            words, offset = _split_words(body)
+        if words:
+            start = end - len(body) + offset
+            n = count('\n', pos, start)
+            if n:
+                line += n
+                line_start = rfind('\n', pos, start) + 1
+            pos = start
+            start_line = line
+            start_col = start - line_start + 1
+        n = count('\n', pos, end)
+        if n:
+            line += n
+            line_start = rfind('\n', pos, end) + 1
+        pos = end
+        end_col = end - line_start + 1
+        if term == ';':
+            if words:
+                name = words[0]
+                if name == 'include':
+                    children.append(Include(_unquote(' '.join(words[1:])), source_file, (start_line, start_col, line, end_col)))
+                else:
+                    children.append(Directive(name, words[1:], source_file, (start_line, start_col, line, end_col)))
+        elif term == '{':
+            if words:
+                node = make_block(words[0], words[1:], [], source_file, (start_line, start_col, line, end_col))
+            else:
+                node = Block('', (), [], source_file, (line, end_col, line, end_col))
+            children.append(node)
+            stack.append(children)
+            children = node.directives
+        elif stack:
+            # Лишняя '}' без открытого блока игнорируется, как и в старом парсере
+            children = stack.pop()
+            node = children[-1]
+            s = node.span
+            node.span = (s[0], s[1], line, end_col)
+    return root
+
+def _parse_file(path: str) -> List[Node]:
+    with open(path) as f:
+        text = f.read()
+    return _parse_text(text, path)
+
+def _parse_file_packed(path: str) -> tuple:
+    # Для пула процессов: компактные кортежи передаются дешевле объектов,
+    # а при распаковке в основном процессе строки снова интернируются
+    return pack_nodes(_parse_file(path))
+
+class _Loader:
+    """
+    Загружает файлы для одного вызова parse_nginx_config через IncludeResolver
+    (память запуска, затем дисковый кэш) и, при jobs > 1, на пуле процессов.
+    """
+    def __init__(self, resolver: IncludeResolver, jobs: int = 1):
+        self.resolver = resolver
+        self.cache = resolver.cache
+        self.jobs = jobs
+        self._executor = None
+
+    def load(self, path: str) -> List[Node]:
+        return self.resolver.parse(path)
+
+    def load_many(self, paths: List[str]) -> List[List[Node]]:
+        """
+        Загружает несколько файлов; результат в том же порядке, что и paths.
+        Уже загруженные и попадания в кэш берутся сразу, разбор остальных идёт параллельно.
+        """
+        if self.jobs <= 1 or len(paths) < 2:
+            return [self.load(p) for p in paths]
+        resolver = self.resolver
+        results = [resolver.cached_nodes(p) for p in paths]
+        todo = []
+        for i, p in enumerate(paths):
+            if results[i] is None and self.cache is not None:
+                results[i] = self.cache.get(p, resolver.read(p) if self.cache.verify_hash else None)
+                if results[i] is not None:
+                    resolver.store_nodes(p, results[i])
+            if results[i] is None:
+                todo.append(i)
+        if len(todo) < 2:
+            for i in todo:
+                results[i] = resolver.parse(paths[i])
+            return results
+        if self._executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self._executor = ProcessPoolExecutor(max_workers=self.jobs)
+        chunksize = max(1, len(todo) // (self.jobs * 4))
+        parsed = self._executor.map(_parse_file_packed, [paths[i] for i in todo], chunksize=chunksize)
+        for i, packed in zip(todo, parsed):
+            results[i] = unpack_nodes(packed, paths[i])
+            resolver.store_nodes(paths[i], results[i])
+            if self.cache is not None:
+                self.cache.put(paths[i], results[i])
+        return results
+
+    def match_include(self, pattern: str, base_dir: str, stack) -> List[str]:
+        """Файлы include в порядке sorted(glob), без тех, что уже есть в цепочке stack."""
+        return [p for p in self.resolver.match(pattern, base_dir, stack[-1]) if os.path.abspath(p) not in stack]
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self.cache is not None:
+            self.cache.trim()
+
+# --- Раскрытие include и сбор upstream-ов ---
+def _expand(nodes, base_dir, upstreams, stack, loader: _Loader) -> List[Node]:
+    """
+    Подставляет содержимое include-файлов на место узлов include
+    и собирает upstream-ы. stack — файлы текущей цепочки include (защита от циклов).
+    Файлы одного include читаются пачкой (см. _Loader.load_many), но
+    раскрываются строго в порядке sorted(glob), как при последовательном разборе.
+    Исходные узлы не меняются: блоки, внутри которых были include, копируются,
+    остальные узлы переиспользуются. Если include не было, возвращается сам nodes.
+    """
+    result = []
+    changed = False
+    for d in nodes:
+        if isinstance(d, Include):
+            changed = True
+            inc_paths = loader.match_include(d.pattern, base_dir, stack)
+            for inc_path, inc_nodes in zip(inc_paths, loader.load_many(inc_paths)):
+                real = os.path.abspath(inc_path)
+                result.extend(_expand(inc_nodes, os.path.dirname(inc_path), upstreams, stack + (real,), loader))
             continue
-        # Обычная директива
-        m = re.match(r'(\S+)\s+([^;]+);', line)
-        if m:
-            directives.append({'directive': m.group(1), 'args': m.group(2), '__file__': source_file})
-        i += 1
-    return directives, upstreams
-
-def parse_nginx_config(path: str) -> NginxConfigTree:
+        if isinstance(d, Block):
+            children = _expand(d.directives, base_dir, upstreams, stack, loader)
+            if children is not d.directives:
+                d = d.with_directives(children)
+                changed = True
+            if isinstance(d, Upstream):
+                upstreams.setdefault(d.arg, []).extend(d.servers)
+        result.append(d)
+    return result if changed else nodes
+
+# --- Ленивый режим ---
+def _make_lazy(nodes, base_dir, stack, loader: _Loader) -> List[Node]:
+    """
+    Заменяет Include на LazyInclude во всех блоках уже разобранного файла.
+    Как и _expand, не меняет исходные узлы (они общие в IncludeResolver).
+    """
+    result = []
+    changed = False
+    for d in nodes:
+        if isinstance(d, Include):
+            d = LazyInclude(d.pattern, partial(_resolve_lazy, d.pattern, base_dir, stack, loader), d.file, d.span)
+            changed = True
+        elif isinstance(d, Block):
+            children = _make_lazy(d.directives, base_dir, stack, loader)
+            if children is not d.directives:
+                d = d.with_directives(children)
+                changed = True
+        result.append(d)
+    return result if changed else nodes
+
+def _resolve_lazy(pattern, base_dir, stack, loader: _Loader) -> List[Node]:
+    inc_paths = loader.match_include(pattern, base_dir, stack)
+    if len(inc_paths) > 1 and loader.jobs <= 1:
+        # Каждый файл — отдельная заглушка: разбирается, только когда до него дойдёт обход
+        return [LazyInclude(p, partial(_load_lazy, [p], stack, loader)) for p in inc_paths]
+    return _load_lazy(inc_paths, stack, loader)
+
+def _load_lazy(paths, stack, loader: _Loader) -> List[Node]:
+    result = []
+    try:
+        for inc_path, inc_nodes in zip(paths, loader.load_many(paths)):
+            real = os.path.abspath(inc_path)
+            result.extend(_make_lazy(inc_nodes, os.path.dirname(inc_path), stack + (real,), loader))
+    finally:
+        loader.close()
+    return result
+
+def parse_nginx_config(path: str, use_cache: bool = False, cache: ParseCache = None, jobs: int = 1, lazy: bool = False,
+                       resolver: IncludeResolver = None) -> NginxConfigTree:
+    """
+    Разбирает nginx.conf вместе со всеми include.
+    use_cache — брать неизменившиеся файлы из дискового кэша (см. parser/cache.py);
+    cache — явный экземпляр ParseCache (например, с другим каталогом);
+    jobs — число процессов для разбора файлов, найденных одним include (1 — без пула);
+    lazy — не раскрывать include сразу: они становятся узлами LazyInclude и
+    разбираются при первом обходе (см. parser/nodes.py);
+    resolver — общий IncludeResolver, если те же файлы нужны ещё кому-то
+    (например, build_include_tree): тогда каждый файл читается один раз на всех;
+    дисковый кэш в этом случае берётся из resolver.cache.
+    """
+    if resolver is None:
+        if cache is None and use_cache:
+            cache = ParseCache()
+        resolver = IncludeResolver(cache)
+    loader = _Loader(resolver, jobs)
+    if lazy:
+        try:
+            nodes = loader.load(path)
+        finally:
+            loader.close()
+        base_dir = os.path.dirname(os.path.abspath(path))
+        return NginxConfigTree(_make_lazy(nodes, base_dir, (os.path.abspath(path),), loader))
+    try:
+        return _build_tree(path, loader)
+    finally:
+        loader.close()
+
+def _build_tree(path: str, loader: _Loader) -> NginxConfigTree:
     base_dir = os.path.dirname(os.path.abspath(path))
-    with open(path) as f:
-        lines = f.readlines()
-    directives, upstreams = _parse_block(lines, base_dir, path)
-    return NginxConfigTree(directives, upstreams) 
\ No newline at end of file
+    nodes = loader.load(path)
+    upstreams = {}
+    directives = _expand(nodes, base_dir, upstreams, (os.path.abspath(path),), loader)
+    return NginxConfigTree(directives, upstreams)
@@ -0,0 +1,246 @@
+import sys
+from typing import List, Tuple, Any, Iterator, Callable
+
+_intern = sys.intern
+_NO_SPAN = (None, None, None, None)
+
+class Node:
+    """
+    Базовый узел дерева конфига.
+
+    Узлы хранят данные в __slots__ (без __dict__ на каждый узел), имена директив,
+    пути файлов и слова аргументов интернированы, аргументы — кортежи слов.
+    Для совместимости узел ведёт себя как read-only dict со старыми ключами
+    ('directive', 'args', 'block', 'arg', 'directives', '__file__', '__span__', ...),
+    поэтому d.get('directive'), 'directives' in d и d['args'] работают как раньше.
+    """
+    # span хранится четырьмя слотами, а не кортежем: минус один объект на узел
+    __slots__ = ('file', 'line', 'col', 'end_line', 'end_col')
+    _KEYS: Tuple[str, ...] = ()
+
+    @property
+    def span(self):
+        """(строка, колонка, строка_конца, колонка_конца) или None."""
+        if self.line is None:
+            return None
+        return (self.line, self.col, self.end_line, self.end_col)
+
+    @span.setter
+    def span(self, value):
+        self.line, self.col, self.end_line, self.end_col = value or _NO_SPAN
+
+    def _value(self, key):
+        raise NotImplementedError
+
+    # --- dict-совместимый доступ ---
+    def __getitem__(self, key):
+        if key not in self._KEYS:
+            raise KeyError(key)
+        return self._value(key)
+
+    def get(self, key, default=None):
+        if key not in self._KEYS:
+            return default
+        return self._value(key)
+
+    def __contains__(self, key) -> bool:
+        return key in self._KEYS
+
+    def keys(self) -> Tuple[str, ...]:
+        return self._KEYS
+
+    def items(self) -> List[Tuple[str, Any]]:
+        return [(k, self._value(k)) for k in self._KEYS]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._KEYS)
+
+    def to_dict(self) -> dict:
+        """Старое представление узла — обычный dict (рекурсивно для блоков)."""
+        out = {}
+        for k in self._KEYS:
+            v = self._value(k)
+            if k == 'directives':
+                v = [c.to_dict() for c in iter_nodes(v)]
+            out[k] = v
+        return out
+
+    def __eq__(self, other):
+        if isinstance(other, Node):
+            return type(self) is type(other) and self.items() == other.items()
+        if isinstance(other, dict):
+            return dict(self.items()) == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self.items())!r})"
+
+class Directive(Node):
+    """Простая директива: name args...;"""
+    __slots__ = ('name', 'args')
+    _KEYS = ('directive', 'args', '__file__', '__span__')
+
+    def __init__(self, name: str, args: Tuple[str, ...], file=None, span=None):
+        self.name = _intern(name)
+        self.args = tuple(map(_intern, args))
+        self.file = _intern(file) if file else file
+        self.line, self.col, self.end_line, self.end_col = span or _NO_SPAN
+
+    def _value(self, key):
+        if key == 'directive':
+            return self.name
+        if key == 'args':
+            return ' '.join(self.args)
+        if key == '__file__':
+            return self.file
+        return self.span
+
+class Include(Node):
+    """Ещё не раскрытый include pattern;"""
+    __slots__ = ('pattern',)
+    _KEYS = ('include', '__file__', '__span__')
+
+    def __init__(self, pattern: str, file=None, span=None):
+        self.pattern = pattern
+        self.file = _intern(file) if file else file
+        self.line, self.col, self.end_line, self.end_col = span or _NO_SPAN
+
+    def _value(self, key):
+        if key == 'include':
+            return self.pattern
+        if key == '__file__':
+            return self.file
+        return self.span
+
+class Block(Node):
+    """Блок: name args... { directives }"""
+    __slots__ = ('name', 'args', 'directives')
+    _KEYS = ('block', 'arg', 'directives', '__file__', '__span__')
+
+    def __init__(self, name: str, args: Tuple[str, ...], directives: List[Node] = None, file=None, span=None):
+        self.name = _intern(name)
+        self.args = tuple(map(_intern, args))
+        self.directives = directives if directives is not None else []
+        self.file = _intern(file) if file else file
+        self.line, self.col, self.end_line, self.end_col = span or _NO_SPAN
+
+    @property
+    def arg(self):
+        return ' '.join(self.args) or None
+
+    def with_directives(self, directives: List[Node]) -> 'Block':
+        """Копия блока (того же класса) с другим списком дочерних узлов."""
+        copy = object.__new__(type(self))
+        copy.name = self.name
+        copy.args = self.args
+        copy.directives = directives
+        copy.file = self.file
+        copy.line, copy.col, copy.end_line, copy.end_col = self.line, self.col, self.end_line, self.end_col
+        return copy
+
+    def _value(self, key):
+        if key == 'block':
+            return self.name
+        if key == 'arg':
+            return self.arg
+        if key == 'directives':
+            return self.directives
+        if key == '__file__':
+            return self.file
+        return self.span
+
+class Upstream(Block):
+    """Блок upstream; дополнительно отдаёт 'upstream' (имя) и 'servers' (аргументы директив server)."""
+    __slots__ = ()
+    _KEYS = ('block', 'arg', 'directives', '__file__', '__span__', 'upstream', 'servers')
+
+    @property
+    def servers(self) -> List[str]:
+        return [' '.join(d.args) for d in iter_nodes(self.directives) if isinstance(d, Directive) and d.name == 'server']
+
+    def _value(self, key):
+        if key == 'upstream':
+            return self.arg
+        if key == 'servers':
+            return self.servers
+        return Block._value(self, key)
+
+class LazyInclude(Node):
+    """
+    include в ленивом режиме: файлы разбираются при первом обращении к directives,
+    результат запоминается. Обходчики (iter_nodes, Analyzer.walk) подставляют
+    содержимое на место узла, как будто include был раскрыт при разборе.
+    """
+    __slots__ = ('pattern', '_resolve', '_directives')
+    _KEYS = ('include', 'directives', '__file__', '__span__')
+
+    def __init__(self, pattern: str, resolve: Callable[[], List[Node]], file=None, span=None):
+        self.pattern = pattern
+        self._resolve = resolve
+        self._directives = None
+        self.file = _intern(file) if file else file
+        self.line, self.col, self.end_line, self.end_col = span or _NO_SPAN
+
+    @property
+    def directives(self) -> List[Node]:
+        if self._directives is None:
+            self._directives = self._resolve()
+            self._resolve = None
+        return self._directives
+
+    @property
+    def loaded(self) -> bool:
+        return self._directives is not None
+
+    def _value(self, key):
+        if key == 'include':
+            return self.pattern
+        if key == 'directives':
+            return self.directives
+        if key == '__file__':
+            return self.file
+        return self.span
+
+def iter_nodes(nodes) -> Iterator[Node]:
+    """
+    Перебирает узлы списка, подставляя на место LazyInclude их содержимое.
+    Для дерева без ленивых include — то же самое, что перебор списка.
+    """
+    for d in nodes:
+        if type(d) is LazyInclude:
+            yield from iter_nodes(d.directives)
+        else:
+            yield d
+
+def make_block(name: str, args: Tuple[str, ...], directives=None, file=None, span=None) -> Block:
+    if name == 'upstream' and args:
+        return Upstream(name, args, directives, file, span)
+    return Block(name, args, directives, file, span)
+
+# --- Компактное представление для кэша и передачи между процессами ---
+# directive -> (0, name, args, span), include -> (1, pattern, span),
+# block -> (2, name, args, span, children). Файл восстанавливается при распаковке.
+def pack_nodes(nodes) -> tuple:
+    out = []
+    for d in nodes:
+        if isinstance(d, Directive):
+            out.append((0, d.name, d.args, d.span))
+        elif isinstance(d, Include):
+            out.append((1, d.pattern, d.span))
+        else:
+            out.append((2, d.name, d.args, d.span, pack_nodes(d.directives)))
+    return tuple(out)
+
+def unpack_nodes(packed, source_file) -> List[Node]:
+    out = []
+    for p in packed:
+        kind = p[0]
+        if kind == 0:
+            out.append(Directive(p[1], p[2], source_file, p[3]))
+        elif kind == 1:
+            out.append(Include(p[1], source_file, p[2]))
+        else:
+            out.append(make_block(p[1], p[2], unpack_nodes(p[4], source_file), source_file, p[3]))
+    return out
@@ -0,0 +1,170 @@
+import os
+import glob as _glob
+from typing import Dict, List, Optional
+from parser.cache import ParseCache
+from parser.nodes import Node, Include, Block
+
+class IncludeResolver:
+    """
+    Общий источник файлов конфига на один запуск: читает каждый файл и раскрывает
+    каждый glob include не больше одного раза, а разобранные узлы файла отдаёт
+    всем потребителям (parse_nginx_config, build_include_tree, поиск циклов).
+
+    По ходу работы собирается граф include: файл -> файлы, которые он подключает
+    (в порядке sorted(glob)). Граф содержит и рёбра, замыкающие цикл, —
+    парсер такие include пропускает, а cycles() их находит.
+
+    Содержимое запоминается навсегда, поэтому для повторного разбора после правки
+    файлов нужен новый экземпляр (см. parser/watch.py).
+    """
+    def __init__(self, cache: ParseCache = None):
+        self.cache = cache
+        self._texts: Dict[str, str] = {}
+        self._globs: Dict[str, List[str]] = {}
+        self._nodes: Dict[str, List[Node]] = {}
+        self._graph: Dict[str, Dict[str, None]] = {}
+        self.reads = 0
+
+    def read(self, path: str) -> str:
+        """Текст файла; OSError, если файла нет."""
+        abs_path = os.path.abspath(path)
+        text = self._texts.get(abs_path)
+        if text is None:
+            with open(path) as f:
+                text = f.read()
+            self.reads += 1
+            self._texts[abs_path] = text
+        return text
+
+    def glob(self, pattern: str) -> List[str]:
+        """sorted(glob(pattern)) для абсолютного шаблона."""
+        matched = self._globs.get(pattern)
+        if matched is None:
+            matched = self._globs[pattern] = sorted(_glob.glob(pattern))
+        return matched
+
+    def cached_nodes(self, path: str) -> Optional[List[Node]]:
+        return self._nodes.get(os.path.abspath(path))
+
+    def store_nodes(self, path: str, nodes: List[Node]) -> None:
+        self._nodes[os.path.abspath(path)] = nodes
+
+    def parse(self, path: str) -> List[Node]:
+        """
+        Узлы файла без раскрытия include: из памяти, из дискового кэша или разбором текста.
+        Узлы общие для всех потребителей и не должны меняться.
+        """
+        from parser.nginx_parser import _parse_text
+        abs_path = os.path.abspath(path)
+        nodes = self._nodes.get(abs_path)
+        if nodes is not None:
+            return nodes
+        cache = self.cache
+        text = self.read(path) if cache is None or cache.verify_hash else None
+        if cache is not None:
+            nodes = cache.get(path, text)
+        if nodes is None:
+            if text is None:
+                text = self.read(path)
+            nodes = _parse_text(text, path)
+            if cache is not None:
+                cache.put(path, nodes)
+        self._nodes[abs_path] = nodes
+        return nodes
+
+    def match(self, pattern: str, base_dir: str, including: str = None) -> List[str]:
+        """
+        Файлы include pattern (относительно base_dir) в порядке sorted(glob).
+        including — файл с этим include: запоминается ребро графа.
+        """
+        pattern = os.path.join(base_dir, pattern) if not os.path.isabs(pattern) else pattern
+        matched = self.glob(pattern)
+        if including is not None:
+            edges = self._graph.setdefault(os.path.abspath(including), {})
+            for p in matched:
+                edges[os.path.abspath(p)] = None
+        return matched
+
+    def includes(self, path: str) -> List[str]:
+        """Шаблоны всех include файла (в том числе внутри блоков) в порядке появления."""
+        patterns = []
+        stack = [iter(self.parse(path))]
+        while stack:
+            for d in stack[-1]:
+                if isinstance(d, Include):
+                    patterns.append(d.pattern)
+                elif isinstance(d, Block):
+                    stack.append(iter(d.directives))
+                    break
+            else:
+                stack.pop()
+        return patterns
+
+    def roots(self, paths: List[str]) -> List[str]:
+        """
+        Корневые конфиги среди paths: файлы, которые не подключает ни один другой файл из paths.
+        Попутно собирается граф include между ними. Файлы, недостижимые из корней
+        (например, замкнутые в цикл include), тоже становятся корнями — первый из каждой группы.
+        Файл, который не удалось прочитать или разобрать, считается файлом без include.
+        """
+        paths = [os.path.abspath(p) for p in paths]
+        included = set()
+        for path in paths:
+            try:
+                patterns = self.includes(path)
+            except Exception:
+                continue
+            for pattern in patterns:
+                for p in self.match(pattern, os.path.dirname(path), including=path):
+                    p = os.path.abspath(p)
+                    if p != path:
+                        included.add(p)
+        roots = [p for p in paths if p not in included]
+        reached = set()
+        for path in roots:
+            self._reach(path, reached)
+        for path in paths:
+            if path not in reached:
+                roots.append(path)
+                self._reach(path, reached)
+        return roots
+
+    def _reach(self, path: str, reached: set) -> None:
+        stack = [path]
+        while stack:
+            p = stack.pop()
+            if p not in reached:
+                reached.add(p)
+                stack.extend(self._graph.get(p, ()))
+
+    def graph(self) -> Dict[str, List[str]]:
+        """Граф include, собранный на данный момент: файл -> подключаемые файлы."""
+        return {k: list(v) for k, v in self._graph.items()}
+
+    def cycles(self) -> List[List[str]]:
+        """
+        Циклы в графе include: цепочки файлов, где последний файл подключает первый
+        (первый файл повторён в конце). Каждый цикл — один раз.
+        """
+        cycles = []
+        state = {}
+        for root in self._graph:
+            if root in state:
+                continue
+            chain = [root]
+            state[root] = 1
+            stack = [iter(self._graph.get(root, ()))]
+            while stack:
+                for nxt in stack[-1]:
+                    st = state.get(nxt)
+                    if st == 1:
+                        cycles.append(chain[chain.index(nxt):] + [nxt])
+                    elif st is None:
+                        state[nxt] = 1
+                        chain.append(nxt)
+                        stack.append(iter(self._graph.get(nxt, ())))
+                        break
+                else:
+                    stack.pop()
+                    state[chain.pop()] = 2
+        return cycles
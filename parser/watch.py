@@ -0,0 +1,137 @@
+import os
+import glob
+from typing import Dict, List, Optional, Tuple
+from parser.cache import ParseCache
+from parser.nginx_parser import NginxConfigTree, _Loader, _build_tree
+from parser.resolver import IncludeResolver
+from parser.nodes import Node
+
+def _signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+class _WatchLoader(_Loader):
+    """
+    Загрузчик, который держит разобранные файлы в памяти между перестроениями дерева.
+    Файл перечитывается, только если изменились его mtime или размер.
+    Запоминает, какие glob-и include раскрывались и что они нашли.
+    """
+    def __init__(self, cache: ParseCache = None, jobs: int = 1):
+        super().__init__(IncludeResolver(cache), jobs)
+        # abs path -> (сигнатура, узлы)
+        self.files: Dict[str, Tuple[Tuple[int, int], List[Node]]] = {}
+        # glob-шаблон (абсолютный) -> найденные файлы
+        self.globs: Dict[str, List[str]] = {}
+        self._used = set()
+
+    def start_build(self) -> None:
+        # IncludeResolver помнит файлы и glob-и навсегда — на каждое перестроение новый
+        self.resolver = IncludeResolver(self.cache)
+        self.globs = {}
+        self._used = set()
+
+    def _remember(self, path: str, sig, nodes: List[Node]) -> None:
+        abs_path = os.path.abspath(path)
+        self.files[abs_path] = (sig, nodes)
+        self._used.add(abs_path)
+
+    def _stored(self, path: str) -> Optional[List[Node]]:
+        abs_path = os.path.abspath(path)
+        entry = self.files.get(abs_path)
+        if entry is None:
+            return None
+        self._used.add(abs_path)
+        return entry[1]
+
+    def load(self, path: str) -> List[Node]:
+        nodes = self._stored(path)
+        if nodes is None:
+            sig = _signature(path)
+            nodes = super().load(path)
+            self._remember(path, sig, nodes)
+        return nodes
+
+    def load_many(self, paths: List[str]) -> List[List[Node]]:
+        results = [self._stored(p) for p in paths]
+        missing = [i for i, nodes in enumerate(results) if nodes is None]
+        if missing:
+            miss_paths = [paths[i] for i in missing]
+            sigs = [_signature(p) for p in miss_paths]
+            for i, p, sig, nodes in zip(missing, miss_paths, sigs, super().load_many(miss_paths)):
+                self._remember(p, sig, nodes)
+                results[i] = nodes
+        return results
+
+    def match_include(self, pattern: str, base_dir: str, stack) -> List[str]:
+        abs_pattern = os.path.join(base_dir, pattern) if not os.path.isabs(pattern) else pattern
+        self.globs[abs_pattern] = self.resolver.glob(abs_pattern)
+        return super().match_include(pattern, base_dir, stack)
+
+class ConfigWatcher:
+    """
+    Держит дерево конфига в памяти и по refresh() перечитывает только изменившиеся файлы.
+
+    Файлы, которые не менялись, не разбираются заново, а их узлы переиспользуются
+    в новом дереве (раскрытие include не меняет исходные узлы, см. _expand).
+    Кроме mtime/размера файлов отслеживаются результаты glob-ов include,
+    так что новые и удалённые файлы в sites-enabled/*.conf тоже замечаются.
+    """
+    def __init__(self, path: str, cache: ParseCache = None, jobs: int = 1):
+        self.path = path
+        self.tree: Optional[NginxConfigTree] = None
+        # Прошлое перестроение упало: следующее делается без проверки изменений
+        self._failed = False
+        self._loader = _WatchLoader(cache, jobs)
+
+    def files(self) -> List[str]:
+        """Файлы, из которых собрано текущее дерево."""
+        return list(self._loader.files)
+
+    def signature(self, path: str) -> Optional[Tuple[int, int]]:
+        entry = self._loader.files.get(os.path.abspath(path))
+        return entry[0] if entry else None
+
+    def _changes(self) -> List[str]:
+        changed = []
+        for path, (sig, _) in list(self._loader.files.items()):
+            if _signature(path) != sig:
+                changed.append(path)
+                del self._loader.files[path]
+        for pattern, matched in self._loader.globs.items():
+            for p in sorted(set(glob.glob(pattern)) ^ set(matched)):
+                p = os.path.abspath(p)
+                if p not in changed:
+                    changed.append(p)
+        return changed
+
+    def refresh(self) -> List[str]:
+        """
+        Перестраивает дерево, если что-то изменилось.
+        Возвращает изменившиеся, добавленные и удалённые файлы; при первом вызове
+        (и после неудачного разбора) — все файлы дерева.
+        Пустой список — изменений нет, self.tree прежний.
+        """
+        if self.tree is None or self._failed:
+            changed = None
+        else:
+            changed = self._changes()
+            if not changed:
+                return []
+        loader = self._loader
+        loader.start_build()
+        self._failed = True
+        try:
+            self.tree = _build_tree(self.path, loader)
+            self._failed = False
+        finally:
+            loader.close()
+        # Файлы, выпавшие из дерева (убран include), больше не держим в памяти
+        for path in list(loader.files):
+            if path not in loader._used:
+                del loader.files[path]
+        if changed is None:
+            changed = self.files()
+        return changed
@@ -15,7 +15,7 @@ setup(
     ],
     entry_points={
         "console_scripts": [
-            "nginx-lens=commands.cli:app",
+            "nginx-lens=daemon.client:main",
         ],
     },
     python_requires=">=3.8",
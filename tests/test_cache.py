@@ -0,0 +1,52 @@
+import os
+import tempfile
+from parser.nginx_parser import parse_nginx_config
+from parser.cache import ParseCache
+
+def _write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+def test_cache_reuses_unchanged_files():
+    with tempfile.TemporaryDirectory() as d:
+        main_path = os.path.join(d, "nginx.conf")
+        sub_path = os.path.join(d, "sub.conf")
+        _write(main_path, "http {\n    include sub.conf;\n}\n")
+        _write(sub_path, "upstream api {\n    server api1:9000;\n}\n")
+        cache_dir = os.path.join(d, "cache")
+
+        cache = ParseCache(cache_dir)
+        first = parse_nginx_config(main_path, cache=cache)
+        assert (cache.hits, cache.misses) == (0, 2)
+
+        cache = ParseCache(cache_dir)
+        second = parse_nginx_config(main_path, cache=cache)
+        assert (cache.hits, cache.misses) == (2, 0)
+        assert second.directives == first.directives
+        assert second.get_upstreams() == {"api": ["api1:9000"]}
+
+        # Изменился только sub.conf — перечитывается только он
+        _write(sub_path, "upstream api {\n    server api1:9000;\n    server api2:9000;\n}\n")
+        os.utime(sub_path, ns=(0, os.stat(sub_path).st_mtime_ns + 10**9))
+        cache = ParseCache(cache_dir)
+        third = parse_nginx_config(main_path, cache=cache)
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert third.get_upstreams() == {"api": ["api1:9000", "api2:9000"]}
+
+def test_cache_is_size_bounded():
+    with tempfile.TemporaryDirectory() as d:
+        cache_dir = os.path.join(d, "cache")
+        paths = []
+        for i in range(5):
+            p = os.path.join(d, f"site{i}.conf")
+            _write(p, "server { listen 80; server_name s%d; }\n" % i)
+            paths.append(p)
+        cache = ParseCache(cache_dir)
+        for p in paths:
+            parse_nginx_config(p, cache=cache)
+        entry_size = max(os.path.getsize(e.path) for e in os.scandir(cache.cache_dir))
+        extra = os.path.join(d, "extra.conf")
+        _write(extra, "server { listen 81; }\n")
+        cache = ParseCache(cache_dir, max_bytes=entry_size * 2)
+        parse_nginx_config(extra, cache=cache)
+        assert len(os.listdir(cache.cache_dir)) <= 2
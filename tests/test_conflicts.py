@@ -1,5 +1,5 @@
 from parser.nginx_parser import parse_nginx_config
-from analyzer.conflicts import find_location_conflicts
+from analyzer.conflicts import find_location_conflicts, find_listen_servername_conflicts
 import tempfile
 import os
 
@@ -26,4 +26,54 @@ def test_location_conflicts():
     assert any("/api" in (c["location1"], c["location2"]) and "/api/v1" in (c["location1"], c["location2"]) for c in conflicts)
     # /static не должен конфликтовать
     assert not any("/static" in (c["location1"], c["location2"]) and ("/api" in (c["location1"], c["location2"]) or "/api/v1" in (c["location1"], c["location2"])) for c in conflicts)
-    os.unlink(f.name) 
\ No newline at end of file
+    os.unlink(f.name)
+
+def test_location_conflicts_understand_modifiers():
+    conf = """
+    server {
+        location = / { return 200; }
+        location / { root /var/www; }
+        location ^~ /img { root /var/img; }
+        location /img/icons { root /var/icons; }
+        location ~ ^/img/.*\\.png$ { expires 1d; }
+        location ~* \\.php$ { fastcgi_pass php; }
+        location ~* \\.php$ { fastcgi_pass php2; }
+        location = /health { return 200; }
+        location @fallback { proxy_pass http://app; }
+    }
+    """
+    with tempfile.NamedTemporaryFile("w+", delete=False) as f:
+        f.write(conf)
+        f.flush()
+        tree = parse_nginx_config(f.name)
+    pairs = [(c["location1"], c["location2"]) for c in find_location_conflicts(tree)]
+    assert pairs == [
+        ("/", "^~ /img"),
+        ("/", "/img/icons"),
+        ("^~ /img", "/img/icons"),
+        ("~* \\.php$", "~* \\.php$"),
+    ]
+    os.unlink(f.name)
+
+def test_listen_servername_conflicts_normalize_listen():
+    conf = """
+    server { listen 80 default_server; server_name a.com www.a.com; }
+    server { listen 0.0.0.0:80; server_name A.com; }
+    server { listen *:80; listen 443 ssl; server_name b.com www.a.com; }
+    server { listen 127.0.0.1:80; server_name a.com; }
+    server { server_name b.com; }
+    """
+    with tempfile.NamedTemporaryFile("w+", delete=False) as f:
+        f.write(conf)
+        f.flush()
+        tree = parse_nginx_config(f.name)
+    servers = tree.servers()
+    found = [(servers.index(c["server1"]), servers.index(c["server2"]), c["listen"], c["server_name"])
+             for c in find_listen_servername_conflicts(tree)]
+    assert found == [
+        (0, 1, ["*:80"], ["a.com"]),
+        (0, 2, ["*:80"], ["www.a.com"]),
+        # server без listen слушает *:80
+        (2, 4, ["*:80"], ["b.com"]),
+    ]
+    os.unlink(f.name)
@@ -0,0 +1,82 @@
+import io
+import os
+import tempfile
+import threading
+import time
+from typer.testing import CliRunner
+from commands.cli import app
+from daemon.client import DaemonClient, DaemonError, run_client
+from daemon.server import LensServer, LensState
+from commands.analyze import collect_issues
+from parser.nginx_parser import parse_nginx_config
+
+runner = CliRunner()
+
+def _write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+def _start(d, configs):
+    sock = os.path.join(d, "lens.sock")
+    server = LensServer(sock, LensState(configs, use_cache=False, interval=0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, sock
+
+def test_daemon_answers_and_reloads():
+    with tempfile.TemporaryDirectory() as d:
+        main_path = os.path.join(d, "nginx.conf")
+        site = os.path.join(d, "site.conf")
+        _write(main_path, "http { upstream app { server 127.0.0.1:8080; } include site.conf; }\n")
+        _write(site, "server { listen 80; server_name a.com; location / { proxy_pass http://app; } }\n")
+        server, sock = _start(d, [main_path])
+        try:
+            with DaemonClient(sock) as client:
+                row = client.request('route', url='http://a.com/x')
+                assert (row['server'], row['location'], row['upstream'], row['file']) == ('a.com', '/', 'app', site)
+                issues = client.request('analyze')[main_path]
+                assert sorted(map(tuple, issues)) == sorted(collect_issues(parse_nginx_config(main_path)))
+                assert client.request('upstreams')[main_path] == {'app': ['127.0.0.1:8080']}
+                servers = client.request('tree', block='server', file=site)[main_path]
+                assert [n['name'] for n in servers[0]['directives']] == ['listen', 'server_name', 'location']
+                # Правка файла видна в следующем ответе
+                time.sleep(0.01)
+                _write(site, "server { listen 80; server_name b.com; location /api { proxy_pass http://app; } }\n")
+                os.utime(site, (time.time() + 5, time.time() + 5))
+                row = client.request('route', url='http://b.com/api/v1')
+                assert (row['server'], row['location']) == ('b.com', '/api')
+                assert client.request('status')['reloads'] == 2
+                try:
+                    client.request('nope')
+                    assert False
+                except DaemonError:
+                    pass
+        finally:
+            server.shutdown()
+            server.server_close()
+
+def test_thin_client_uses_daemon_only_when_running(monkeypatch):
+    with tempfile.TemporaryDirectory() as d:
+        main_path = os.path.join(d, "nginx.conf")
+        _write(main_path, "http { server { listen 80; server_name a.com; location / { proxy_pass http://app; autoindex on; } }"
+                          " server { listen 80; server_name b.com; } }\n")
+        monkeypatch.setenv("NGINX_LENS_SOCKET", os.path.join(d, "lens.sock"))
+        assert run_client(["route", "http://a.com/"]) is None
+        server, _ = _start(d, [main_path])
+        try:
+            # Ответ демона выводится так же, как без него
+            outputs = []
+            for argv in (["route", "-c", main_path, "http://a.com/x"], ["route", "-c", main_path, "http://a.com:99999/"],
+                         ["route", "-c", main_path, "http://a.com:81/"], ["analyze", main_path]):
+                out = io.StringIO()
+                code = run_client(argv, out)
+                cli = runner.invoke(app, argv + ["--no-cache"])
+                assert (code, out.getvalue()) == (cli.exit_code, cli.stdout), argv
+                outputs.append(out.getvalue())
+            assert "Server:" in outputs[0] and "Неверный URL" in outputs[1] and "не найден" in outputs[2]
+            assert "autoindex_on" in outputs[3]
+            # Режимы, которых нет у демона, выполняет обычный CLI
+            assert run_client(["route", "--batch", "urls.txt"]) is None
+            assert run_client(["tree", main_path]) is None
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,30 @@
+import tempfile
+import os
+from parser.nginx_parser import parse_nginx_config
+from analyzer.dead_locations import find_dead_locations
+from analyzer.matcher import MultiPatternMatcher
+
+def test_dead_locations():
+    conf = """
+    server {
+        rewrite ^/legacy/(.*)$ /api/v1/$1 last;
+        location /api { proxy_pass http://backend; }
+        location /api/v1 { proxy_pass http://backend_v1; }
+        location /static { try_files $uri /fallback; }
+        location /fallback { root /var/www; }
+        location /admin { root /var/admin; }
+    }
+    """
+    with tempfile.NamedTemporaryFile("w+", delete=False) as f:
+        f.write(conf)
+        f.flush()
+        tree = parse_nginx_config(f.name)
+    dead = [l["location"]["arg"] for l in find_dead_locations(tree)]
+    # /api и /api/v1 упомянуты в rewrite, /fallback — в try_files
+    assert dead == ["/static", "/admin"]
+    os.unlink(f.name)
+
+def test_matcher_finds_nested_and_overlapping_patterns():
+    m = MultiPatternMatcher(["/api", "/api/v1", "pi/v", "/x", ""])
+    assert m.find_all("/api/v1/users") == {"/api", "/api/v1", "pi/v"}
+    assert m.find_all("/ap") == set()
@@ -0,0 +1,72 @@
+import tempfile
+from parser.nginx_parser import parse_nginx_config
+from analyzer.warnings import find_warnings
+from analyzer.route import find_route
+
+CONF = """
+http {
+    limit_req zone=one;
+    add_header X-Frame-Options DENY;
+    add_header X-Content-Type-Options nosniff;
+    root /srv/http;
+    server {
+        listen 80;
+        server_name example.com;
+        return 301 https://example.com;
+        location /api {
+            add_header Cache-Control no-store;
+            proxy_pass http://backend;
+            location /api/inner { root /srv/inner; }
+        }
+        location /static { }
+    }
+}
+"""
+
+def _tree(text=CONF):
+    with tempfile.NamedTemporaryFile("w+", suffix=".conf", delete=False) as f:
+        f.write(text)
+        f.flush()
+        return parse_nginx_config(f.name)
+
+def _location(tree, arg):
+    return next(b for b in tree.blocks('location') if b.arg == arg)
+
+def _args(directives):
+    return [d['args'] for d in directives]
+
+def test_array_directive_replaced_not_merged():
+    tree = _tree()
+    effective = tree.effective
+    server = tree.servers()[0]
+    assert _args(effective.get(server, 'add_header')) == ['X-Frame-Options DENY', 'X-Content-Type-Options nosniff']
+    # Один add_header в location отменяет все add_header уровня http
+    assert _args(effective.get(_location(tree, '/api'), 'add_header')) == ['Cache-Control no-store']
+    assert _args(effective.get(_location(tree, '/api/inner'), 'add_header')) == ['Cache-Control no-store']
+    assert effective.value(_location(tree, '/api/inner'), 'root') == '/srv/inner'
+    assert effective.value(_location(tree, '/static'), 'root') == '/srv/http'
+
+def test_handlers_not_inherited():
+    tree = _tree()
+    effective = tree.effective
+    assert effective.value(tree.servers()[0], 'return') == '301 https://example.com'
+    assert not effective.has(_location(tree, '/static'), 'return')
+    assert not effective.has(_location(tree, '/api/inner'), 'proxy_pass')
+    static = effective.directives(_location(tree, '/static'))
+    assert 'listen' not in static and 'server_name' not in static
+    # Блок без своих директив делит словарь с тем, что передаёт родитель
+    assert effective.directives(_location(tree, '/static')) is static
+
+def test_limit_req_in_http_covers_servers():
+    types = [w['type'] for w in find_warnings(_tree())]
+    assert 'no_limit_req_conn' not in types
+    types = [w['type'] for w in find_warnings(_tree(CONF.replace('limit_req zone=one;', '')))]
+    assert types.count('no_limit_req_conn') == 1
+
+def test_route_reports_effective_directives():
+    res = find_route(_tree(), 'http://example.com/api/inner/x')
+    assert res['location'].arg == '/api/inner'
+    assert res['proxy_pass'] is None
+    assert res['effective']['root'] == ['/srv/inner']
+    assert res['effective']['limit_req'] == ['zone=one']
+    assert 'return' not in res['effective']
@@ -0,0 +1,45 @@
+import os
+import tempfile
+from typer.testing import CliRunner
+from commands.cli import app
+from commands.analyze import FleetReport, expand_roots, _analyze_host, collect_issues
+from parser.nginx_parser import parse_nginx_config
+
+runner = CliRunner()
+
+CONF = "http { server { listen 80; server_name a; } server { } }\n"
+
+def _roots(count):
+    root = tempfile.mkdtemp()
+    paths = []
+    for i in range(count):
+        os.makedirs(os.path.join(root, f"host{i}"))
+        path = os.path.join(root, f"host{i}", "nginx.conf")
+        with open(path, "w") as f:
+            f.write(CONF)
+        paths.append(path)
+    return root, paths
+
+def test_expand_roots_globs_and_dedup():
+    root, paths = _roots(3)
+    assert expand_roots([os.path.join(root, "*", "nginx.conf"), paths[0]]) == paths
+
+def test_analyze_host_matches_single_run():
+    _, paths = _roots(1)
+    path, rows, elapsed, error = _analyze_host(paths[0], False)
+    assert error is None and elapsed >= 0
+    assert rows == collect_issues(parse_nginx_config(paths[0]))
+    _, rows, _, error = _analyze_host(paths[0] + ".missing", False)
+    assert rows is None and error
+
+def test_fleet_report_counts_hosts_once():
+    report = FleetReport()
+    report.add("h1", [("empty_block", "server"), ("empty_block", "server"), ("unused_variable", "$x")])
+    report.add("h2", [("empty_block", "server")])
+    assert report.rows() == [("empty_block", "server", 2), ("unused_variable", "$x", 1)]
+    assert report.analyzed == 2
+
+def test_fleet_rejects_watch():
+    root, _ = _roots(2)
+    result = runner.invoke(app, ["analyze", "--fleet", "--watch", os.path.join(root, "*", "nginx.conf"), "--no-cache"])
+    assert result.exit_code == 2 and "--watch" in result.output
@@ -1,19 +1,387 @@
+import asyncio
+import os
+import socket
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import typer
+from rich.console import Console
 from typer.testing import CliRunner
 from commands.cli import app
+from upstream_checker.checker import check_upstreams, default_concurrency, parse_server, parse_time
+from upstream_checker.dns import CachingResolver, StaticResolver, SystemResolver
+from upstream_checker.http import _host_header, check_upstreams_http, parse_expect, percentile
+from upstream_checker.monitor import DOWN, FAILING, UNRESOLVED, UP, Monitor
 import pytest
 
 runner = CliRunner()
 
+@contextmanager
+def _listener(backlog=128):
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(backlog)
+    try:
+        yield f"127.0.0.1:{sock.getsockname()[1]}"
+    finally:
+        sock.close()
+
+@contextmanager
+def _blackhole():
+    # Очередь accept переполнена: новые соединения не устанавливаются до таймаута
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(0)
+    address = sock.getsockname()
+    filler = []
+    try:
+        for _ in range(4):
+            s = socket.socket()
+            s.setblocking(False)
+            s.connect_ex(address)
+            filler.append(s)
+        yield f"127.0.0.1:{address[1]}"
+    finally:
+        for s in filler:
+            s.close()
+        sock.close()
+
+def _closed_port():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return f"127.0.0.1:{port}"
+
+class _Health(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    connections = 0
+
+    def setup(self):
+        type(self).connections += 1
+        super().setup()
+
+    def do_GET(self):
+        if self.path == "/chunked":
+            self.send_response(200)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            self.wfile.write(b"2\r\nok\r\n0\r\n\r\n")
+            return
+        body = b"ok" if self.path == "/healthz" else b"down"
+        self.send_response(200 if self.path == "/healthz" else 503)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@contextmanager
+def _http_server():
+    _Health.connections = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Health)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    try:
+        yield f"127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
 def test_health(monkeypatch):
     # Мокаем парсер и чекер
     from commands import health as health_mod
-    monkeypatch.setattr(health_mod, "parse_nginx_config", lambda path: type("T", (), {"get_upstreams": lambda self: {"test_up": ["127.0.0.1:9999", "badhost:80"]}})())
-    monkeypatch.setattr(health_mod, "check_upstreams", lambda ups, timeout, retries: {"test_up": [{"address": "127.0.0.1:9999", "healthy": True}, {"address": "badhost:80", "healthy": False}]})
+    monkeypatch.setattr(health_mod, "parse_nginx_config", lambda path, use_cache, jobs: type("T", (), {"get_upstreams": lambda self: {"test_up": ["127.0.0.1:9999", "badhost:80"]}})())
+    monkeypatch.setattr(health_mod, "check_upstreams", lambda ups, timeout, retries, concurrency, resolver: {"test_up": [{"address": "127.0.0.1:9999", "healthy": True}, {"address": "badhost:80", "healthy": False}]})
     result = runner.invoke(app, ["health", "nginx.conf"])
     assert "test_up" in result.output
     assert "127.0.0.1:9999" in result.output
     assert "Healthy" in result.output
     assert "badhost:80" in result.output
     assert "Unhealthy" in result.output
-    assert result.exit_code == 0 
\ No newline at end of file
+    assert result.exit_code == 0
+
+def test_parse_server_params():
+    srv = parse_server("backend1:8080 weight=5 max_fails=3 fail_timeout=1m30s backup")
+    assert (srv["host"], srv["port"], srv["weight"], srv["max_fails"]) == ("backend1", 8080, 5, 3)
+    assert srv["fail_timeout"] == 90 and srv["backup"] and not srv["down"]
+    assert parse_server("10.0.0.1")["port"] == 80
+    v6 = parse_server("[::1]:81 down")
+    assert (v6["host"], v6["port"], v6["down"]) == ("::1", 81, True)
+    assert parse_server("unix:/run/app.sock")["unix"] == "/run/app.sock"
+    assert parse_time("500ms") == 0.5
+
+def test_check_upstreams_tcp_and_unix():
+    with _listener() as up, tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "app.sock")
+        unix = socket.socket(socket.AF_UNIX)
+        unix.bind(path)
+        unix.listen(16)
+        closed = _closed_port()
+        try:
+            res = check_upstreams({"api": [up + " weight=2", closed + " max_fails=2", f"unix:{path}", "10.0.0.9:80 down", "x:y"]},
+                                  timeout=1, retries=2)
+        finally:
+            unix.close()
+    api = res["api"]
+    assert [s["address"] for s in api] == [up, closed, f"unix:{path}", "10.0.0.9:80", "x:y"]
+    assert api[0]["healthy"] and api[0]["latency"] is not None and api[0]["weight"] == 2
+    assert not api[1]["healthy"] and api[1]["attempts"] == 2 and api[1]["error"]
+    assert api[2]["healthy"]
+    assert not api[3]["healthy"] and api[3]["attempts"] == 0
+    assert not api[4]["healthy"] and "server" in api[4]["error"]
+
+def test_check_upstreams_concurrent_timeouts():
+    with _blackhole() as hole:
+        start = time.monotonic()
+        res = check_upstreams({"slow": [hole] * 200}, timeout=0.3, retries=1)
+        elapsed = time.monotonic() - start
+    assert all(not s["healthy"] and "таймаут" in s["error"] for s in res["slow"])
+    # Все соединения ждут одновременно: около одного таймаута, а не 200
+    assert elapsed < 3
+
+def test_default_concurrency_only_reads_fd_limit():
+    resource = pytest.importorskip("resource")
+    before = resource.getrlimit(resource.RLIMIT_NOFILE)
+    soft = min(before[0], 512)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (soft, before[1]))
+    try:
+        assert default_concurrency() == soft - 64
+        assert resource.getrlimit(resource.RLIMIT_NOFILE) == (soft, before[1])
+    finally:
+        resource.setrlimit(resource.RLIMIT_NOFILE, before)
+
+def test_resolver_cache_ttl_and_dedup():
+    now = [0.0]
+    stub = StaticResolver({"api.internal": ["10.0.0.1", "10.0.0.2"]}, ttl=30, delay=0.01)
+    resolver = CachingResolver(stub, clock=lambda: now[0])
+
+    async def run():
+        first = await asyncio.gather(*(resolver.resolve("api.internal") for _ in range(10)))
+        cached = await resolver.resolve("api.internal")
+        now[0] = 31
+        expired = await resolver.resolve("api.internal")
+        queries = stub.queries
+        missing = await resolver.resolve_many(["nope.internal", "10.0.0.9"])
+        return first, cached, expired, queries, missing
+
+    first, cached, expired, queries, missing = asyncio.run(run())
+    assert all(r.addresses == ["10.0.0.1", "10.0.0.2"] for r in first)
+    # 10 одновременных запросов, ответ из кэша, запрос после истечения TTL
+    assert cached.cached and not expired.cached and queries == 2
+    assert list(missing) == ["nope.internal"] and missing["nope.internal"].error
+
+def test_resolver_invalid_hostname_is_error():
+    long_label = "a" * 64 + ".example.com"
+    stub = StaticResolver({"broken.internal": ValueError("bad answer")}, delay=0.01)
+    resolver = CachingResolver(stub)
+    system = CachingResolver(SystemResolver(threads=2))
+
+    async def run():
+        waiters = await asyncio.gather(*(resolver.resolve("broken.internal") for _ in range(3)))
+        return waiters, await system.resolve_many(["a..b", long_label])
+
+    try:
+        waiters, invalid = asyncio.run(run())
+    finally:
+        system.close()
+    assert all(r.error == "bad answer" and not r.addresses for r in waiters) and stub.queries == 1
+    assert set(invalid) == {"a..b", long_label}
+    assert all(r.error and not r.addresses for r in invalid.values())
+
+def test_check_upstreams_expands_hostnames():
+    with _listener() as up:
+        port = up.split(":")[1]
+        resolver = CachingResolver(StaticResolver({"app.internal": ["127.0.0.1", "127.0.0.2"]}))
+        res = check_upstreams({"api": [f"app.internal:{port} weight=3", f"gone.internal:{port}"]}, timeout=1, resolver=resolver)
+    a, b, gone = res["api"]
+    assert (a["ip"], b["ip"]) == ("127.0.0.1", "127.0.0.2") and a["name"] == "app.internal"
+    assert a["healthy"] and a["weight"] == 3 and a["resolve_latency"] is not None
+    assert not gone["healthy"] and gone["resolve_error"] and gone["attempts"] == 0 and gone["error"].startswith("DNS")
+
+def test_http_probes_reuse_connections():
+    with _http_server() as up:
+        res = check_upstreams_http({"api": [up, _closed_port()]}, path="/healthz", probes=5, timeout=1)
+        chunked = check_upstreams_http({"api": [up]}, path="/chunked", probes=3, timeout=1)
+    ok, dead = res["api"]
+    assert ok["healthy"] and ok["status"] == 200 and len(ok["latencies"]) == 5
+    assert ok["p50"] <= ok["p95"] <= ok["max"]
+    assert not dead["healthy"] and dead["p50"] is None
+    assert chunked["api"][0]["healthy"]
+    # 5 проб + 3 пробы: по одному keep-alive соединению на запуск
+    assert _Health.connections == 2
+
+def test_http_expected_status():
+    with _http_server() as up:
+        bad = check_upstreams_http({"api": [up]}, path="/fail", retries=2)["api"][0]
+        good = check_upstreams_http({"api": [up]}, path="/fail", expect="200,503")["api"][0]
+    assert not bad["healthy"] and bad["status"] == 503 and bad["error"] == "HTTP 503" and bad["attempts"] == 2
+    assert good["healthy"]
+    assert parse_expect("2xx,404,500-502") == [(200, 299), (404, 404), (500, 502)]
+    assert percentile([3, 1, 2, 4], 50) == 2 and percentile([1.0] * 19 + [9.0], 95) == 1.0
+
+def test_http_tls_sends_host_as_sni(monkeypatch):
+    seen = []
+
+    async def refuse(host, port, **kwargs):
+        seen.append(kwargs.get("server_hostname"))
+        raise ConnectionRefusedError(111, "Connection refused")
+
+    monkeypatch.setattr(asyncio, "open_connection", refuse)
+    check_upstreams_http({"api": ["10.0.0.1:443"]}, tls=True, host="api.example.com:443", timeout=1)
+    check_upstreams_http({"api": ["10.0.0.1:8443"]}, tls=True, timeout=1)
+    check_upstreams_http({"api": ["10.0.0.1:443"]}, timeout=1)
+    assert seen == ["api.example.com", "10.0.0.1", None]
+    assert _host_header(parse_server("app.local:443"), tls=True) == "app.local"
+    assert _host_header(parse_server("app.local:443")) == "app.local:443"
+
+def test_health_http_cli(monkeypatch):
+    from commands import health as health_mod
+    monkeypatch.setattr(health_mod, "console", Console(width=200))
+    with _http_server() as up, tempfile.TemporaryDirectory() as tmp:
+        conf = os.path.join(tmp, "nginx.conf")
+        with open(conf, "w") as f:
+            f.write(f"http {{ upstream api {{ server {up}; server {_closed_port()} backup; }} }}")
+        result = runner.invoke(app, ["health", conf, "--http", "/healthz", "--probes", "3", "--no-cache"])
+    assert result.exit_code == 0, result.output
+    assert "Healthy" in result.output and "Unhealthy" in result.output
+    assert "1/2" in result.output
+
+def test_monitor_tracks_max_fails_and_recovers():
+    with _listener() as up:
+        closed = _closed_port()
+        monitor = Monitor({"api": [up, closed + " max_fails=2 fail_timeout=200ms"]}, interval=0.05, timeout=0.5, seed=1)
+        asyncio.run(monitor.run(duration=0.6))
+    alive, dead = monitor.members
+    assert alive.state == UP and alive.latency is not None and alive.probes > 3
+    assert dead.state == DOWN and dead.consecutive >= 2
+    # Первая удачная проверка сменой состояния не считается
+    assert [(c.address, c.old, c.new) for c in monitor.changes][:2] == [(closed, "unknown", FAILING), (closed, FAILING, DOWN)]
+
+def test_monitor_backoff_and_recovery():
+    healthy = {"value": False}
+
+    async def check(server):
+        return {"healthy": healthy["value"], "latency": 0.001, "error": None if healthy["value"] else "refused"}
+
+    monitor = Monitor({"api": ["10.0.0.1:80 max_fails=1 fail_timeout=0"]}, interval=1, jitter=0, max_backoff=4, check=check)
+    member = monitor.members[0]
+    delays = []
+    for _ in range(5):
+        member.record(False, None, "refused", 0.0)
+        delays.append(monitor.delay(member, 0.0))
+    assert delays == [1, 2, 4, 4, 4]
+    # Сервер, который падает сутками, продолжает проверяться раз в max_backoff
+    member.consecutive = 10 ** 6
+    assert monitor.delay(member, 0.0) == 4
+    monitor = Monitor({"api": ["10.0.0.1:80 max_fails=1 fail_timeout=200ms"]}, interval=0.02, jitter=0.5, check=check)
+
+    async def scenario():
+        task = asyncio.ensure_future(monitor.run())
+        await asyncio.sleep(0.1)
+        assert monitor.members[0].state == DOWN
+        healthy["value"] = True
+        # Недоступный сервер снова проверяется не раньше, чем через fail_timeout
+        await asyncio.sleep(0.4)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert monitor.members[0].state == UP
+    assert [c.new for c in monitor.changes] == [DOWN, UP]
+
+def test_monitor_expands_hostnames():
+    with _listener() as up:
+        port = up.split(":")[1]
+        resolver = CachingResolver(StaticResolver({"app.internal": ["127.0.0.1", "127.0.0.2"]}))
+        monitor = Monitor({"api": [f"app.internal:{port}", "gone.internal:80"]}, interval=0.05, resolver=resolver)
+        asyncio.run(monitor.run(duration=0.2))
+    states = [(m.address, m.state) for m in monitor.members]
+    # Слушатель только на 127.0.0.1: у каждого адреса своё состояние
+    assert states == [(f"app.internal:{port} (127.0.0.1)", UP), (f"app.internal:{port} (127.0.0.2)", DOWN),
+                      ("gone.internal:80", UNRESOLVED)]
+
+def test_monitor_reresolves_names_after_ttl():
+    stub = StaticResolver({"app.internal": ["10.0.0.1", "10.0.0.2"]}, ttl=0.05)
+    checked = []
+
+    async def check(server):
+        checked.append(server["ip"])
+        return {"healthy": True, "latency": 0.001}
+
+    monitor = Monitor({"api": ["app.internal:80", "late.internal:80"]}, interval=0.02,
+                      resolver=CachingResolver(stub, negative_ttl=0.05), check=check)
+
+    async def run():
+        task = asyncio.ensure_future(monitor.run())
+        await asyncio.sleep(0.1)
+        first = {m.server["ip"]: m for m in monitor.members if m.state != UNRESOLVED}
+        assert [m.state for m in monitor.members][-1] == UNRESOLVED
+        stub.records["app.internal"] = ["10.0.0.2", "10.0.0.3"]
+        stub.records["late.internal"] = ["10.0.0.9"]
+        await asyncio.sleep(0.15)
+        del checked[:]
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return first
+
+    first = asyncio.run(run())
+    assert [m.address for m in monitor.members] == ["app.internal:80 (10.0.0.2)", "app.internal:80 (10.0.0.3)",
+                                                     "late.internal:80 (10.0.0.9)"]
+    # Сервер сохранившегося адреса переносится вместе с состоянием, пропавший больше не проверяется
+    assert monitor.members[0] is first["10.0.0.2"] and first["10.0.0.1"].retired
+    assert all(m.state == UP for m in monitor.members)
+    assert "10.0.0.1" not in checked and {"10.0.0.3", "10.0.0.9"} <= set(checked)
+
+def test_health_interval_cli(monkeypatch):
+    from commands import health as health_mod
+    monkeypatch.setattr(health_mod, "console", Console(width=200))
+    with tempfile.TemporaryDirectory() as tmp:
+        conf = os.path.join(tmp, "nginx.conf")
+        closed = _closed_port()
+        with open(conf, "w") as f:
+            f.write(f"http {{ upstream api {{ server {closed} max_fails=1; }} }}")
+        result = runner.invoke(app, ["health", conf, "--interval", "50ms", "--duration", "300ms", "--no-cache"])
+        bad = runner.invoke(app, ["health", conf, "--interval", "5x", "--no-cache"])
+    assert result.exit_code == 0, result.output
+    assert closed in result.output and "down" in result.output
+    assert bad.exit_code == 2
+
+def test_health_validates_options_before_parsing(monkeypatch):
+    from commands import health as health_mod
+    monkeypatch.setattr(health_mod, "parse_nginx_config", lambda path, use_cache, jobs: pytest.fail("конфиг разобран"))
+    monkeypatch.setattr(health_mod, "raise_fd_limit", lambda: pytest.fail("лимит изменён"))
+    for args in (["--expect", "2zz"], ["--interval", "5x"], ["--interval", "0s"], ["--metrics-port", "9113"]):
+        result = runner.invoke(app, ["health", "nginx.conf", *args])
+        assert result.exit_code == 2, (args, result.output)
+
+def test_health_closes_resolver(monkeypatch):
+    from commands import health as health_mod
+    closed = []
+
+    class Resolver(CachingResolver):
+        def close(self):
+            closed.append(self)
+            super().close()
+
+    monkeypatch.setattr(health_mod, "CachingResolver", Resolver)
+    monkeypatch.setattr(health_mod, "check_upstreams", lambda ups, timeout, retries, concurrency, resolver: 1 / 0)
+    with tempfile.TemporaryDirectory() as tmp:
+        conf = os.path.join(tmp, "nginx.conf")
+        with open(conf, "w") as f:
+            f.write(f"http {{ upstream api {{ server {_closed_port()}; }} }}")
+        result = runner.invoke(app, ["health", conf, "--no-cache"])
+    # Пул резолвера закрывается и тогда, когда проверка прервалась исключением
+    assert isinstance(result.exception, ZeroDivisionError) and len(closed) == 1
+
+def test_health_metrics_port_busy():
+    with _listener() as busy, tempfile.TemporaryDirectory() as tmp:
+        conf = os.path.join(tmp, "nginx.conf")
+        with open(conf, "w") as f:
+            f.write(f"http {{ upstream api {{ server {_closed_port()}; }} }}")
+        result = runner.invoke(app, ["health", conf, "--interval", "1s", "--metrics-port", busy.split(":")[1], "--no-cache"])
+    assert result.exit_code == 2 and "--metrics-port" in result.output
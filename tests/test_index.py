@@ -0,0 +1,53 @@
+import os
+import tempfile
+from parser.nginx_parser import parse_nginx_config
+from analyzer.route import find_route
+
+def _write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+def test_tree_queries_use_indexes():
+    with tempfile.TemporaryDirectory() as d:
+        main_path = os.path.join(d, "nginx.conf")
+        site = os.path.join(d, "site.conf")
+        _write(main_path, "http {\n    proxy_pass http://top;\n    include site.conf;\n    server { listen 81; }\n}\n")
+        _write(site, "server {\n    listen 80;\n    server_name a.com;\n    location /api {\n        location /api/v2 { proxy_pass http://v2; }\n        proxy_pass http://api;\n    }\n}\n")
+        tree = parse_nginx_config(main_path)
+        first, second = tree.servers()
+        assert [d["args"] for d in tree.find("listen")] == ["80", "81"]
+        assert [d["args"] for d in tree.find("listen", within=second)] == ["81"]
+        assert [d["args"] for d in tree.find("proxy_pass", within=first)] == ["http://v2", "http://api"]
+        assert tree.find("proxy_pass", within=second) == []
+        outer, inner = tree.locations(first)
+        assert tree.locations(second) == []
+        assert tree.parent(inner) is outer
+        v2 = tree.find("proxy_pass", within=inner)[0]
+        assert [b.name for b in tree.ancestors(v2)] == ["location", "location", "server", "http"]
+        assert tree.ancestors(v2)[2] is first
+        assert [n.name for n in tree.nodes_in_file(site)][:2] == ["server", "listen"]
+        assert tree.blocks("http")[0] is tree.directives[0]
+        assert tree.find("nonexistent") == []
+
+def test_find_route_with_indexes():
+    with tempfile.TemporaryDirectory() as d:
+        main_path = os.path.join(d, "nginx.conf")
+        _write(main_path, """
+        server { listen 80; server_name other.com; location / { proxy_pass http://other; } }
+        server {
+            listen 80;
+            server_name example.com;
+            location / { proxy_pass http://root; }
+            location /api { proxy_pass http://api; }
+        }
+        """)
+        tree = parse_nginx_config(main_path)
+        res = find_route(tree, "http://example.com/api/v1")
+        assert res["server"] is tree.servers()[1]
+        assert res["location"].arg == "/api"
+        assert res["proxy_pass"] == "http://api"
+        assert res["server_match"] == "exact"
+        # Незнакомое имя — первый server на сокете *:80, как в nginx
+        res = find_route(tree, "http://unknown.com/")
+        assert res["server"] is tree.servers()[0] and res["server_match"] == "default"
+        assert find_route(tree, "http://example.com:8080/") is None
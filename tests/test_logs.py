@@ -0,0 +1,60 @@
+import gzip
+import io
+import os
+import tempfile
+from typer.testing import CliRunner
+from commands.cli import app
+from analyzer.logs import TopCounter, analyze_log, read_lines
+
+runner = CliRunner()
+
+LINES = [
+    '10.0.0.1 - - [10/Oct/2026:13:55:36 +0000] "GET /index.html HTTP/1.1" 200 612 "-" "curl/8.0"',
+    '10.0.0.2 - - [10/Oct/2026:13:55:37 +0000] "GET /missing HTTP/1.1" 404 153 "-" "Mozilla/5.0"',
+    '10.0.0.2 - - [10/Oct/2026:13:55:38 +0000] "POST /api HTTP/1.1" 500 0 "-" "Mozilla/5.0"',
+    '10.0.0.1 - - [10/Oct/2026:13:55:39 +0000] "GET /missing HTTP/1.1" 404 153 "-" "curl/8.0"',
+    'garbage line',
+]
+
+def test_read_lines_across_chunks():
+    data = b"first\nsecond line\n\nlast-without-newline"
+    assert list(read_lines(io.BytesIO(data), chunk_size=4)) == [b"first", b"second line", b"", b"last-without-newline"]
+
+def test_analyze_log_counts():
+    stats = analyze_log(io.BytesIO("\n".join(LINES * 3).encode()), chunk_size=64)
+    assert stats.lines == 15 and stats.matched == 12
+    assert stats.statuses[b"404"] == 6 and stats.statuses[b"200"] == 3
+    assert stats.paths.most_common(1) == [(b"/missing", 6)]
+    assert stats.ips.most_common(2) == [(b"10.0.0.1", 6), (b"10.0.0.2", 6)]
+    assert stats.user_agents.counts == {b"curl/8.0": 6, b"Mozilla/5.0": 6}
+    assert stats.errors[b"500"].most_common(1) == [(b"/api", 3)]
+    assert not stats.approximate
+
+def test_top_counter_is_bounded():
+    counter = TopCounter(capacity=10)
+    for i in range(10000):
+        counter.add(b"hot")
+        counter.add(str(i).encode())
+    assert len(counter) <= 20 and counter.approximate
+    assert counter.most_common(1) == [(b"hot", 10000)]
+
+def test_logs_cli_plain_and_gzip():
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = os.path.join(tmp, "access.log")
+        with open(plain, "w") as f:
+            f.write("\n".join(LINES) + "\n")
+        packed = plain + ".1.gz"
+        with gzip.open(packed, "wt") as f:
+            f.write("\n".join(LINES) + "\n")
+        for path in (plain, packed):
+            result = runner.invoke(app, ["logs", path])
+            assert result.exit_code == 0, result.output
+            assert "Top 404 Paths" in result.output and "/missing" in result.output
+            assert "Mozilla/5.0" in result.output and "Строк: 5" in result.output
+
+def test_analyze_log_bounded_keys():
+    lines = [f'10.0.{i // 256 % 256}.{i % 256} - - [10/Oct/2026:13:55:36 +0000] "GET /p{i} HTTP/1.1" 404 0' for i in range(5000)]
+    lines += [LINES[1]] * 100
+    stats = analyze_log(io.BytesIO("\n".join(lines).encode()), capacity=50)
+    assert stats.approximate and len(stats.paths) <= 100 and len(stats.errors[b"404"]) <= 100
+    assert stats.paths.most_common(1) == [(b"/missing", 100)]
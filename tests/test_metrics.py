@@ -0,0 +1,91 @@
+import os
+import socket
+import tempfile
+import urllib.request
+from typer.testing import CliRunner
+from commands.cli import app
+from exporter.prometheus import HealthMetrics, MetricsServer, write_textfile
+
+runner = CliRunner()
+
+def test_render_member_and_upstream_metrics():
+    metrics = HealthMetrics(buckets=(0.01, 0.1))
+    metrics.observe("api", "10.0.0.1:80", True, 0.005)
+    metrics.observe("api", "10.0.0.1:80", True, 0.05)
+    metrics.observe("api", "10.0.0.1:80", True, 3.0)
+    metrics.observe("api", 'we"ird:80', False)
+    metrics.observe("api", 'we"ird:80', False)
+    text = metrics.render().decode()
+    assert 'nginx_lens_upstream_member_up{upstream="api",server="10.0.0.1:80"} 1\n' in text
+    assert 'nginx_lens_upstream_member_up{upstream="api",server="we\\"ird:80"} 0\n' in text
+    assert 'nginx_lens_upstream_member_consecutive_failures{upstream="api",server="we\\"ird:80"} 2\n' in text
+    assert 'nginx_lens_upstream_member_latency_seconds{upstream="api",server="10.0.0.1:80"} 3.0\n' in text
+    # Корзины накопительные, +Inf — все удачные проверки
+    for le, n in (("0.01", 1), ("0.1", 2), ("+Inf", 3)):
+        assert f'nginx_lens_upstream_member_probe_latency_seconds_bucket{{upstream="api",server="10.0.0.1:80",le="{le}"}} {n}\n' in text
+    assert 'nginx_lens_upstream_members{upstream="api"} 2\n' in text
+    assert 'nginx_lens_upstream_members_up{upstream="api"} 1\n' in text
+    assert "# TYPE nginx_lens_upstream_probes_total counter" in text and not text.endswith("# EOF\n")
+    openmetrics = metrics.render(openmetrics=True).decode()
+    assert openmetrics.endswith("# EOF\n") and "# TYPE nginx_lens_upstream_probes counter" in openmetrics
+
+def test_render_is_incremental():
+    metrics = HealthMetrics()
+    for i in range(100):
+        metrics.observe("api", f"10.0.0.{i}:80", True, 0.01)
+    first = metrics.render()
+    assert metrics.rendered == 100
+    assert metrics.render() is first
+    metrics.observe("api", "10.0.0.7:80", False)
+    second = metrics.render().decode()
+    # Пересобраны строки только проверенного сервера
+    assert metrics.rendered == 101
+    assert 'server="10.0.0.7:80"} 0\n' in second and second.count("\n") == first.decode().count("\n")
+
+def test_textfile_and_http_endpoint():
+    metrics = HealthMetrics()
+    metrics.observe("api", "10.0.0.1:80", True, 0.01)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "nginx_lens.prom")
+        write_textfile(path, metrics)
+        with open(path, "rb") as f:
+            assert f.read() == metrics.render()
+        assert os.listdir(tmp) == ["nginx_lens.prom"]
+    server = MetricsServer(metrics, 0, "127.0.0.1").start()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as resp:
+            assert resp.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert b"nginx_lens_upstream_member_up" in resp.read()
+        req = urllib.request.Request(url, headers={"Accept": "application/openmetrics-text"})
+        with urllib.request.urlopen(req) as resp:
+            assert resp.read().endswith(b"# EOF\n")
+    finally:
+        server.stop()
+
+def test_health_metrics_file_cli():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(8)
+    up = f"127.0.0.1:{sock.getsockname()[1]}"
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            conf = os.path.join(tmp, "nginx.conf")
+            prom = os.path.join(tmp, "health.prom")
+            with open(conf, "w") as f:
+                f.write(f"http {{ upstream api {{ server {up}; }} }}")
+            result = runner.invoke(app, ["health", conf, "--metrics-file", prom, "--no-cache"])
+            assert result.exit_code == 0, result.output
+            with open(prom) as f:
+                assert f'nginx_lens_upstream_member_up{{upstream="api",server="{up}"}} 1\n' in f.read()
+            monitored = runner.invoke(app, ["health", conf, "--interval", "50ms", "--duration", "200ms",
+                                            "--metrics-file", prom, "--no-cache"])
+            assert monitored.exit_code == 0, monitored.output
+            with open(prom) as f:
+                text = f.read()
+            assert f'nginx_lens_upstream_member_up{{upstream="api",server="{up}"}} 1\n' in text
+            assert "nginx_lens_upstream_probes_total 1\n" not in text
+            bad = runner.invoke(app, ["health", conf, "--metrics-port", "9113", "--no-cache"])
+            assert bad.exit_code == 2
+    finally:
+        sock.close()
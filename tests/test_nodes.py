@@ -0,0 +1,39 @@
+import tempfile
+import os
+from parser.nginx_parser import parse_nginx_config
+from parser.nodes import Directive, Block, Upstream, pack_nodes, unpack_nodes
+
+def test_nodes_are_slotted_and_dict_compatible():
+    conf = """
+    upstream backend { server 10.0.0.1:80 weight=5; server 10.0.0.2:80; }
+    server {
+        listen 80;
+        location /api { proxy_pass http://backend; }
+    }
+    """
+    with tempfile.NamedTemporaryFile("w+", delete=False) as f:
+        f.write(conf)
+        f.flush()
+        tree = parse_nginx_config(f.name)
+    up, server = tree.directives
+    assert isinstance(up, Upstream) and isinstance(server, Block)
+    assert not hasattr(server, '__dict__')
+    # Старый dict-доступ
+    assert up['upstream'] == 'backend' and up.get('block') == 'upstream'
+    assert up['servers'] == ['10.0.0.1:80 weight=5', '10.0.0.2:80']
+    assert 'directives' in server and 'directive' not in server
+    listen = server['directives'][0]
+    assert isinstance(listen, Directive)
+    assert listen.get('directive') == 'listen' and listen.get('args', '') == '80'
+    assert listen.get('block') is None
+    assert server['directives'][1]['arg'] == '/api'
+    # Новое представление: кортежи аргументов и интернированные строки
+    assert up.directives[0].args == ('10.0.0.1:80', 'weight=5')
+    assert listen.file is server.file
+    assert listen.to_dict() == {'directive': 'listen', 'args': '80', '__file__': f.name, '__span__': listen.span}
+    os.unlink(f.name)
+
+def test_pack_roundtrip():
+    block = Block('server', (), [Directive('listen', ('80', 'default_server'), 'a.conf', (2, 5, 2, 28))], 'a.conf', (1, 1, 3, 1))
+    restored = unpack_nodes(pack_nodes([block]), 'a.conf')
+    assert restored == [block]
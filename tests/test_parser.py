@@ -59,4 +59,94 @@ def test_nested_blocks_and_comments():
     ups = tree.get_upstreams()
     assert "u1" in ups
     assert ups["u1"] == ["1.1.1.1:80"]
-    os.unlink(f.name) 
\ No newline at end of file
+    os.unlink(f.name) 
+
+def test_braces_and_semicolons_on_one_line_and_split():
+    conf = """http { server { listen 80; location /a { return 200; } }
+    }
+    server
+    {
+        listen
+            8080
+        ;
+        location ~ ^/img/ {
+            root /var/www;
+        }
+    }
+    """
+    with tempfile.NamedTemporaryFile("w+", delete=False) as f:
+        f.write(conf)
+        f.flush()
+        tree = parse_nginx_config(f.name)
+    http, server = tree.directives
+    assert http['block'] == 'http'
+    inner = http['directives'][0]
+    assert inner['block'] == 'server'
+    assert inner['directives'][0] == {'directive': 'listen', 'args': '80', '__file__': f.name, '__span__': (1, 17, 1, 26)}
+    assert inner['directives'][1]['block'] == 'location'
+    assert inner['directives'][1]['directives'][0]['args'] == '200'
+    assert server['directives'][0]['args'] == '8080'
+    assert server['directives'][0]['__span__'] == (5, 9, 7, 9)
+    assert server['directives'][1]['arg'] == '~ ^/img/'
+    assert server['__span__'] == (3, 5, 11, 5)
+    os.unlink(f.name)
+
+def test_quoted_strings_and_hash_inside_tokens():
+    conf = """
+    add_header X-Test "a; b { c } # d";
+    set $x http://host/path#frag; # comment
+    """
+    with tempfile.NamedTemporaryFile("w+", delete=False) as f:
+        f.write(conf)
+        f.flush()
+        tree = parse_nginx_config(f.name)
+    header, var = tree.directives
+    assert header['directive'] == 'add_header'
+    assert header['args'] == 'X-Test "a; b { c } # d"'
+    assert var['args'] == '$x http://host/path#frag'
+    os.unlink(f.name)
+
+def test_parallel_include_keeps_serial_order():
+    with tempfile.TemporaryDirectory() as d:
+        os.makedirs(os.path.join(d, "sites"))
+        for i in range(6):
+            with open(os.path.join(d, "sites", f"s{i}.conf"), "w") as f:
+                f.write(f"upstream u{i % 2} {{ server 10.0.0.{i}:80; }}\nserver {{ server_name s{i}; }}\n")
+        main_path = os.path.join(d, "nginx.conf")
+        with open(main_path, "w") as f:
+            f.write("http { include sites/*.conf; }\n")
+        serial = parse_nginx_config(main_path)
+        parallel = parse_nginx_config(main_path, jobs=3)
+        assert parallel.directives == serial.directives
+        assert parallel.get_upstreams() == serial.get_upstreams()
+        assert list(parallel.get_upstreams()) == ["u0", "u1"]
+        assert parallel.get_upstreams()["u0"] == ["10.0.0.0:80", "10.0.0.2:80", "10.0.0.4:80"]
+
+def test_lazy_includes_are_parsed_on_walk():
+    from analyzer.base import Analyzer
+    from parser.nodes import LazyInclude
+    with tempfile.TemporaryDirectory() as d:
+        os.makedirs(os.path.join(d, "sites"))
+        for i in range(3):
+            with open(os.path.join(d, "sites", f"s{i}.conf"), "w") as f:
+                f.write(f"server {{ server_name s{i}; location / {{ proxy_pass http://u{i}; }} }}\n")
+        with open(os.path.join(d, "up.conf"), "w") as f:
+            f.write("upstream u0 { server 10.0.0.1:80; }\n")
+        main_path = os.path.join(d, "nginx.conf")
+        with open(main_path, "w") as f:
+            f.write("http { include up.conf; include sites/*.conf; }\n")
+        eager = parse_nginx_config(main_path)
+        lazy = parse_nginx_config(main_path, lazy=True)
+        http = lazy.directives[0]
+        up_inc, sites_inc = http.directives
+        assert isinstance(sites_inc, LazyInclude) and not sites_inc.loaded
+        # Первый server — разобран только первый файл из glob
+        first_server = next(d for d, _ in Analyzer(lazy).walk() if d.get('block') == 'server')
+        assert first_server['directives'][0]['args'] == 's0'
+        per_file = sites_inc.directives
+        assert [f.loaded for f in per_file] == [True, False, False]
+        # Полный обход совпадает с обычным разбором, родители — настоящие блоки
+        walked = [(d.to_dict(), p.get('block') if p else None) for d, p in Analyzer(lazy).walk()]
+        expected = [(d.to_dict(), p.get('block') if p else None) for d, p in Analyzer(eager).walk()]
+        assert walked == expected
+        assert lazy.get_upstreams() == eager.get_upstreams() == {"u0": ["10.0.0.1:80"]}
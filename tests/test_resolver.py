@@ -0,0 +1,83 @@
+import glob
+import os
+import tempfile
+from parser.nginx_parser import parse_nginx_config
+from parser.resolver import IncludeResolver
+from typer.testing import CliRunner
+from commands.cli import app
+from analyzer.include import build_include_tree, find_include_cycles
+
+def _write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+def _make_tree(d):
+    os.makedirs(os.path.join(d, "sites"))
+    main_path = os.path.join(d, "nginx.conf")
+    _write(main_path, "http {\n    include sites/*.conf;\n}\n")
+    _write(os.path.join(d, "sites", "a.conf"), "server { listen 80; include ../snippet.inc; }\n")
+    _write(os.path.join(d, "sites", "b.conf"), "server { listen 81; include ../snippet.inc; }\n")
+    _write(os.path.join(d, "snippet.inc"), "add_header X-Frame-Options DENY;\n")
+    return main_path
+
+def test_files_are_read_once_for_parser_and_include_tree():
+    with tempfile.TemporaryDirectory() as d:
+        main_path = _make_tree(d)
+        resolver = IncludeResolver()
+        tree = parse_nginx_config(main_path, resolver=resolver)
+        inc_tree = build_include_tree(main_path, resolver=resolver)
+        parse_nginx_config(main_path, resolver=resolver, lazy=True)
+        # 4 файла, каждый прочитан ровно один раз
+        assert resolver.reads == 4
+        assert tree.directives == parse_nginx_config(main_path).directives
+        a, b = inc_tree[os.path.abspath(main_path)]
+        assert list(a) == [os.path.join(d, "sites", "a.conf")]
+        snippet = os.path.join(d, "snippet.inc")
+        assert resolver.graph() == {
+            os.path.abspath(main_path): [os.path.join(d, "sites", "a.conf"), os.path.join(d, "sites", "b.conf")],
+            os.path.join(d, "sites", "a.conf"): [snippet],
+            os.path.join(d, "sites", "b.conf"): [snippet],
+        }
+        assert resolver.cycles() == []
+
+def test_include_cycles_from_graph_and_tree():
+    with tempfile.TemporaryDirectory() as d:
+        a = os.path.join(d, "a.conf")
+        b = os.path.join(d, "b.conf")
+        _write(a, "http {\n    include b.conf;\n}\n")
+        _write(b, "include a.conf;\nserver_tokens off;\n")
+        resolver = IncludeResolver()
+        tree = parse_nginx_config(a, resolver=resolver)
+        # Парсер пропускает include, замыкающий цикл
+        assert tree.directives[0]["directives"][0]["directive"] == "server_tokens"
+        assert resolver.cycles() == [[a, b, a]]
+        assert find_include_cycles(build_include_tree(a, resolver=resolver)) == [[a, b, a]]
+
+def test_include_tree_command_reports_cycles():
+    with tempfile.TemporaryDirectory() as d:
+        a = os.path.join(d, "a.conf")
+        b = os.path.join(d, "b.conf")
+        _write(a, "http {\n    include b.conf;\n}\n")
+        _write(b, "include a.conf;\n")
+        result = CliRunner().invoke(app, ["include-tree", a])
+        assert result.exit_code == 0, result.output
+        assert "Обнаружены циклы include-ов" in result.output
+        cycles = result.output.split("Обнаружены циклы include-ов:", 1)[1].split()
+        assert " ".join(cycles) == f"{a} -> {b} -> {a}"
+
+def test_roots_are_files_nobody_includes():
+    with tempfile.TemporaryDirectory() as d:
+        main_path = _make_tree(d)
+        _write(os.path.join(d, "standalone.conf"), "http { server { listen 82; } }\n")
+        _write(os.path.join(d, "loop1.conf"), "include loop2.conf;\n")
+        _write(os.path.join(d, "loop2.conf"), "include loop1.conf;\n")
+        files = sorted(glob.glob(os.path.join(d, "**", "*.conf"), recursive=True))
+        resolver = IncludeResolver()
+        roots = resolver.roots(files)
+        assert roots == [os.path.join(d, "nginx.conf"), os.path.join(d, "standalone.conf"), os.path.join(d, "loop1.conf")]
+        for root in roots:
+            parse_nginx_config(root, resolver=resolver)
+        # Каждый файл прочитан один раз: 4 файла дерева nginx.conf, standalone и два файла цикла
+        assert resolver.reads == 7
+        tree = parse_nginx_config(main_path, resolver=resolver)
+        assert [s.file for s in tree.servers()] == [os.path.join(d, "sites", "a.conf"), os.path.join(d, "sites", "b.conf")]
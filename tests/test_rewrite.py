@@ -0,0 +1,53 @@
+import tempfile
+from parser.nginx_parser import parse_nginx_config
+from analyzer.rewrite import find_rewrite_issues, compile_pattern, backtracking_risk
+
+CONF = """
+http {
+    server {
+        listen 80;
+        rewrite ^/start$ /a/1 last;
+        location /a/ { rewrite ^/a/(\\d+)$ /b/$1 last; }
+        location /b/ { rewrite ^/b/(?<id>\\d+)$ /a/$id last; }
+        location /c/ { rewrite ^/c/(.*)$ /c/$1 last; }
+        location /d/ { rewrite ^/d/(.*)$ /d/$1 redirect; rewrite ^/d/x$ /d/y break; }
+        location /e/ { rewrite ^/e/x$ /php/index.php last; }
+        location ~ \\.php$ { rewrite ^/php/(.*)$ /e/x last; }
+        location /f/ { rewrite ^/f/((a+)+)$ /g permanent; }
+    }
+    server {
+        listen 81;
+        location /b/ { rewrite ^/b/(\\d+)$ /done last; }
+    }
+}
+"""
+
+def _issues():
+    with tempfile.NamedTemporaryFile("w+", suffix=".conf", delete=False) as f:
+        f.write(CONF)
+        f.flush()
+        return find_rewrite_issues(parse_nginx_config(f.name))
+
+def test_multi_hop_and_self_loops():
+    cycles = [i['value'] for i in _issues() if i['type'] == 'rewrite_cycle']
+    assert cycles == [
+        '^/a/(\\d+)$ /b/$1 last → ^/b/(?<id>\\d+)$ /a/$id last',
+        '^/c/(.*)$ /c/$1 last',
+        # Переход через regex-location, который выигрывает у префикса
+        '^/e/x$ /php/index.php last → ^/php/(.*)$ /e/x last',
+    ]
+
+def test_redirect_and_break_do_not_loop():
+    assert not any('/d/' in i['value'] for i in _issues() if i['type'] == 'rewrite_cycle')
+
+def test_backtracking_risk():
+    redos = [i['value'] for i in _issues() if i['type'] == 'rewrite_redos']
+    assert len(redos) == 1 and redos[0].startswith('^/f/((a+)+)$')
+    assert backtracking_risk('^/(.*)/(.*)$') is None
+    assert backtracking_risk('^(\\w+\\s?)*$')
+
+def test_compile_pattern_translates_and_caches():
+    regex = compile_pattern('^/u/(?<name>\\w+)$')
+    assert regex.match('/u/bob').group('name') == 'bob'
+    assert compile_pattern('^/u/(?<name>\\w+)$') is regex
+    assert compile_pattern('^/(unclosed') is None
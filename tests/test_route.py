@@ -0,0 +1,129 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from typer.testing import CliRunner
+from commands.cli import app
+from parser.nginx_parser import parse_nginx_config
+from analyzer.route import RoutingTable, RouteResolver, ROW_FIELDS, find_route
+
+runner = CliRunner()
+
+CONF = """
+http {
+    server { listen 80; server_name first.com; }
+    server { listen 80 default_server; server_name fallback.com; }
+    server { listen 80; server_name *.example.com; }
+    server { listen 80; server_name *.api.example.com; }
+    server { listen 80; server_name mail.*; }
+    server { listen 80; server_name .org.net; }
+    server { listen 80; server_name ~^(?<user>\\w+)\\.users\\.com$ ~^www\\d+\\.; }
+    server {
+        listen 8080;
+        server_name app;
+        location = / { }
+        location / { }
+        location ^~ /static/ { }
+        location /images/ {
+            location /images/icons/ { }
+            location ~ \\.svg$ { }
+        }
+        location ~* \\.(png|jpg)$ { }
+        location ~ \\.php$ { }
+        location /php/ { }
+    }
+}
+"""
+
+def _table():
+    with tempfile.NamedTemporaryFile("w+", suffix=".conf", delete=False) as f:
+        f.write(CONF)
+        f.flush()
+        tree = parse_nginx_config(f.name)
+    return tree, RoutingTable(tree)
+
+def test_server_name_resolution_order():
+    tree, table = _table()
+    def name(host):
+        server, how = table.select_server(host, '80')
+        return tree.find('server_name', within=server)[0]['args'], how
+    assert name('first.com') == ('first.com', 'exact')
+    assert name('a.api.example.com') == ('*.api.example.com', 'wildcard')
+    assert name('www.example.com') == ('*.example.com', 'wildcard')
+    assert name('example.com')[1] == 'default'
+    assert name('mail.corp.io') == ('mail.*', 'wildcard')
+    assert name('org.net') == ('.org.net', 'exact')
+    assert name('x.org.net') == ('.org.net', 'wildcard')
+    assert name('bob.users.com')[1] == 'regex'
+    assert name('WWW7.shop.io')[1] == 'regex'
+    # Имя не подошло — default_server сокета, а не первый server
+    assert name('unknown.io') == ('fallback.com', 'default')
+    assert table.select_server('app', '9999') == (None, '')
+
+def test_location_algorithm():
+    tree, table = _table()
+    def loc(path):
+        found = table.lookup(f"http://app:8080{path}")['location']
+        return found.arg if found is not None else None
+    assert loc('/') == '= /'
+    assert loc('/index.html') == '/'
+    # ^~ останавливает проверку regex
+    assert loc('/static/logo.png') == '^~ /static/'
+    # regex выигрывает у обычного префикса
+    assert loc('/php/index.php') == '~ \\.php$'
+    assert loc('/php/readme') == '/php/'
+    # вложенные location-ы: префикс, regex внутри, затем regex уровня server
+    assert loc('/images/icons/a.gif') == '/images/icons/'
+    assert loc('/images/icons/a.svg') == '~ \\.svg$'
+    assert loc('/images/a.PNG') == '~* \\.(png|jpg)$'
+
+def test_find_route_reuses_table():
+    tree, table = _table()
+    res = find_route(tree, 'http://x.org.net/', table=table)
+    assert res['server_match'] == 'wildcard' and res['location'] is None
+
+def test_find_route_takes_proxy_pass_from_if():
+    with tempfile.NamedTemporaryFile("w+", suffix=".conf", delete=False) as f:
+        f.write("http { server { listen 80; server_name a.com;"
+                " location /api { if ($http_x_canary) { proxy_pass http://canary; } }"
+                " location /app { proxy_pass http://app; if ($arg_debug) { proxy_pass http://debug; } } } }")
+        f.flush()
+        tree = parse_nginx_config(f.name)
+    res = find_route(tree, 'http://a.com/api/users')
+    assert res['proxy_pass'] == 'http://canary' and res['proxy_pass_if'] == '($http_x_canary)'
+    res = find_route(tree, 'http://a.com/app')
+    assert res['proxy_pass'] == 'http://app' and res['proxy_pass_if'] is None
+
+def test_resolver_rows_prefer_name_match_across_configs():
+    first = tempfile.NamedTemporaryFile("w+", suffix=".conf", delete=False)
+    first.write("http { server { listen 80; server_name other.com; } }")
+    first.close()
+    second = tempfile.NamedTemporaryFile("w+", suffix=".conf", delete=False)
+    second.write("http { upstream backend { server 127.0.0.1:8080; }"
+                 " server { listen 80; server_name shop.com; location /api/ { proxy_pass http://backend/v1; } } }")
+    second.close()
+    resolver = RouteResolver([(f.name, parse_nginx_config(f.name)) for f in (first, second)])
+    row = resolver.row('http://shop.com/api/cart')
+    assert row['config'] == second.name and row['server'] == 'shop.com'
+    assert row['location'] == '/api/' and row['upstream'] == 'backend' and row['file'] == second.name
+    assert resolver.row('http://nobody.com/')['config'] == first.name
+    assert resolver.row('http://shop.com:81/') == {**dict.fromkeys(ROW_FIELDS), 'url': 'http://shop.com:81/'}
+
+def test_route_batch_survives_bad_urls():
+    with tempfile.TemporaryDirectory() as tmp:
+        conf = os.path.join(tmp, "nginx.conf")
+        with open(conf, "w") as f:
+            f.write("http { server { listen 80; server_name a.com; location / { proxy_pass http://x; } } }")
+        urls = os.path.join(tmp, "urls.txt")
+        with open(urls, "w") as f:
+            f.write("http://a.com/\nhttp://a.com:99999/x\nhttp://[::1/x\nhttp://a.com/y\n")
+        ndjson = runner.invoke(app, ["route", "-c", conf, "--batch", urls, "--no-cache"])
+        table = runner.invoke(app, ["route", "-c", conf, "--batch", urls, "--format", "csv", "--no-cache"])
+        single = runner.invoke(app, ["route", "-c", conf, "http://a.com:99999/x", "--no-cache"])
+    assert ndjson.exit_code == 0, ndjson.output
+    rows = [json.loads(line) for line in ndjson.stdout.splitlines()]
+    assert [r['location'] for r in rows] == ['/', None, None, '/']
+    assert rows[0]['error'] is None and 'неверный URL' in rows[1]['error'] and rows[2]['error']
+    assert [r['error'] for r in csv.DictReader(io.StringIO(table.stdout))][1].startswith('неверный URL')
+    assert single.exit_code == 1 and "Неверный URL" in single.stdout
@@ -0,0 +1,76 @@
+import tempfile
+from parser.nginx_parser import parse_nginx_config
+from analyzer.base import Rule, ANY, run_rules
+from analyzer.warnings import find_warnings
+
+CONF = """
+http {
+    server_tokens on;
+    server {
+        listen 443;
+        location /a { proxy_pass backend; }
+        location /b { limit_req zone=one; }
+    }
+    server { listen 80; }
+}
+"""
+
+def _tree():
+    with tempfile.NamedTemporaryFile("w+", delete=False) as f:
+        f.write(CONF)
+        f.flush()
+        return parse_nginx_config(f.name)
+
+class _Trace(Rule):
+    directives = ('listen',)
+    blocks = ('server',)
+
+    def __init__(self):
+        self.events = []
+
+    def visit(self, node, parent):
+        self.events.append(('visit', node.name, node.arg if 'block' in node else node['args']))
+
+    def leave(self, node, parent):
+        self.events.append(('leave', node.name, None))
+
+    def result(self):
+        return self.events
+
+class _CountAll(Rule):
+    directives = (ANY,)
+    blocks = (ANY,)
+
+    def __init__(self):
+        self.count = 0
+
+    def visit(self, node, parent):
+        self.count += 1
+
+    def result(self):
+        return self.count
+
+def test_engine_dispatches_only_subscribed_nodes_in_one_walk():
+    trace, count = run_rules(_tree(), [_Trace(), _CountAll()])
+    assert trace == [
+        ('visit', 'server', None), ('visit', 'listen', '443'), ('leave', 'server', None),
+        ('visit', 'server', None), ('visit', 'listen', '80'), ('leave', 'server', None),
+    ]
+    assert count == 10
+
+def test_warnings_keep_walk_order():
+    warnings = find_warnings(_tree())
+    types = [w['type'] for w in warnings]
+    # limit_req внутри location засчитывается server-у; второй server без лимитов
+    assert types[:5] == ['server_tokens_on', 'listen_443_no_ssl', 'listen_443_no_http2',
+                         'proxy_pass_no_scheme', 'no_limit_req_conn']
+    assert warnings[4]['context'].get('block') == 'server'
+    assert types[5:] == ['missing_security_header'] * 5
+
+def test_warnings_skip_limit_without_args():
+    with tempfile.NamedTemporaryFile("w+", delete=False) as f:
+        f.write("http { client_max_body_size; server { listen 80; } }")
+        f.flush()
+        tree = parse_nginx_config(f.name)
+    types = [w['type'] for w in find_warnings(tree)]
+    assert 'limit_too_small' not in types and 'limit_too_large' not in types
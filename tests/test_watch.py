@@ -0,0 +1,133 @@
+import os
+import tempfile
+from collections import Counter
+from parser.nginx_parser import parse_nginx_config
+from parser.watch import ConfigWatcher
+from analyzer.base import Rule, supports_merge
+from commands import analyze
+from commands.analyze import collect_issues, IncrementalIssues, issues_delta
+
+def _write(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+    # mtime может не измениться при быстрой перезаписи — сдвигаем явно
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+def _make_tree(d):
+    os.makedirs(os.path.join(d, 'sites'))
+    root = os.path.join(d, 'nginx.conf')
+    _write(root, "http {\n    include sites/*.conf;\n}\n")
+    _write(os.path.join(d, 'sites', 'a.conf'), "server { listen 80; server_name a; location /a { proxy_pass http://x; } }\n")
+    _write(os.path.join(d, 'sites', 'b.conf'), "server { listen 80; server_name b; location /b { proxy_pass http://y; } }\n")
+    return root
+
+def test_refresh_reparses_only_changed_files():
+    with tempfile.TemporaryDirectory() as d:
+        root = _make_tree(d)
+        w = ConfigWatcher(root)
+        assert len(w.refresh()) == 3
+        assert w.refresh() == []
+        old_a, old_b = w.tree.directives[0].directives
+        b = os.path.join(d, 'sites', 'b.conf')
+        _write(b, "server { listen 80; server_name b; location /b { autoindex on; } }\n")
+        assert w.refresh() == [os.path.abspath(b)]
+        new_a, new_b = w.tree.directives[0].directives
+        # Узлы неизменившегося файла переиспользуются
+        assert new_a is old_a and new_b is not old_b
+        assert new_b['directives'][2]['directives'][0]['directive'] == 'autoindex'
+
+def test_refresh_sees_new_and_removed_glob_files():
+    with tempfile.TemporaryDirectory() as d:
+        root = _make_tree(d)
+        w = ConfigWatcher(root)
+        w.refresh()
+        c = os.path.join(d, 'sites', 'c.conf')
+        _write(c, "server { listen 81; }\n")
+        assert w.refresh() == [os.path.abspath(c)]
+        assert len(w.tree.directives[0].directives) == 3
+        os.remove(c)
+        assert w.refresh() == [os.path.abspath(c)]
+        assert len(w.tree.directives[0].directives) == 2
+        assert os.path.abspath(c) not in w.files()
+
+def test_incremental_issues_match_full_analysis():
+    with tempfile.TemporaryDirectory() as d:
+        root = _make_tree(d)
+        w = ConfigWatcher(root)
+        w.refresh()
+        inc = IncrementalIssues()
+        before = inc.update(w.tree)
+        assert Counter(before) == Counter(collect_issues(parse_nginx_config(root)))
+        _write(os.path.join(d, 'sites', 'b.conf'), "server { listen 80; server_name b; location /b { autoindex on; } }\n")
+        w.refresh()
+        after = inc.update(w.tree)
+        # Пересчитан только server-блок из изменённого файла
+        assert (inc.analyzed, inc.reused) == (1, 1)
+        assert Counter(after) == Counter(collect_issues(parse_nginx_config(root)))
+        added, resolved = issues_delta(before, after)
+        assert ('autoindex_on', 'autoindex on в блоке location') in added
+
+def test_incremental_issues_reuse_servers_with_includes():
+    with tempfile.TemporaryDirectory() as d:
+        os.makedirs(os.path.join(d, 'sites'))
+        os.makedirs(os.path.join(d, 'snippets'))
+        root = os.path.join(d, 'nginx.conf')
+        _write(root, "http {\n    limit_req_zone $binary_remote_addr zone=one:10m rate=1r/s;\n"
+                     "    map $host $unused { default 1; }\n    include sites/*.conf;\n}\n")
+        snippet = os.path.join(d, 'snippets', 'proxy.conf')
+        _write(snippet, "proxy_set_header Host $host;\nadd_header X-Frame-Options DENY;\n")
+        for name in 'abc':
+            _write(os.path.join(d, 'sites', f'{name}.conf'),
+                   f"server {{ listen 80; server_name {name} dup; include {snippet};\n"
+                   f"  location /{name} {{ rewrite ^/{name}/(.*)$ /{name}/$1; proxy_pass http://x; }} }}\n")
+        w = ConfigWatcher(root)
+        w.refresh()
+        inc = IncrementalIssues(w.signature)
+        assert Counter(inc.update(w.tree)) == Counter(collect_issues(parse_nginx_config(root)))
+        assert (inc.analyzed, inc.reused) == (3, 0)
+        _write(os.path.join(d, 'sites', 'b.conf'), "server { listen 80; server_name b; limit_req zone=one; }\n")
+        w.refresh()
+        after = inc.update(w.tree)
+        # Блоки с include из неизменившихся файлов не пересчитываются
+        assert (inc.analyzed, inc.reused) == (1, 2)
+        assert Counter(after) == Counter(collect_issues(parse_nginx_config(root)))
+        # Правка файла, подключённого в server-блоки, пересчитывает только их
+        _write(snippet, "proxy_set_header Host $host;\n")
+        w.refresh()
+        after = inc.update(w.tree)
+        assert (inc.analyzed, inc.reused) == (2, 1)
+        assert Counter(after) == Counter(collect_issues(parse_nginx_config(root)))
+        # limit_req уровня http наследуется всеми server-блоками — без их пересчёта
+        _write(root, "http {\n    limit_req zone=one;\n    include sites/*.conf;\n}\n")
+        w.refresh()
+        after = inc.update(w.tree)
+        assert (inc.analyzed, inc.reused) == (0, 3)
+        assert Counter(after) == Counter(collect_issues(parse_nginx_config(root)))
+        assert not any(t == 'no_limit_req_conn' for t, _ in after)
+
+class _ServerCount(Rule):
+    # Правило без merge: считает server-блоки всего дерева
+    blocks = ('server',)
+
+    def start(self, tree):
+        self.count = 0
+
+    def visit(self, node, parent):
+        self.count += 1
+
+    def result(self):
+        return [self.count]
+
+def test_incremental_issues_run_rules_without_merge_on_whole_tree(monkeypatch):
+    assert not supports_merge(_ServerCount()) and supports_merge(analyze.DeadLocationRule())
+    monkeypatch.setattr(analyze, "_GLOBAL_CHECKS", analyze._GLOBAL_CHECKS + ((_ServerCount, lambda r: [('servers', str(r[0]))]),))
+    with tempfile.TemporaryDirectory() as d:
+        root = _make_tree(d)
+        w = ConfigWatcher(root)
+        w.refresh()
+        inc = IncrementalIssues()
+        assert ('servers', '2') in inc.update(w.tree)
+        _write(os.path.join(d, 'sites', 'c.conf'), "server { listen 81; }\n")
+        w.refresh()
+        assert ('servers', '3') in inc.update(w.tree)
@@ -1,12 +1,230 @@
-import socket
-from typing import Dict, List
-
-def check_upstreams(upstreams: Dict[str, List[str]], timeout=2.0, retries=1):
-    # TODO: Реализовать реальную проверку TCP/HTTP
-    # Сейчас возвращает все healthy
-    result = {}
-    for name, servers in upstreams.items():
-        result[name] = []
-        for srv in servers:
-            result[name].append({"address": srv, "healthy": True})
-    return result 
\ No newline at end of file
+"""
+Проверка доступности upstream-серверов: TCP-соединения ко всем серверам сразу (asyncio).
+
+Все серверы проверяются одновременно под ограничением concurrency, поэтому проверка
+тысяч серверов занимает порядка одного таймаута, а не сумму таймаутов.
+"""
+import asyncio
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from upstream_checker.dns import CachingResolver, is_ip
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_PORT = 80
+# Дескрипторы, которые оставляются процессу помимо проверочных соединений
+_FD_RESERVE = 64
+
+_TIME_RE = re.compile(r'(\d+)(ms|s|m|h|d|w|M|y)?')
+_TIME_UNITS = {
+    'ms': 0.001, 's': 1, None: 1, 'm': 60, 'h': 3600, 'd': 86400,
+    'w': 7 * 86400, 'M': 30 * 86400, 'y': 365 * 86400,
+}
+
+def parse_time(value: str) -> float:
+    """Время в формате nginx ('10', '500ms', '1m30s') в секундах; ValueError — неверный формат."""
+    total = 0.0
+    pos = 0
+    value = value.strip()
+    while pos < len(value):
+        m = _TIME_RE.match(value, pos)
+        if m is None:
+            raise ValueError(f"неверное время: {value!r}")
+        total += int(m.group(1)) * _TIME_UNITS[m.group(2)]
+        pos = m.end()
+    if not value:
+        raise ValueError("пустое значение времени")
+    return total
+
+def parse_server(spec: str) -> Dict[str, Any]:
+    """
+    Разбирает аргументы директивы server в upstream: 'адрес [параметры]'.
+
+    Возвращает address, host, port (для unix: — unix с путём к сокету), weight, max_fails,
+    fail_timeout (сек), backup, down. Параметры, не влияющие на проверку, пропускаются.
+    """
+    parts = spec.split()
+    if not parts:
+        raise ValueError("пустая директива server")
+    address = parts[0]
+    server = {
+        'address': address, 'host': None, 'port': None, 'unix': None,
+        'weight': 1, 'max_fails': 1, 'fail_timeout': 10.0, 'backup': False, 'down': False,
+    }
+    if address.startswith('unix:'):
+        server['unix'] = address[5:]
+    else:
+        server['host'], server['port'] = split_address(address)
+    for param in parts[1:]:
+        key, _, value = param.partition('=')
+        if key in ('weight', 'max_fails'):
+            server[key] = int(value)
+        elif key == 'fail_timeout':
+            server[key] = parse_time(value)
+        elif key in ('backup', 'down') and not value:
+            server[key] = True
+    return server
+
+def split_address(address: str, default_port: int = DEFAULT_PORT) -> Tuple[str, int]:
+    """'host:port', 'host' или '[::1]:port' в (host, port)."""
+    if address.startswith('['):
+        host, _, rest = address[1:].partition(']')
+        port = rest[1:] if rest.startswith(':') else ''
+    elif address.count(':') == 1:
+        host, port = address.split(':')
+    else:
+        # Имя без порта или IPv6 без скобок
+        host, port = address, ''
+    return host, int(port) if port else default_port
+
+def raise_fd_limit() -> None:
+    """
+    Поднимает мягкий лимит открытых файлов процесса до жёсткого (если может).
+    Меняет лимиты всего процесса, поэтому вызывается явно — из nginx-lens health, а не из библиотеки.
+    """
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard != resource.RLIM_INFINITY and soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):
+            pass
+
+def default_concurrency() -> int:
+    """Сколько соединений держать открытыми одновременно: по текущему мягкому лимиту открытых файлов."""
+    if resource is None:
+        return 512
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        soft = 65536
+    return max(1, soft - _FD_RESERVE)
+
+async def _connect(server: Dict[str, Any], timeout: float) -> float:
+    """Одно TCP-соединение (или к unix-сокету); время установки в секундах."""
+    start = time.perf_counter()
+    if server['unix'] is not None:
+        opening = asyncio.open_unix_connection(server['unix'])
+    else:
+        opening = asyncio.open_connection(server['host'], server['port'])
+    _, writer = await asyncio.wait_for(opening, timeout)
+    latency = time.perf_counter() - start
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return latency
+
+async def check_server(server: Dict[str, Any], timeout: float, retries: int,
+                       limit: asyncio.Semaphore) -> Dict[str, Any]:
+    """
+    Проверяет один сервер: до retries попыток соединения, каждая — не дольше timeout.
+    Серверы с параметром down не проверяются.
+    """
+    result = dict(server, healthy=False, latency=None, error=None, attempts=0)
+    if server['down']:
+        result['error'] = "помечен down"
+        return result
+    async with limit:
+        for _ in range(max(1, retries)):
+            result['attempts'] += 1
+            try:
+                result['latency'] = await _connect(server, timeout)
+            except asyncio.TimeoutError:
+                result['error'] = f"таймаут {timeout:g} с"
+            except OSError as e:
+                result['error'] = e.strerror or str(e)
+            else:
+                result['healthy'] = True
+                result['error'] = None
+                break
+    return result
+
+async def plan_checks(upstreams: Dict[str, List[str]], resolver=None, failed=None):
+    """
+    Разбирает серверы и разрешает имена (все различные имена — одновременно, см. dns.CachingResolver).
+
+    Сервер с именем раскрывается в проверку каждого его адреса: host — адрес, name — имя, ip — адрес,
+    resolve_latency — время разрешения. Возвращает (result, slots, servers): result — {upstream: [...]}
+    с уже заполненными ошибками разбора и разрешения имён (resolve_error), servers — что проверять,
+    slots — куда в result положить результат каждой проверки. failed(entry) дополняет записи об ошибках.
+    """
+    parsed = []
+    names = set()
+    for name, specs in upstreams.items():
+        for spec in specs:
+            try:
+                server = parse_server(spec)
+            except ValueError as e:
+                parsed.append((name, {'address': spec, 'error': f"неверная директива server: {e}"}))
+                continue
+            if server['host'] is not None and not is_ip(server['host']) and not server['down']:
+                names.add(server['host'])
+            parsed.append((name, server))
+    resolutions = {}
+    if names:
+        own = resolver is None
+        resolver = resolver or CachingResolver()
+        try:
+            resolutions = await resolver.resolve_many(sorted(names))
+        finally:
+            if own:
+                resolver.close()
+    result: Dict[str, List[Dict[str, Any]]] = {name: [] for name in upstreams}
+    slots = []
+    servers = []
+    for name, server in parsed:
+        checked = result[name]
+        if 'error' in server:
+            checked.append(_failed(server, failed))
+            continue
+        resolution = resolutions.get(server['host'])
+        if resolution is None:
+            targets = [dict(server, name=None, ip=server['host'], resolve_latency=None)]
+        elif resolution.error is not None:
+            checked.append(_failed(dict(server, name=server['host'], ip=None, resolve_latency=resolution.latency,
+                                        resolve_error=resolution.error,
+                                        error=f"DNS: {resolution.error}"), failed))
+            continue
+        else:
+            targets = [dict(server, host=ip, name=server['host'], ip=ip, resolve_latency=resolution.latency)
+                       for ip in resolution.addresses]
+        for target in targets:
+            slots.append((checked, len(checked)))
+            checked.append(None)
+            servers.append(target)
+    return result, slots, servers
+
+def _failed(entry: Dict[str, Any], failed) -> Dict[str, Any]:
+    entry = dict(entry, healthy=False, latency=None, attempts=0)
+    return failed(entry) if failed is not None else entry
+
+async def check_upstreams_async(upstreams: Dict[str, List[str]], timeout: float = 2.0, retries: int = 1,
+                                concurrency: Optional[int] = None, resolver=None) -> Dict[str, List[Dict[str, Any]]]:
+    """Асинхронный вариант check_upstreams."""
+    limit = asyncio.Semaphore(concurrency or default_concurrency())
+    result, slots, servers = await plan_checks(upstreams, resolver)
+    checked = await asyncio.gather(*(check_server(server, timeout, retries, limit) for server in servers))
+    for (entries, i), server in zip(slots, checked):
+        entries[i] = server
+    return result
+
+def check_upstreams(upstreams: Dict[str, List[str]], timeout: float = 2.0, retries: int = 1,
+                    concurrency: Optional[int] = None, resolver=None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Проверяет TCP-доступность серверов каждого upstream.
+
+    upstreams — {имя: ['адрес [параметры]', ...]} (NginxConfigTree.get_upstreams()).
+    Для каждого сервера (сервер с именем — для каждого его адреса, см. plan_checks) — словарь
+    parse_server() и healthy, latency (сек, None — нет соединения), error, attempts.
+    concurrency — сколько соединений открывать одновременно (по умолчанию — сколько позволяет
+    лимит открытых файлов), resolver — dns.CachingResolver (по умолчанию — системный, без общего кэша).
+    """
+    return asyncio.run(check_upstreams_async(upstreams, timeout=timeout, retries=retries,
+                                             concurrency=concurrency, resolver=resolver))
@@ -0,0 +1,160 @@
+"""
+Разрешение имён серверов upstream перед проверкой.
+
+Все различные имена разрешаются одновременно и по одному разу: одинаковые запросы, которые
+уже выполняются, ждут общий результат, а ответы хранятся в памяти до истечения TTL.
+Источник ответов подключаемый: системный getaddrinfo (SystemResolver) или любой объект
+с корутиной query(host) -> (адреса, ttl), например StaticResolver в тестах.
+"""
+import asyncio
+import ipaddress
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+# TTL ответа, если источник его не сообщает (getaddrinfo), и TTL отрицательного ответа
+DEFAULT_TTL = 30.0
+NEGATIVE_TTL = 5.0
+# Потоки для getaddrinfo: стандартный пул asyncio слишком мал для тысяч имён
+RESOLVER_THREADS = 64
+
+class ResolveError(OSError):
+    """Имя не разрешилось."""
+
+def is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+class SystemResolver:
+    """Системный резолвер (getaddrinfo) в отдельном пуле потоков; TTL не известен."""
+    def __init__(self, threads: int = RESOLVER_THREADS):
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='nginx-lens-dns')
+
+    async def query(self, host: str) -> Tuple[List[str], Optional[float]]:
+        loop = asyncio.get_event_loop()
+        try:
+            infos = await loop.run_in_executor(self._executor, socket.getaddrinfo,
+                                               host, None, socket.AF_UNSPEC, socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise ResolveError(e.errno, e.strerror) from e
+        except UnicodeError as e:
+            # Пустая метка (a..b) или метка длиннее 63 символов: idna-кодек отвергает имя до запроса
+            raise ResolveError(socket.EAI_NONAME, f"недопустимое имя {host}: {e}") from e
+        # Порядок getaddrinfo сохраняется, повторы убираются
+        return list(dict.fromkeys(info[4][0] for info in infos)), None
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+class StaticResolver:
+    """Ответы из словаря {имя: [адреса] или исключение}; для тестов и подмены DNS."""
+    def __init__(self, records: Dict[str, Union[List[str], Exception]], ttl: Optional[float] = None,
+                 delay: float = 0.0):
+        self.records = records
+        self.ttl = ttl
+        self.delay = delay
+        self.queries = 0
+
+    async def query(self, host: str) -> Tuple[List[str], Optional[float]]:
+        self.queries += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        answer = self.records.get(host)
+        if answer is None:
+            raise ResolveError(socket.EAI_NONAME, f"имя {host} не найдено")
+        if isinstance(answer, Exception):
+            raise answer
+        return list(answer), self.ttl
+
+    def close(self) -> None:
+        pass
+
+class Resolution:
+    """Результат разрешения имени: адреса или ошибка, время запроса и был ли ответ из кэша."""
+    __slots__ = ('host', 'addresses', 'error', 'latency', 'cached', 'expires')
+
+    def __init__(self, host: str, addresses: List[str], error: Optional[str], latency: float, expires: float):
+        self.host = host
+        self.addresses = addresses
+        self.error = error
+        self.latency = latency
+        self.cached = False
+        self.expires = expires
+
+    def _hit(self) -> 'Resolution':
+        hit = Resolution(self.host, self.addresses, self.error, 0.0, self.expires)
+        hit.cached = True
+        return hit
+
+class CachingResolver:
+    """
+    Кэширующий резолвер: ответ источника (stub) хранится до истечения его TTL
+    (или ttl, если источник TTL не сообщает), ошибка — negative_ttl секунд.
+    """
+    def __init__(self, stub=None, ttl: float = DEFAULT_TTL, negative_ttl: float = NEGATIVE_TTL,
+                 timeout: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.stub = stub if stub is not None else SystemResolver()
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._cache: Dict[str, Resolution] = {}
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    async def resolve(self, host: str) -> Resolution:
+        """Адреса имени; ошибки не выбрасываются, а попадают в Resolution.error."""
+        entry = self._cache.get(host)
+        if entry is not None and entry.expires > self.clock():
+            self.hits += 1
+            return entry._hit()
+        pending = self._pending.get(host)
+        if pending is not None:
+            self.hits += 1
+            return (await asyncio.shield(pending))._hit()
+        self.misses += 1
+        future = self._pending[host] = asyncio.get_event_loop().create_future()
+        try:
+            entry = await self._query(host)
+            self._cache[host] = entry
+            future.set_result(entry)
+        finally:
+            del self._pending[host]
+            if not future.done():
+                future.cancel()
+        return entry
+
+    async def _query(self, host: str) -> Resolution:
+        start = self.clock()
+        try:
+            addresses, ttl = await asyncio.wait_for(self.stub.query(host), self.timeout)
+        except asyncio.TimeoutError:
+            return self._failed(host, f"таймаут {self.timeout:g} с", start)
+        except OSError as e:
+            return self._failed(host, e.strerror or str(e), start)
+        except Exception as e:
+            # Любая ошибка источника — отрицательный ответ, а не исключение: иначе она прервёт
+            # resolve_many и общий future для всех, кто ждёт это имя
+            return self._failed(host, str(e) or type(e).__name__, start)
+        now = self.clock()
+        if not addresses:
+            return self._failed(host, "нет адресов", start)
+        return Resolution(host, addresses, None, now - start, now + (ttl if ttl is not None else self.ttl))
+
+    def _failed(self, host: str, error: str, start: float) -> Resolution:
+        now = self.clock()
+        return Resolution(host, [], error, now - start, now + self.negative_ttl)
+
+    async def resolve_many(self, hosts: Iterable[str]) -> Dict[str, Resolution]:
+        """Все различные имена одновременно; IP-адреса не разрешаются."""
+        names = [h for h in dict.fromkeys(hosts) if not is_ip(h)]
+        resolved = await asyncio.gather(*(self.resolve(h) for h in names))
+        return dict(zip(names, resolved))
+
+    def close(self) -> None:
+        self.stub.close()
@@ -0,0 +1,269 @@
+"""
+HTTP-проверка upstream-серверов: GET path к каждому серверу по keep-alive соединениям.
+
+Соединения берутся из пула по адресу сервера и переиспользуются между пробами и попытками,
+поэтому каждая проба после первой — только запрос и ответ, без установки соединения.
+Все серверы проверяются одновременно под тем же ограничением concurrency, что и TCP-проверка.
+"""
+import asyncio
+import ssl
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from upstream_checker.checker import default_concurrency, plan_checks
+
+DEFAULT_EXPECT = '2xx,3xx'
+USER_AGENT = 'nginx-lens'
+
+class ProbeError(Exception):
+    """Ответ не получен или не разобран."""
+
+def parse_expect(spec: str) -> List[Tuple[int, int]]:
+    """'200,204', '2xx,3xx' или '200-299' в список диапазонов кодов ответа; ValueError — неверный формат."""
+    ranges = []
+    for part in spec.split(','):
+        part = part.strip().lower()
+        if not part:
+            continue
+        if len(part) == 3 and part.endswith('xx') and part[0].isdigit():
+            low = int(part[0]) * 100
+            ranges.append((low, low + 99))
+        elif '-' in part:
+            low, high = part.split('-', 1)
+            ranges.append((int(low), int(high)))
+        else:
+            ranges.append((int(part), int(part)))
+    if not ranges:
+        raise ValueError(f"не заданы коды ответа: {spec!r}")
+    return ranges
+
+def _expected(status: int, expect: List[Tuple[int, int]]) -> bool:
+    return any(low <= status <= high for low, high in expect)
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Перцентиль p (0..100) по ближайшему рангу; None для пустого списка."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[int(rank) - 1]
+
+def latency_summary(values: List[float]) -> Dict[str, Optional[float]]:
+    """p50, p95 и max задержки (сек)."""
+    return {
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'max': max(values) if values else None,
+    }
+
+def summarize(results: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """Сводка по upstream: число серверов, доступных, и p50/p95/max по всем пробам его серверов."""
+    summary = {}
+    for name, servers in results.items():
+        latencies = [x for srv in servers for x in srv.get('latencies', ())]
+        summary[name] = dict(latency_summary(latencies),
+                             servers=len(servers),
+                             healthy=sum(1 for srv in servers if srv['healthy']))
+    return summary
+
+def tls_context() -> ssl.SSLContext:
+    """TLS для проб: как proxy_ssl_verify off в nginx, сертификаты upstream не проверяются."""
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+class ConnectionPool:
+    """
+    Открытые keep-alive соединения по адресу сервера (и имени SNI: TLS-соединение,
+    открытое для одного имени, другому имени не отдаётся).
+    """
+    def __init__(self, tls: Optional[ssl.SSLContext]):
+        self.tls = tls
+        self._idle: Dict[Any, List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]] = {}
+        self.opened = 0
+
+    @staticmethod
+    def key(server: Dict[str, Any], server_hostname: Optional[str] = None):
+        return server['unix'] or (server['host'], server['port']), server_hostname
+
+    async def acquire(self, server: Dict[str, Any], server_hostname: Optional[str] = None):
+        """Соединение с сервером; server_hostname — имя для SNI (только с TLS)."""
+        idle = self._idle.get(self.key(server, server_hostname))
+        while idle:
+            reader, writer = idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer
+            writer.close()
+        self.opened += 1
+        if self.tls is None:
+            server_hostname = None
+        elif server_hostname is None:
+            server_hostname = 'localhost' if server['unix'] is not None else server['host']
+        if server['unix'] is not None:
+            return await asyncio.open_unix_connection(server['unix'], ssl=self.tls, server_hostname=server_hostname)
+        return await asyncio.open_connection(server['host'], server['port'], ssl=self.tls,
+                                             server_hostname=server_hostname)
+
+    def release(self, server: Dict[str, Any], conn, server_hostname: Optional[str] = None) -> None:
+        self._idle.setdefault(self.key(server, server_hostname), []).append(conn)
+
+    def close(self) -> None:
+        for conns in self._idle.values():
+            for _, writer in conns:
+                writer.close()
+        self._idle.clear()
+
+async def _read_body(reader: asyncio.StreamReader, headers: Dict[str, str]) -> bool:
+    """Дочитывает тело ответа; False — длина не задана и соединение переиспользовать нельзя."""
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';', 1)[0].strip() or b'0', 16)
+            if size == 0:
+                # Завершающие заголовки (trailer) до пустой строки
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return True
+            await reader.readexactly(size + 2)
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+        return True
+    await reader.read()
+    return False
+
+async def _probe(conn, request: bytes) -> Tuple[int, bool]:
+    """Один запрос по соединению; (код ответа, можно ли переиспользовать соединение)."""
+    reader, writer = conn
+    writer.write(request)
+    await writer.drain()
+    while True:
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.IncompleteReadError as e:
+            raise ProbeError("соединение закрыто до ответа") from e
+        except asyncio.LimitOverrunError as e:
+            raise ProbeError("слишком длинные заголовки ответа") from e
+        lines = head.decode('latin-1').split('\r\n')
+        parts = lines[0].split(' ', 2)
+        if len(parts) < 2 or not parts[0].startswith('HTTP/') or not parts[1].isdigit():
+            raise ProbeError(f"неверная строка ответа: {lines[0][:80]!r}")
+        status = int(parts[1])
+        if 100 <= status < 200:
+            # Промежуточный ответ (100 Continue): ждём окончательный
+            continue
+        break
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            key, value = line.split(':', 1)
+            headers[key.strip().lower()] = value.strip()
+    keep = status in (204, 304) or await _read_body(reader, headers)
+    keep = keep and headers.get('connection', '').lower() != 'close' and parts[0] != 'HTTP/1.0'
+    return status, keep
+
+def _request(path: str, host: str) -> bytes:
+    return (f"GET {path} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: {USER_AGENT}\r\n"
+            f"Accept: */*\r\nConnection: keep-alive\r\n\r\n").encode('latin-1')
+
+def _host_header(server: Dict[str, Any], tls: bool = False) -> str:
+    if server['unix'] is not None:
+        return 'localhost'
+    # Для сервера, заданного именем, — имя, а не адрес, к которому идёт соединение
+    host = server.get('name') or server['host']
+    host = f"[{host}]" if ':' in host else host
+    # Порт по умолчанию для схемы в Host не пишется
+    return host if server['port'] == (443 if tls else 80) else f"{host}:{server['port']}"
+
+def _server_name(host: str) -> str:
+    """Имя для SNI из значения Host: без порта и без скобок IPv6."""
+    if host.startswith('['):
+        return host[1:].partition(']')[0]
+    return host.rsplit(':', 1)[0] if host.count(':') == 1 else host
+
+async def check_server_http(server: Dict[str, Any], pool: ConnectionPool, path: str, timeout: float,
+                            retries: int, probes: int, expect: List[Tuple[int, int]],
+                            host: Optional[str], limit: asyncio.Semaphore) -> Dict[str, Any]:
+    """
+    probes запросов GET path к серверу; каждый — до retries попыток, попытка — не дольше timeout.
+    Сервер доступен, если на каждую пробу получен ожидаемый код ответа.
+    """
+    result = dict(server, healthy=False, status=None, latencies=[], error=None, attempts=0,
+                  **latency_summary([]))
+    if server['down']:
+        result['error'] = "помечен down"
+        return result
+    tls = pool.tls is not None
+    host = host or _host_header(server, tls)
+    request = _request(path, host)
+    # SNI — то же имя, что в Host: иначе backend с несколькими сертификатами отдаст не тот vhost
+    sni = _server_name(host) if tls else None
+    async with limit:
+        ok = 0
+        for _ in range(max(1, probes)):
+            for _ in range(max(1, retries)):
+                result['attempts'] += 1
+                conn = None
+                start = time.perf_counter()
+                try:
+                    conn = await asyncio.wait_for(pool.acquire(server, sni), timeout)
+                    status, keep = await asyncio.wait_for(_probe(conn, request), timeout)
+                except asyncio.TimeoutError:
+                    result['error'] = f"таймаут {timeout:g} с"
+                except (OSError, ProbeError, ValueError, asyncio.IncompleteReadError) as e:
+                    result['error'] = (getattr(e, 'strerror', None) or str(e)) or type(e).__name__
+                else:
+                    latency = time.perf_counter() - start
+                    result['status'] = status
+                    if keep:
+                        pool.release(server, conn, sni)
+                        conn = None
+                    if _expected(status, expect):
+                        result['latencies'].append(latency)
+                        ok += 1
+                        break
+                    result['error'] = f"HTTP {status}"
+                finally:
+                    if conn is not None:
+                        conn[1].close()
+        result['healthy'] = ok == max(1, probes)
+        if result['healthy']:
+            result['error'] = None
+    result.update(latency_summary(result['latencies']))
+    return result
+
+async def check_upstreams_http_async(upstreams: Dict[str, List[str]], path: str = '/', timeout: float = 2.0,
+                                     retries: int = 1, probes: int = 1, expect: str = DEFAULT_EXPECT,
+                                     host: Optional[str] = None, tls: bool = False,
+                                     concurrency: Optional[int] = None, resolver=None) -> Dict[str, List[Dict[str, Any]]]:
+    """Асинхронный вариант check_upstreams_http."""
+    ranges = parse_expect(expect)
+    pool = ConnectionPool(tls_context() if tls else None)
+    limit = asyncio.Semaphore(concurrency or default_concurrency())
+    result, slots, servers = await plan_checks(
+        upstreams, resolver, lambda entry: dict(entry, status=None, latencies=[], **latency_summary([]))
+    )
+    try:
+        checked = await asyncio.gather(*(check_server_http(server, pool, path, timeout, retries, probes, ranges,
+                                                           host, limit) for server in servers))
+    finally:
+        pool.close()
+    for (entries, i), server in zip(slots, checked):
+        entries[i] = server
+    return result
+
+def check_upstreams_http(upstreams: Dict[str, List[str]], path: str = '/', timeout: float = 2.0,
+                         retries: int = 1, probes: int = 1, expect: str = DEFAULT_EXPECT,
+                         host: Optional[str] = None, tls: bool = False,
+                         concurrency: Optional[int] = None, resolver=None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    HTTP-проверка серверов каждого upstream: probes запросов GET path к каждому.
+
+    expect — ожидаемые коды ответа ('2xx,3xx', '200,204', '200-299'), host — заголовок Host
+    (по умолчанию адрес сервера, без :443 для HTTPS и :80 для HTTP), tls — HTTPS без проверки сертификата;
+    имя из host (без порта) передаётся как SNI. resolver — как в check_upstreams.
+    Для каждого сервера — словарь parse_server() и healthy, status (последний код ответа),
+    latencies (сек, успешные пробы), p50, p95, max, error, attempts.
+    """
+    return asyncio.run(check_upstreams_http_async(upstreams, path=path, timeout=timeout, retries=retries,
+                                                  probes=probes, expect=expect, host=host, tls=tls,
+                                                  concurrency=concurrency, resolver=resolver))
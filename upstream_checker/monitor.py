@@ -0,0 +1,328 @@
+"""
+Непрерывный мониторинг upstream-серверов (nginx-lens health --interval).
+
+Каждый сервер проверяется раз в interval; первые проверки равномерно распределены по интервалу,
+следующие сдвигаются на случайную долю jitter, поэтому тысячи серверов не проверяются одной пачкой.
+Серверы, которые продолжают падать, проверяются всё реже (экспоненциальная задержка до max_backoff).
+Состояние сервера ведётся как в nginx: max_fails неудач за fail_timeout делают сервер
+недоступным на fail_timeout.
+Имена серверов разрешаются заново по истечении TTL ответа: для новых адресов появляются серверы,
+исчезнувшие адреса перестают проверяться, а у сохранившихся остаётся их состояние.
+"""
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from upstream_checker.checker import check_server, default_concurrency, parse_server
+from upstream_checker.dns import CachingResolver, Resolution, is_ip
+from upstream_checker.http import DEFAULT_EXPECT, ConnectionPool, check_server_http, parse_expect, tls_context
+
+# Состояния сервера
+UNKNOWN = 'unknown'    # ещё не проверялся
+UP = 'up'
+FAILING = 'failing'    # неудачи есть, но меньше max_fails за fail_timeout
+DOWN = 'down'          # max_fails неудач за fail_timeout: недоступен на fail_timeout
+DISABLED = 'disabled'  # параметр down в конфиге: не проверяется
+UNRESOLVED = 'unresolved'  # имя сервера не разрешилось: не проверяется
+
+STATES = (UP, FAILING, DOWN, UNKNOWN, DISABLED, UNRESOLVED)
+
+# Проверки, до которых осталось меньше _TICK секунд, запускаются вместе:
+# цикл планировщика просыпается не чаще 1 / _TICK раз в секунду
+_TICK = 0.01
+
+# Во сколько интервалов по умолчанию ограничена задержка для падающих серверов
+BACKOFF_INTERVALS = 10
+# Больше удвоений задержка не растёт: иначе 2 ** n после ~1024 неудач подряд переполняет float
+_MAX_DOUBLINGS = 32
+
+class MemberState:
+    """Сервер upstream и его состояние в мониторинге."""
+    __slots__ = ('upstream', 'server', 'state', 'fails', 'failed_at', 'unavailable_until',
+                 'consecutive', 'latency', 'error', 'checked', 'changed', 'probes', 'retired')
+
+    def __init__(self, upstream: str, server: Dict[str, Any]):
+        self.upstream = upstream
+        self.server = server
+        self.state = DISABLED if server['down'] else UNKNOWN
+        self.fails = 0                # неудачи в текущем окне fail_timeout
+        self.failed_at = None         # начало окна
+        self.unavailable_until = 0.0
+        self.consecutive = 0          # неудачи подряд (для задержки)
+        self.latency = None
+        self.error = None
+        self.checked = None           # время последней проверки (time.time())
+        self.changed = None           # время последней смены состояния
+        self.probes = 0
+        self.retired = False          # адрес пропал из ответа DNS: больше не проверяется
+
+    @property
+    def address(self) -> str:
+        """Адрес из конфига; для сервера, заданного именем, — с проверяемым IP-адресом."""
+        if self.server.get('name') and self.server.get('ip'):
+            return f"{self.server['address']} ({self.server['ip']})"
+        return self.server['address']
+
+    def record(self, healthy: bool, latency: Optional[float], error: Optional[str], now: float) -> Optional[str]:
+        """Учитывает результат проверки (now — монотонное время); прежнее состояние, если оно сменилось."""
+        self.probes += 1
+        self.latency = latency
+        self.error = error
+        old = self.state
+        if healthy:
+            self.consecutive = 0
+            self.fails = 0
+            self.failed_at = None
+            self.state = UP
+        else:
+            self.consecutive += 1
+            fail_timeout = self.server['fail_timeout']
+            if self.failed_at is None or now - self.failed_at > fail_timeout:
+                self.failed_at = now
+                self.fails = 0
+            self.fails += 1
+            max_fails = self.server['max_fails']
+            if max_fails and self.fails >= max_fails:
+                self.state = DOWN
+                self.unavailable_until = now + fail_timeout
+                self.fails = 0
+                self.failed_at = None
+            elif self.state != DOWN:
+                self.state = FAILING
+        return old if old != self.state else None
+
+class Change:
+    """Смена состояния сервера."""
+    __slots__ = ('time', 'upstream', 'address', 'old', 'new', 'latency', 'error')
+
+    def __init__(self, member: MemberState, old: str, when: float):
+        self.time = when
+        self.upstream = member.upstream
+        self.address = member.address
+        self.old = old
+        self.new = member.state
+        self.latency = member.latency
+        self.error = member.error
+
+Check = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+class Monitor:
+    """
+    Планировщик проверок: TCP-соединение или, если задан http, GET этого пути (как check_upstreams_http;
+    keep-alive соединения переиспользуются между раундами). Серверы, заданные именем, раскрываются
+    в отдельный сервер на каждый адрес и разрешаются заново по истечении TTL, но не чаще раза в interval
+    (resolver — dns.CachingResolver). check(server) заменяет проверку своей корутиной:
+    она получает словарь parse_server() и возвращает словарь с healthy, error и latency (или p50).
+    on_change(monitor, changes) вызывается после проверок, сменивших состояние серверов,
+    on_probe(member) — после каждой проверки (например, для метрик, см. exporter.prometheus).
+    """
+    def __init__(self, upstreams: Dict[str, List[str]], interval: float, timeout: float = 2.0,
+                 retries: int = 1, jitter: float = 0.1, max_backoff: Optional[float] = None,
+                 concurrency: Optional[int] = None, http: Optional[str] = None, probes: int = 1,
+                 expect: str = DEFAULT_EXPECT, host: Optional[str] = None, tls: bool = False,
+                 resolver: Optional[CachingResolver] = None, check: Optional[Check] = None,
+                 on_change: Optional[Callable[['Monitor', List[Change]], None]] = None,
+                 on_probe: Optional[Callable[[MemberState], None]] = None,
+                 history: int = 50, seed: Optional[int] = None):
+        self.interval = interval
+        self.timeout = timeout
+        self.retries = retries
+        self.jitter = jitter
+        self.max_backoff = max_backoff if max_backoff is not None else interval * BACKOFF_INTERVALS
+        self.concurrency = concurrency
+        self.http = http
+        self.probes_per_check = probes
+        self.expect = parse_expect(expect)
+        self.host = host
+        self.tls = tls
+        self.resolver = resolver
+        self.check = check
+        self.on_change = on_change
+        self.on_probe = on_probe
+        self.changes: Deque[Change] = deque(maxlen=history)
+        self.probes = 0
+        self.invalid: List[Tuple[str, str, str]] = []
+        self._random = random.Random(seed)
+        # Серверы из конфига и то, во что раскрыт каждый: он сам или по серверу на адрес его имени
+        self._configured: List[MemberState] = []
+        for name, servers in upstreams.items():
+            for spec in servers:
+                try:
+                    self._configured.append(MemberState(name, parse_server(spec)))
+                except ValueError as e:
+                    self.invalid.append((name, spec, str(e)))
+        self._expanded: List[List[MemberState]] = [[m] for m in self._configured]
+        self.members: List[MemberState] = list(self._configured)
+        # имя -> номера серверов в _configured, заданных этим именем
+        self._names: Dict[str, List[int]] = {}
+        for index, member in enumerate(self._configured):
+            host = member.server['host']
+            if member.state != DISABLED and host is not None and not is_ip(host):
+                self._names.setdefault(host, []).append(index)
+
+    def counts(self) -> Dict[str, int]:
+        """Число серверов в каждом состоянии."""
+        counts = dict.fromkeys(STATES, 0)
+        for member in self.members:
+            counts[member.state] += 1
+        return counts
+
+    def delay(self, member: MemberState, now: float) -> float:
+        """Через сколько секунд проверить сервер снова."""
+        delay = self.interval
+        if member.consecutive > 1:
+            delay = min(self.interval * 2 ** min(member.consecutive - 1, _MAX_DOUBLINGS), self.max_backoff)
+        delay *= self._random.uniform(1 - self.jitter, 1 + self.jitter)
+        if member.state == DOWN:
+            # Недоступный сервер, как и в nginx, снова пробуется после fail_timeout
+            delay = max(delay, member.unavailable_until - now)
+        return delay
+
+    async def _tcp(self, server: Dict[str, Any]) -> Dict[str, Any]:
+        return await check_server(server, self.timeout, self.retries, self._limit)
+
+    async def _http(self, server: Dict[str, Any]) -> Dict[str, Any]:
+        return await check_server_http(server, self._pool, self.http, self.timeout, self.retries,
+                                       self.probes_per_check, self.expect, self.host, self._limit)
+
+    def _apply(self, host: str, resolution: Resolution) -> List[MemberState]:
+        """
+        Раскрывает серверы с именем host по ответу DNS; возвращает новые серверы.
+        Серверы сохранившихся адресов переносятся вместе с состоянием, пропавших — помечаются retired.
+        Если имя не разрешилось, проверяются прежние адреса, а если их нет — сервер UNRESOLVED.
+        """
+        added = []
+        for index in self._names[host]:
+            configured = self._configured[index]
+            previous = self._expanded[index]
+            current = {m.server['ip']: m for m in previous if m.server.get('ip')}
+            server = dict(configured.server, name=host, resolve_latency=resolution.latency)
+            if resolution.error is not None:
+                if current:
+                    continue
+                unresolved = previous[0] if previous[0].state == UNRESOLVED else MemberState(
+                    configured.upstream, dict(server, ip=None))
+                unresolved.state = UNRESOLVED
+                unresolved.error = f"DNS: {resolution.error}"
+                members = [unresolved]
+            else:
+                members = []
+                for ip in resolution.addresses:
+                    member = current.get(ip)
+                    if member is None:
+                        member = MemberState(configured.upstream, dict(server, host=ip, ip=ip))
+                        added.append(member)
+                    members.append(member)
+            for member in previous:
+                if member not in members:
+                    member.retired = True
+            self._expanded[index] = members
+        self.members = [m for members in self._expanded for m in members]
+        return added
+
+    async def run(self, duration: Optional[float] = None) -> None:
+        """Проверяет серверы до отмены или, если задано, duration секунд."""
+        loop = asyncio.get_event_loop()
+        resolver = (self.resolver or CachingResolver()) if self._names else None
+        try:
+            await self._run(loop, resolver, duration)
+        finally:
+            if resolver is not None and self.resolver is None:
+                resolver.close()
+
+    async def _run(self, loop, resolver: Optional[CachingResolver], duration: Optional[float]) -> None:
+        resolutions = await resolver.resolve_many(self._names) if resolver is not None else {}
+        for host, resolution in resolutions.items():
+            self._apply(host, resolution)
+        self._limit = asyncio.Semaphore(self.concurrency or default_concurrency())
+        self._pool = ConnectionPool(tls_context() if self.tls else None)
+        check = self.check or (self._http if self.http is not None else self._tcp)
+        wake = asyncio.Event()
+        start = loop.time()
+        stop_at = start + duration if duration is not None else None
+        numbers = itertools.count()
+
+        def expires(resolution: Resolution) -> float:
+            # Не чаще раза в interval: при TTL 0 имя иначе разрешалось бы без остановки
+            return loop.time() + max(resolution.expires - resolver.clock(), self.interval)
+
+        # (когда, номер, сервер или имя для повторного разрешения): номер — чтобы не сравнивать MemberState
+        queue = [(start + self._random.uniform(0, self.interval), next(numbers), m)
+                 for m in self.members if m.state not in (DISABLED, UNRESOLVED)]
+        queue += [(expires(resolution), next(numbers), host) for host, resolution in resolutions.items()]
+        heapq.heapify(queue)
+        running = set()
+        deadline = None  # когда проснётся планировщик; None — ждёт завершения проверок
+
+        def schedule(when: float, item) -> None:
+            heapq.heappush(queue, (when, next(numbers), item))
+            if deadline is None or when < deadline:
+                wake.set()
+
+        async def refresh(host: str) -> None:
+            resolution = await resolver.resolve(host)
+            now = loop.time()
+            for member in self._apply(host, resolution):
+                schedule(now, member)
+            schedule(expires(resolution), host)
+
+        async def probe(i: int, member: MemberState) -> None:
+            try:
+                result = await check(member.server)
+            except Exception as e:
+                result = {'healthy': False, 'error': str(e) or type(e).__name__}
+            if member.retired:
+                return
+            now = loop.time()
+            self.probes += 1
+            latency = result.get('latency', result.get('p50'))
+            old = member.record(result['healthy'], latency, result.get('error'), now)
+            member.checked = time.time()
+            if self.on_probe is not None:
+                self.on_probe(member)
+            if old is not None:
+                member.changed = member.checked
+                # Первая удачная проверка — не смена состояния
+                if not (old == UNKNOWN and member.state == UP):
+                    change = Change(member, old, member.checked)
+                    self.changes.append(change)
+                    if self.on_change is not None:
+                        self.on_change(self, [change])
+            when = now + self.delay(member, now)
+            heapq.heappush(queue, (when, i, member))
+            if deadline is None or when < deadline:
+                wake.set()
+
+        try:
+            while True:
+                now = loop.time()
+                if stop_at is not None and now >= stop_at:
+                    break
+                while queue and queue[0][0] <= now + _TICK:
+                    _, i, item = heapq.heappop(queue)
+                    if isinstance(item, str):
+                        task = asyncio.ensure_future(refresh(item))
+                    elif item.retired:
+                        continue
+                    else:
+                        task = asyncio.ensure_future(probe(i, item))
+                    running.add(task)
+                    task.add_done_callback(running.discard)
+                deadline = queue[0][0] if queue else None
+                if stop_at is not None:
+                    deadline = stop_at if deadline is None else min(deadline, stop_at)
+                wake.clear()
+                timer = loop.call_at(deadline, wake.set) if deadline is not None else None
+                await wake.wait()
+                if timer is not None:
+                    timer.cancel()
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+            self._pool.close()